@@ -1,312 +1,457 @@
-import arcade
-import os
-import math
-import random
-
-SPRITE_SCALING = 0.5
-SPRITE_NATIVE_SIZE = 128
-SPRITE_SIZE = int(SPRITE_NATIVE_SIZE * SPRITE_SCALING)
+import time
 
-maze_width = 14
-maze_height = 10
+# Taken as early as possible, to measure the time to the first frame
+LAUNCH_TIME = time.perf_counter()
 
-SCREEN_WIDTH = SPRITE_SIZE * maze_width
-SCREEN_HEIGHT = SPRITE_SIZE * maze_height
+import arcade
+import argparse
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import PIL.Image
+
+from assets import textures
+from camera import CHUNK_TILES, Camera
+from game_log import perf_log, replay_log, setup_logging
+from crops import COLLECTED, GROWN, PLANTED, WATERED
+from hud import Hud, ProfilerOverlay
+from particles import BEDTIME_STARS, ParticleSystem
+from patch_layer import PatchRenderer
+from profiler import FrameProfiler
+from replay import Recording, Replayer
+from savegame import Autosaver, resume_farm
+from sprite_pool import SpritePool
+from static_layer import StaticLayerPool
+from farm import Farm, MOVEMENT_SPEED, SPRITE_SCALING, SPRITE_SIZE, WILD_BACKGROUND
+
+# The window shows this many tiles; rooms can be bigger, and the view follows the player
+SCREEN_COLUMNS = 14
+SCREEN_ROWS = 10
+SCREEN_WIDTH = SPRITE_SIZE * SCREEN_COLUMNS
+SCREEN_HEIGHT = SPRITE_SIZE * SCREEN_ROWS
 SCREEN_TITLE = "Maysday"
 
-MOVEMENT_SPEED = 5
+# Image paths, resolved through the shared texture registry
+WALL_IMAGE = ":resources:images/tiles/boxCrate_double.png"
+PLAYER_IMAGE = ":resources:images/animated_characters/female_person/femalePerson_idle.png"
+DIRT_PATCH_IMAGE = "textures/PPFE/tile_0000.png"
+DIRT_PATCH_SCALING = 3
+BED_IMAGE = "textures/PPFE/pngwing.com.png"
+BED_SCALING = 0.035
+SAPLING_IMAGES = {
+    "image_collected": ":resources:images/tiles/mushroomRed.png",
+    "image_planted": "textures/PPFE/tile_0075.png",
+    "image_watered": "textures/PPFE/tile_0075.png",
+    "image_grown": "textures/PPFE/tile_0057.png",
+}
+HOTBAR_ICONS = {
+    "watering_can": "textures/PPFE/tile_0026.png",
+    "shovel": "textures/PPFE/tile_0037.png"
+}
+
+# Sapling sprites made up front; the pool grows if more are on screen at once
+SAPLING_POOL_SIZE = 16
+
+# Sprites are kept for this many of the most recently shown rooms
+ROOM_SPRITE_CACHE = 4
+
+# Rooms are drawn a chunk at a time (see camera.py)
+CHUNK_PIXELS = CHUNK_TILES * SPRITE_SIZE
+KEPT_CHUNKS = 16  # Chunks of a room whose sprites are kept, the ones on screen first
+
+# The simulation advances in fixed steps, whatever the frame rate
+TICK_RATE = 60
+TICK = 1 / TICK_RATE
+MAX_TICKS_PER_UPDATE = 5  # After a long stall, drop time rather than try to catch up
+
+# Parts of a frame timed by the profiler
+PROFILE_PHASES = ["input", "movement", "proximity", "events", "timers",
+                  "clear", "camera", "static_layer", "saplings", "player", "particles", "hud", "overlay"]
+PROFILE_DIR = "profiles"  # Where F4 writes the recorded frames
+
+# The farm is saved here every night, and loaded from here when the game starts
+SAVE_PATH = os.path.join("saves", "autosave.sav")
+
+# Shown above the hotbar when pressing E would do something (see Farm.interaction)
+INTERACT_KEY = arcade.key.E
+PROMPTS = {
+    "dig": "Press E to dig up the sapling",
+    "harvest": "Press E to harvest",
+    "water": "Press E to water",
+    "plant": "Press E to plant a sapling",
+    "sleep": "Press E to go to bed",
+}
+
+# Everything the game can draw, loaded once in MyGame.setup (room backgrounds
+# come from the rooms, and the wilds' from WILD_BACKGROUND, and are added to this)
+PRELOAD_TEXTURES = [WALL_IMAGE, PLAYER_IMAGE, DIRT_PATCH_IMAGE, BED_IMAGE,
+                    *SAPLING_IMAGES.values(), *HOTBAR_ICONS.values()]
+
+class Chunk:
+    """
+    The sprites of one CHUNK_TILES x CHUNK_TILES square of a room that
+    don't move: its walls, and the beds and dirt patches that overlap it.
+    While the chunk is on screen they are cached in a static layer.
+    """
+    def __init__(self, column, row):
+        self.left = column * CHUNK_PIXELS
+        self.bottom = row * CHUNK_PIXELS
+        self.wall_list = arcade.SpriteList()
+        self.bed_list = arcade.SpriteList()
+        self.patches = None  # Index of each of the room's patches drawn in this chunk
+        self.patch_layer = None
+        self.tinted = False  # Whether the patch tints show the soil as it is
+        self.static_layer = None
 
 class Room:
     """
-    This class holds all the information about the
-    different rooms.
+    This class holds all the sprites drawn for one
+    room of the farm. The room is drawn in chunks (see camera.py): a
+    chunk's sprites are made when it comes on screen, and kept for the
+    KEPT_CHUNKS chunks on screen most recently. Only the crops in the
+    chunks on screen have a sapling sprite.
     """
-    def __init__(self):
-        self.wall_list = None
+    def __init__(self, state, sapling_pool, patch_renderer, layer_pool):
+        self.state = state  # The farm.RoomState these sprites show
         self.background = None
 
-        # Initialize sapling list
-        self.sapling_list = arcade.SpriteList()
+        # Sapling sprites are taken from the pool for the crops on screen
+        self.sapling_pool = sapling_pool
+        self.saplings = {}  # Crop id -> Sapling sprite
+        self.shown = False
+
+        # Dirt patches, tinted by the soil moisture under them, are drawn by this PatchRenderer
+        self.patch_renderer = patch_renderer
+        self.patch_xs = np.array([patch.x for patch in state.patches], dtype=np.float32)
+        self.patch_ys = np.array([patch.y for patch in state.patches], dtype=np.float32)
+
+        # Background, dirt patches, walls and bed of each chunk on screen,
+        # drawn once into a texture from this pool
+        self.layer_pool = layer_pool
+        self.chunks = OrderedDict()  # (column, row) -> Chunk, least recently on screen first
+        self.columns = -(-state.pixel_width // CHUNK_PIXELS)
+        self.rows = -(-state.pixel_height // CHUNK_PIXELS)
+        self.visible = []  # (column, row) of the chunks on screen
+        self._visible = set()
+
+    def show(self):
+        """ Draw the room from now on; the crops on screen get sprites with the next update_view(). """
+        self.shown = True
+
+    def hide(self):
+        """ Drop the crop sprites and the chunks' layers; the crops themselves stay in the farm. """
+        self.shown = False
+        self.clear_saplings()
+        for position in self.visible:
+            self._release_layer(self.chunks[position])
+        self.visible = []
+        self._visible = set()
+
+    def update_view(self, camera):
+        """ Make the chunks the camera sees the ones drawn, with sprites for their crops and no others. """
+        visible = camera.chunks(CHUNK_PIXELS, self.columns, self.rows)
+        if visible == self.visible:
+            return
+        entering = [position for position in visible if position not in self._visible]
+        for position in self.visible:
+            if position not in visible:
+                chunk = self.chunks[position]
+                self._release_layer(chunk)
+                for crop in self._crops_in(chunk):
+                    self.remove_sapling(crop)
+        self.visible = visible
+        self._visible = set(visible)
+        for position in entering:
+            chunk = self.chunk(position)
+            if not chunk.tinted:
+                self._tint(chunk)
+            self.add_saplings(self._crops_in(chunk))
+        for position in visible:
+            self.chunks.move_to_end(position)
+
+        # Forget the chunks off screen longest, freeing their GL buffers
+        while len(self.chunks) > KEPT_CHUNKS:
+            position = next(iter(self.chunks))
+            if position in self._visible:
+                break
+            del self.chunks[position]
+
+    def chunk(self, position):
+        chunk = self.chunks.get(position)
+        if chunk is None:
+            chunk = self.chunks[position] = self._make_chunk(*position)
+        return chunk
+
+    def drop_chunks(self):
+        """ Forget the sprites of every chunk; they are made again when they are next on screen. """
+        self.hide()
+        self.chunks.clear()
+
+    def _make_chunk(self, column, row):
+        """ Create the sprites of one chunk: its walls, and the beds and dirt patches that overlap it. """
+        state = self.state
+        chunk = Chunk(column, row)
+        left, bottom = chunk.left, chunk.bottom
+        right, top = left + CHUNK_PIXELS, bottom + CHUNK_PIXELS
+
+        # Sprite lists. The walls never change, so they are drawn into
+        # the static layer; collisions are checked against the farm's
+        # occupancy map instead.
+        first_column, first_row = column * CHUNK_TILES, row * CHUNK_TILES
+        for tile_row in range(first_row, min(first_row + CHUNK_TILES, state.height)):
+            for tile_column in range(first_column, min(first_column + CHUNK_TILES, state.width)):
+                if state.walls.is_blocked(tile_column, tile_row):
+                    wall = arcade.Sprite(texture=textures.get(WALL_IMAGE),
+                                         scale=textures.scale(WALL_IMAGE, SPRITE_SCALING))
+                    wall.left = tile_column * SPRITE_SIZE
+                    wall.bottom = tile_row * SPRITE_SIZE
+                    chunk.wall_list.append(wall)
+
+        # Beds and patches are not lined up with the tiles and can stick
+        # out into the next chunk, so they are drawn in every chunk they overlap
+        for bed in state.beds:
+            sprite = Bed(bed.x, bed.y)
+            if sprite.right > left and sprite.left < right and sprite.top > bottom and sprite.bottom < top:
+                chunk.bed_list.append(sprite)
+
+        width, height = self.patch_renderer.size
+        xs, ys = self.patch_xs, self.patch_ys
+        chunk.patches = np.flatnonzero((xs + width / 2 > left) & (xs - width / 2 < right)
+                                       & (ys + height / 2 > bottom) & (ys - height / 2 < top))
+        chunk.patch_layer = self.patch_renderer.layer(xs[chunk.patches], ys[chunk.patches])
+        return chunk
+
+    def _tint(self, chunk):
+        chunk.patch_layer.update_colors(self.state.patch_moisture(chunk.patches))
+        chunk.tinted = True
+        if chunk.static_layer:
+            chunk.static_layer.invalidate()
+
+    def _crops_in(self, chunk):
+        return self.state.crop_grid.in_box(chunk.left, chunk.bottom,
+                                           chunk.left + CHUNK_PIXELS, chunk.bottom + CHUNK_PIXELS)
+
+    def _on_screen(self, x, y):
+        return (int(x // CHUNK_PIXELS), int(y // CHUNK_PIXELS)) in self._visible
+
+    def _release_layer(self, chunk):
+        if chunk.static_layer:
+            self.layer_pool.release(chunk.static_layer)
+            chunk.static_layer = None
+
+    def add_saplings(self, crops):
+        if not self.shown:
+            return
+        store = self.state.crops
+        for crop in crops:
+            crop = int(crop)
+            if not self._on_screen(store.x[crop], store.y[crop]):
+                continue  # Its sprite is made when its chunk comes on screen
+            sapling = self.sapling_pool.acquire()
+            sapling.show(store, crop)
+            self.saplings[sapling.crop] = sapling
+
+    def update_saplings(self, crops):
+        if not self.shown:
+            return
+        for crop in crops.tolist():
+            sapling = self.saplings.get(crop)
+            if sapling:
+                sapling.update_state()
+
+    def remove_sapling(self, crop):
+        sapling = self.saplings.pop(crop, None)
+        if sapling:
+            self.sapling_pool.release(sapling)
+        return sapling
+
+    def clear_saplings(self):
+        for sapling in self.saplings.values():
+            self.sapling_pool.release(sapling)
+        self.saplings = {}
+
+    def update_dirt_patches(self):
+        """
+        Tint the patches on screen by the soil moisture under them, one
+        buffer write per chunk on screen, however big the room is. The
+        chunks off screen are tinted when they come back on.
+        """
+        for position, chunk in self.chunks.items():
+            if not chunk.patch_layer.count:
+                continue
+            if position in self._visible:
+                self._tint(chunk)
+            else:
+                chunk.tinted = False
+
+    def draw_static(self):
+        """ Draw the chunks on screen from their static layers, redrawing the layers that changed. """
+        for position in self.visible:
+            chunk = self.chunks[position]
+            if chunk.static_layer is None:
+                chunk.static_layer = self.layer_pool.acquire()
+            chunk.static_layer.draw(partial(self.draw_chunk, chunk), chunk.left, chunk.bottom)
+
+    def draw_chunk(self, chunk):
+        """ Draw everything in a chunk that only changes when the soil gets wetter or drier. """
+        # Draw the background texture, stretched over a room smaller than
+        # the screen and repeated every screenful over a bigger one
+        state = self.state
+        width = min(state.pixel_width, SCREEN_WIDTH)
+        height = min(state.pixel_height, SCREEN_HEIGHT)
+        for x in range(int(chunk.left // width) * width, chunk.left + CHUNK_PIXELS, width):
+            for y in range(int(chunk.bottom // height) * height, chunk.bottom + CHUNK_PIXELS, height):
+                if x < state.pixel_width and y < state.pixel_height:
+                    arcade.draw_lrwh_rectangle_textured(x, y, width, height, self.background)
 
-         # New dirt_patch_list attribute to hold dirt patch locations
-        self.dirt_patch_list = arcade.SpriteList()
+         # Draw dirt patches (planting zones)
+        chunk.patch_layer.draw()
 
-        self.bed_list = arcade.SpriteList()  # List to hold bed
+        # Draw all the walls in this chunk
+        chunk.wall_list.draw()
 
-        # Message for collecting saplings.
-        self.sapling_message = None
-        self.message_duration = 0
+        # Draw the bed
+        chunk.bed_list.draw()
 
 class Sapling(arcade.Sprite):
-    def __init__(self, image_collected, image_planted, image_watered, image_grown, scale=0.5):
-        super().__init__(image_collected, scale)
-        
-        # Initialize backing variables for properties
-        self._center_x = super().center_x  # Initialize with the default position
-        self._center_y = super().center_y  # Initialize with the default position
-        
-        self.image_collected = image_collected
-        self.image_planted = image_planted
-        self.image_watered = image_watered
-        self.image_grown = image_grown
-        self.state = "collected"
-        self.plant_position = None
-        self.dirt_patch = None
-
-    @property
-    def center_x(self):
-        return self._center_x
-    
-    @center_x.setter
-    def center_x(self, value):
-        self._center_x = value
-        super().set_position(value, self._center_y)
-
-    @property
-    def center_y(self):
-        return self._center_y
-
-    @center_y.setter
-    def center_y(self, value):
-        self._center_y = value
-        super().set_position(self._center_x, value)
-
-    def plant(self, x, y, dirt_patch):
-        """Transition to 'planted' state and set position."""
-        self.state = "planted"
-        self.center_x = x
-        self.center_y = y
-        self.dirt_patch = dirt_patch
-        self.texture = arcade.load_texture(self.image_planted)
-
-    def water(self):
-        """Transition to 'watered' state and update the image."""
-        if self.state == "planted":
-            self.state = "watered"
-            self.texture = arcade.load_texture(self.image_watered)
-            if self.dirt_patch:
-                self.dirt_patch.water()
-
-    def grow(self):
-        """Transition to 'grown' state after watering and a 'day' passes."""
-        if self.state == "watered":
-            self.state = "grown"
-            self.texture = arcade.load_texture(self.image_grown)
+    """
+    Draws one crop of a room's CropStore, swapping textures as its state
+    changes. Saplings are pooled: show() points one at another crop.
+    """
+    def __init__(self, state_textures, scale=0.5):
+        super().__init__(texture=state_textures[COLLECTED], scale=scale)
+        self.base_scale = scale
+        self.state_textures = state_textures  # Shared, so state changes only swap a reference
+        self.crops = None
+        self.crop = None
+        self.state = COLLECTED
+
+    def show(self, crops, crop):
+        """ Draw ``crop`` of ``crops`` from now on. """
+        self.crops = crops
+        self.crop = crop
+        self.state = COLLECTED
+        self.texture = self.state_textures[COLLECTED]
+        self.scale = self.base_scale
+        self.set_position(float(crops.x[crop]), float(crops.y[crop]))
+        self.visible = True
+        self.update_state()
+
+    def update_state(self):
+        """Match the image to the crop's state; grown saplings are drawn bigger."""
+        state = self.crops.state[self.crop]
+        if state == self.state:
+            return
+        self.state = state
+        # Growth stages without their own image look watered
+        self.texture = self.state_textures.get(state, self.state_textures[WATERED])
+        if state == GROWN:
             self.scale *= 4.5
-            if self.dirt_patch:
-                self.dirt_patch.dry()
-
-class DirtPatch(arcade.Sprite):
-    """A class for designated planting areas with no collision."""
-
-    def __init__(self, x, y, scale=SPRITE_SCALING):
-        super().__init__("textures/PPFE/tile_0000.png", scale)
-        self.center_x = x
-        self.center_y = y
-        self.is_planted = False  # Track if this patch is occupied by a sapling
-
-    def water(self):
-        """Darken the patch to indicate it has been watered."""
-        self.color = (139, 69, 19)
-
-    def dry(self):
-        self.color = (255, 255, 255)
 
 class Bed(arcade.Sprite):
     """ A class for the bed. """
     def __init__(self, x, y, scale=SPRITE_SCALING):
-        super().__init__("textures/PPFE/pngwing.com.png", scale=0.035)
+        super().__init__(texture=textures.get(BED_IMAGE),
+                         scale=textures.scale(BED_IMAGE, BED_SCALING))
         self.center_x = x
         self.center_y = y
 
-def setup_room_1():
+def setup_room(state, sapling_pool, patch_renderer, layer_pool):
     """
-    Create and return room 1.
+    Create and return the sprites for one room of the farm. Its chunks
+    and saplings are only created once they are on screen.
+    ``patch_renderer`` is the PatchRenderer the dirt patches are drawn
+    with and ``layer_pool`` the StaticLayerPool the chunks are cached in.
     """
-    room = Room()
-
-    """ Set up the game and initialize the variables. """
-    # Sprite lists
-    room.wall_list = arcade.SpriteList()
-    room.sapling_list = arcade.SpriteList() # List for saplings
-
-    # -- Set up the walls
-    # Create bottom and top row of boxes
-    # This y loops a list of two, the coordinate 0, and just under the top of window
-    for y in (0, SCREEN_HEIGHT - SPRITE_SIZE):
-        # Loop for each box going across
-        for x in range(0, SCREEN_WIDTH, SPRITE_SIZE):
-            wall = arcade.Sprite(":resources:images/tiles/boxCrate_double.png",
-                                 SPRITE_SCALING)
-            wall.left = x
-            wall.bottom = y
-            room.wall_list.append(wall)
-
-    # Create left and right column of boxes
-    for x in (0, SCREEN_WIDTH - SPRITE_SIZE):
-        # Loop for each box going across
-        for y in range(SPRITE_SIZE, SCREEN_HEIGHT - SPRITE_SIZE, SPRITE_SIZE):
-            # Skip making a block 4 and 5 blocks up on the right side
-            if (y != SPRITE_SIZE * 4 and y != SPRITE_SIZE * 5) or x == 0:
-                wall = arcade.Sprite(":resources:images/tiles/boxCrate_double.png",
-                                     SPRITE_SCALING)
-                wall.left = x
-                wall.bottom = y
-                room.wall_list.append(wall)
-            
-    wall_positions = [
-        (1, 2), (1, 7), 
-        (2, 2), (2, 4), (2, 5), (2, 7),
-        (3, 2), (3, 3), (3, 4), (3, 7),
-        (4, 6), (4, 7),
-        (5, 1), (5, 2), (5, 3), (5, 4), (5, 6),
-        (6, 4), (6, 6), (6, 7),
-        (7, 1), (7, 3), (7, 4),
-        (8, 3), (8, 7),
-        (9, 2), (9, 3), (9, 4), (9, 5), (9, 7),
-        (10, 5), (10, 7),
-        (11, 2), (11, 4), (11, 5), (11, 7), (11, 8),
-        (12, 2)         
-    ]
-
-    # Create the walls based on the positions
-    for pos in wall_positions:
-        wall = arcade.Sprite(":resources:images/tiles/boxCrate_double.png", SPRITE_SCALING)
-        wall.left = pos[0] * SPRITE_SIZE
-        wall.bottom = pos[1] * SPRITE_SIZE
-        room.wall_list.append(wall)
-
-    # Generating saplings
-    initial_saplings = random.randint(1, 3)
-
-    # Generate all positions in the maze
-    all_positions = [(x, y) for x in range(1, maze_width-1) for y in range(1, maze_height-1)]
-
-    # Remove wall positions to get open spaces
-    open_positions = [pos for pos in all_positions if pos not in wall_positions]
-
-    chosen_positions = random.sample(open_positions, initial_saplings)
-    print(chosen_positions)
-
-    # Place saplings in open positions
-    for x, y in chosen_positions:
-        sapling = Sapling(
-            image_collected=":resources:images/tiles/mushroomRed.png",
-            image_planted="textures/PPFE/tile_0075.png",
-            image_watered="textures/PPFE/tile_0075.png",
-            image_grown="textures/PPFE/tile_0057.png",
-            scale=SPRITE_SCALING
-        )
-        # Position the sapling using the chosen coordinates
-        sapling.center_x = x * SPRITE_SIZE + 30  # Adjust offset if needed
-        sapling.center_y = y * SPRITE_SIZE + 50  # Adjust offset if needed
-        room.sapling_list.append(sapling)
-
-    # Load the background image for this level.
-    room.background = arcade.load_texture(":resources:images/backgrounds/"
-                                          "abstract_1.jpg")
-
+    room = Room(state, sapling_pool, patch_renderer, layer_pool)
+    room.background = textures.get(state.background)
     return room
 
-def setup_room_2():
-    """
-    Create and return room 2.
-    """
-    room = Room()
-
-    """ Set up the game and initialize the variables. """
-    # Sprite lists
-    room.wall_list = arcade.SpriteList()
-    room.sapling_list = arcade.SpriteList()
-    room.dirt_patch_list = arcade.SpriteList()
-
-    # -- Set up the walls
-    # Create bottom and top row of boxes
-    # This y loops a list of two, the coordinate 0, and just under the top of window
-    for y in (0, SCREEN_HEIGHT - SPRITE_SIZE):
-        # Loop for each box going across
-        for x in range(0, SCREEN_WIDTH, SPRITE_SIZE):
-            wall = arcade.Sprite(":resources:images/tiles/boxCrate_double.png", SPRITE_SCALING)
-            wall.left = x
-            wall.bottom = y
-            room.wall_list.append(wall)
-
-    # Create left and right column of boxes
-    for x in (0, SCREEN_WIDTH - SPRITE_SIZE):
-        # Loop for each box going across
-        for y in range(SPRITE_SIZE, SCREEN_HEIGHT - SPRITE_SIZE, SPRITE_SIZE):
-            # Skip making a block 4 and 5 blocks up
-            if (y != SPRITE_SIZE * 4 and y != SPRITE_SIZE * 5) or x != 0:
-                wall = arcade.Sprite(":resources:images/tiles/boxCrate_double.png", SPRITE_SCALING)
-                wall.left = x
-                wall.bottom = y
-                room.wall_list.append(wall)
-
-    wall = arcade.Sprite(":resources:images/tiles/boxCrate_double.png", SPRITE_SCALING)
-    wall.left = 5 * SPRITE_SIZE
-    wall.bottom = 6 * SPRITE_SIZE
-    room.wall_list.append(wall)
-
-    # DirtPatch positions
-    dirt_patch_positions = [
-        (10*SPRITE_SIZE, 7*SPRITE_SIZE), (11*SPRITE_SIZE, 7*SPRITE_SIZE),
-        (10*SPRITE_SIZE, 6*SPRITE_SIZE), (11*SPRITE_SIZE, 6*SPRITE_SIZE),
-        (10*SPRITE_SIZE, 5*SPRITE_SIZE), (11*SPRITE_SIZE, 5*SPRITE_SIZE),
-    ]
-
-    # Create DirtPatches
-    for position in dirt_patch_positions:
-        dirt_patch = DirtPatch(position[0], position[1], scale=3)
-        room.dirt_patch_list.append(dirt_patch)
-
-    room.background = arcade.load_texture("textures/Backgrounds/Grass.png")
-
-    # Add the bed
-    bed = Bed(10.5 * SPRITE_SIZE, 8.5 * SPRITE_SIZE)  # Position the bed
-    room.bed_list.append(bed)
-
-    return room
-
-
 class MyGame(arcade.Window):
     """ Main application class. """
 
-    def __init__(self, width, height, title):
+    def __init__(self, width, height, title, async_loading=True, seed=None,
+                 record_path=None, replay=None, save_path=None, load_saved=True, auto_pickup=False):
         """
-        Initializer
+        Initializer. ``seed`` seeds the farm (random if None); inputs are
+        recorded to ``record_path`` if given, or taken from the
+        replay.Recording ``replay`` instead of the keyboard and mouse.
+        With ``auto_pickup`` saplings are picked up by walking up to them.
+
+        If ``save_path`` is given the farm is autosaved there at bedtime,
+        and, if ``load_saved`` and the file exists, loaded from it to start.
         """
         super().__init__(width, height, title)
-        self.sapling_inventory = [] 
         file_path = os.path.dirname(os.path.abspath(__file__))
         os.chdir(file_path)
 
+        # Packed and pre-scaled images, if build_assets.py has been run
+        textures.load_manifest()
+
+        # The game state and rules; this window only draws it and forwards input
+        self.farm = None
+        self.seed = replay.seed if replay else seed
+        self.auto_pickup = replay.auto_pickup if replay else auto_pickup
+
+        # Fixed-timestep simulation. Input is queued and applied at the start
+        # of the next tick, so recording it with its tick number is enough
+        # to play the session back exactly.
+        self.tick_count = 0
+        self.tick_time = 0.0  # Time not yet simulated
+        self.pending_input = []  # (kind, args) waiting for the next tick
+        self.previous_player_position = None  # (x, y, room) before the last tick, to interpolate from
+        self.record_path = record_path
+        self.recording = None  # replay.Recording of this session, if recording
+        self.replayer = Replayer(replay) if replay else None
+        self.replay_matches = None  # Whether the replay ended in the recorded state
+
+        # Saves are compressed and written on a thread of their own
+        self.save_path = save_path
+        self.load_saved = load_saved
+        self.autosaver = None
+        self.save_pool = None
+
+        # Textures are decoded on a thread pool while a loading screen is shown
+        self.async_loading = async_loading
+        self.loading = None  # assets.PendingLoad while textures are being loaded
+        self.loading_pool = None
+        self.loading_text = arcade.Text("Loading...", width // 2, height // 2, arcade.color.WHITE, 20,
+                                        anchor_x="center", anchor_y="center")
+        self.first_frame_time = None  # Seconds from launch to the first frame drawn
+        self.ready_time = None  # ... and to the first frame of the game itself
+
+        # Frame timings; F3 shows them, F4 saves them
+        self.profiler = FrameProfiler(PROFILE_PHASES)
+        self.profiler_overlay = ProfilerOverlay(self.profiler, width, height)
+        self.show_profiler = False
+
         # Simple small toolbar, with either watering can or axe.
-        self.current_tool = "watering_can"  # Start with the watering can selected
-        self.hotbar_icons = {
-            "watering_can": "textures/PPFE/tile_0026.png",
-            "shovel": "textures/PPFE/tile_0037.png"
-        }
-        self.hotbar_textures = {
-            "watering_can": arcade.load_texture(self.hotbar_icons["watering_can"]),
-            "shovel": arcade.load_texture(self.hotbar_icons["shovel"])
-        }
-        self.sapling_counter = 0
-
-        # Sprite lists
-        self.current_room = 0
+        self.hotbar_icons = HOTBAR_ICONS
+        self.hotbar_textures = None
 
         # Set up the player
-        self.rooms = None
+        self.rooms = None  # Room index -> Room sprites, least recently shown first
+        self.static_layers = None  # Textures the chunks on screen are cached in, shared by all rooms
+        self.sapling_pool = None  # Sapling sprites shared by all rooms
+        self.patch_renderer = None  # Draws every room's dirt patches
         self.player_sprite = None
         self.player_list = None
-        self.physics_engine = None
 
-        self.sapling_icon = arcade.load_texture(":resources:images/tiles/mushroomRed.png")
-        self.tomato_icon = arcade.load_texture("textures/PPFE/tile_0057.png")
-        self.tomato_counter = 0
+        # The part of the room on screen; clicks are turned into room positions through it
+        self.camera = Camera(width, height)
+
+        # Splashes, harvest bursts and bedtime stars
+        self.particles = None
+
+        self.sapling_icon = None
+        self.tomato_icon = None
+        self.hud = None
 
         # Day change text
-        self.current_day = 1  # Initialize current day
         self.day_message = ""  # Message to display for the day
         self.show_day_message = False  # Flag to control message visibility
         self.message_timer = 0  # Timer for how long to show the message
@@ -318,302 +463,450 @@ class MyGame(arcade.Window):
         self.message_duration = 0  # Duration for which to show the message
         self.message_position = (0, 0)  # Position of the message
 
-        
+    # The farm owns these; they are read here for drawing
+    @property
+    def current_room(self):
+        return self.farm.current_room
+
+    @property
+    def current_tool(self):
+        return self.farm.current_tool
+
+    @property
+    def current_day(self):
+        return self.farm.current_day
+
+    @property
+    def sapling_counter(self):
+        return self.farm.sapling_counter
+
+    @property
+    def tomato_counter(self):
+        return self.farm.tomato_counter
 
     def setup(self):
-        """ Set up the game and initialize the variables. """
+        """ Set up the game and start loading its textures. """
+        if self.save_path and self.load_saved:
+            self.farm = resume_farm(self.save_path, seed=self.seed)
+        else:
+            self.farm = Farm(seed=self.seed)
+        self.farm.auto_pickup = self.auto_pickup
+        if self.save_path:
+            self.save_pool = ThreadPoolExecutor(max_workers=1)
+            self.autosaver = Autosaver(self.save_path, self.save_pool)
+        if self.record_path:
+            self.recording = Recording(self.farm.seed, auto_pickup=self.auto_pickup)
+
+        # Decode every texture before the game starts, so nothing is loaded
+        # from disk mid-game
+        backgrounds = [WILD_BACKGROUND] + [room.background for _, room in self.farm.rooms.loaded()]
+        paths = PRELOAD_TEXTURES + list(dict.fromkeys(backgrounds))
+        if self.async_loading:
+            self.loading_pool = ThreadPoolExecutor()
+            self.loading = textures.load_async(paths, self.loading_pool)
+        else:
+            textures.preload(paths)
+            self.finish_setup()
+
+    def update_loading(self):
+        """ Pick up the textures decoded since the last frame; start the game once all are in. """
+        for texture in self.loading.poll():
+            # Upload now, rather than the first time a sprite using it is drawn
+            self.ctx.default_atlas.add(texture)
+        if self.loading.done:
+            self.loading = None
+            self.loading_pool.shutdown(wait=False)
+            self.loading_pool = None
+            self.finish_setup()
+
+    def finish_setup(self):
+        """ Create the sprites once all textures are loaded. """
+        textures.release_sheets()
+        perf_log.info("Textures loaded: %s", textures.stats())
+
+        self.hotbar_textures = {tool: textures.get(path) for tool, path in HOTBAR_ICONS.items()}
+        self.sapling_icon = textures.get(SAPLING_IMAGES["image_collected"])
+        self.tomato_icon = textures.get(SAPLING_IMAGES["image_grown"])
+        sapling_textures = {state: textures.get(SAPLING_IMAGES[f"image_{name}"])
+                            for state, name in ((COLLECTED, "collected"), (PLANTED, "planted"),
+                                                (WATERED, "watered"), (GROWN, "grown"))}
+        self.hud = Hud(self.width, self.height, self.hotbar_textures, self.sapling_icon, self.tomato_icon)
+
         # Set up the player
-        self.player_sprite = arcade.Sprite(":resources:images/animated_characters/female_person/"
-                                           "femalePerson_idle.png", SPRITE_SCALING)
-        self.player_sprite.center_x = 100
-        self.player_sprite.center_y = 100
+        self.player_sprite = arcade.Sprite(texture=textures.get(PLAYER_IMAGE),
+                                           scale=textures.scale(PLAYER_IMAGE, SPRITE_SCALING))
+        self.player_sprite.center_x = self.farm.player.x
+        self.player_sprite.center_y = self.farm.player.y
         self.player_list = arcade.SpriteList()
         self.player_list.append(self.player_sprite)
 
-        # Our list of rooms
-        self.rooms = []
+        # The patch layers draw the dirt image themselves, outside the sprite atlas
+        texture = textures.get(DIRT_PATCH_IMAGE)
+        image = texture.image.convert("RGBA").transpose(PIL.Image.FLIP_TOP_BOTTOM)
+        scale = textures.scale(DIRT_PATCH_IMAGE, DIRT_PATCH_SCALING)
+        self.patch_renderer = PatchRenderer(self.ctx, self.ctx.texture(image.size, components=4,
+                                                                       data=image.tobytes()),
+                                            (texture.width * scale, texture.height * scale))
 
-        # Create the rooms. Extend the pattern for each room.
-        room = setup_room_1()
-        self.rooms.append(room)
+        # Chunk layers as sharp as the screen, on high-DPI screens too
+        resolution = CHUNK_PIXELS * self.get_framebuffer_size()[0] // self.width
+        self.static_layers = StaticLayerPool(self.ctx, CHUNK_PIXELS, resolution)
 
-        room = setup_room_2()
-        self.rooms.append(room)
+        self.particles = ParticleSystem(self.ctx)
 
-        # Our starting room number
-        self.current_room = 0
+        self.farm.drain_events()  # The rooms below are built from the current state
 
-        # Create a physics engine for this room
-        self.physics_engine = arcade.PhysicsEngineSimple(self.player_sprite,
-                                                         self.rooms[self.current_room].wall_list)
+        # Our list of rooms
+        self.sapling_pool = SpritePool(lambda: Sapling(sapling_textures, scale=SPRITE_SCALING),
+                                       SAPLING_POOL_SIZE)
+        self.rooms = OrderedDict()
+        self.show_room(self.current_room)
+
+    def show_room(self, room_index):
+        """
+        Show a room, creating its sprites if they are not cached, and hide
+        the others. Sprites of the rooms shown longest ago are dropped.
+        """
+        for other in self.rooms.values():
+            if other.shown:
+                other.hide()
+        room = self.rooms.get(room_index)
+        if room is None:
+            room = self.rooms[room_index] = setup_room(self.farm.rooms[room_index], self.sapling_pool,
+                                                       self.patch_renderer, self.static_layers)
+            while len(self.rooms) > ROOM_SPRITE_CACHE:
+                self.drop_room(self.rooms.popitem(last=False)[1])
+        self.rooms.move_to_end(room_index)
+        room.show()
+        return room
+
+    def drop_room(self, room):
+        """ Forget a room's sprites; its chunks' static layers go back to the pool for the next room. """
+        room.drop_chunks()
 
     def on_draw(self):
         """
         Render the screen.
         """
-        # This command has to happen before we start drawing
-        self.clear()
+        profiler = self.profiler
 
-        # Draw the background texture
-        arcade.draw_lrwh_rectangle_textured(0, 0,
-                                            SCREEN_WIDTH, SCREEN_HEIGHT,
-                                            self.rooms[self.current_room].background)
-         # Draw dirt patches (planting zones)
-        self.rooms[self.current_room].dirt_patch_list.draw()
-        
-        # Draw all the walls in this room
-        self.rooms[self.current_room].wall_list.draw()
-
-        # Draw the bed
-        self.rooms[self.current_room].bed_list.draw()
-
-        # Draw the hotbar at the bottom center of the screen
-        hotbar_x = SCREEN_WIDTH // 2
-        hotbar_y = 30  # Position at the bottom of the screen
-
-        for idx, tool in enumerate(self.hotbar_icons):
-            icon_x = hotbar_x + (idx - 0.5) * 65  # Adjust positions for multiple items
-
-            # Draw the icon
-            arcade.draw_texture_rectangle(
-                icon_x, hotbar_y,
-                50, 50,
-                self.hotbar_textures[tool]
-            )
-
-            # Highlight the selected tool
-            if tool == self.current_tool:
-                arcade.draw_rectangle_outline(icon_x, hotbar_y, 60, 60, arcade.color.YELLOW, 3)
-
-        if self.show_day_message:
-            arcade.draw_text(self.day_message, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                             arcade.color.WHITE, 20, anchor_x="center", anchor_y="center")
-    
+        # This command has to happen before we start drawing
+        with profiler.phase("clear"):
+            self.clear()
+
+        if self.loading:
+            self.loading_text.text = f"Loading... {int(self.loading.progress * 100)}%"
+            self.loading_text.draw()
+            self.record_startup_time()
+            return
+
+        # Follow the player, and find the chunks of the room in view;
+        # nothing outside them is drawn
+        with profiler.phase("camera"):
+            self.interpolate_player()
+            room = self.rooms[self.current_room]
+            self.camera.follow(self.player_sprite.center_x, self.player_sprite.center_y,
+                               room.state.pixel_width, room.state.pixel_height)
+            self.ctx.projection_2d = self.camera.projection
+            room.update_view(self.camera)
+
+        # Background, dirt patches, walls and bed come from each chunk's
+        # cached layer, which is only redrawn when a patch changes
+        with profiler.phase("static_layer"):
+            room.draw_static()
 
         # Draw saplings
-        self.rooms[self.current_room].sapling_list.draw()
-
-        self.player_list.draw()
-
-        self.draw_sapling_counter()
-
-        # Sapling Collection message in room 1
-        if self.sapling_message:
-            arcade.draw_text (self.sapling_message, self.message_position[0], self.message_position[1],
-                              arcade.color.WHITE, 18, anchor_x="center", anchor_y="bottom")
-
-        # Draw the day message with fade out
-        if self.day_message:
-            alpha_value = int(255 * self.fade_out)
-            arcade.draw_text(self.day_message, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                             (255,255,255, alpha_value), #RGB ans alpha (opacity)
-                             20, anchor_x="center", anchor_y="center")
-
-    
-    def draw_sapling_counter(self):
-        # Position to draw the icon and counter
-        icon_x = 30  # X position for the icon
-        icon_y = self.height - 10  # Y position for the icon
-
-        # Draw a background rectangle for the sapling count
-        box_width = 180  # Width of the box
-        box_height = 30  # Height of the box
-        box_x = icon_x - 20 + box_width / 2  # Centered box position
-        box_y = icon_y - 15  # Positioning the box with the text
-
-        # Draw the sapling icon
-        arcade.draw_texture_rectangle(icon_x + box_width*3/5, icon_y, 50, 50, self.sapling_icon)
-
-        arcade.draw_lrtb_rectangle_outline(box_x - box_width / 2, box_x + box_width / 2, 
-                                            box_y + box_height / 2, box_y - box_height / 2, 
-                                            arcade.color.WHITE)  # Draw the background box
-
-        # Draw the sapling count text
-        arcade.draw_text(f"Saplings       {self.sapling_counter}", 
-                        icon_x - 15, icon_y - 20, arcade.color.WHITE, 18)
-        
-        # Tomato counter box (positioned below sapling counter)
-        if self.tomato_counter >= 1:
-            tomato_y = icon_y - 60  # Offset below sapling counter
-            tomato_box_y = box_y - 60
-
-            # Draw the tomato icon and counter
-            arcade.draw_texture_rectangle(icon_x + box_width*3/5, tomato_box_y, 25, 25, self.tomato_icon)
-            arcade.draw_lrtb_rectangle_outline(box_x - box_width / 2, box_x + box_width / 2, 
-                                         tomato_box_y + box_height / 2, tomato_box_y - box_height / 2, 
-                                         arcade.color.WHITE)
-            arcade.draw_text(f"Tomatoes      {self.tomato_counter}", 
-                        icon_x - 15, tomato_y - 20, arcade.color.WHITE, 18)
+        with profiler.phase("saplings"):
+            self.sapling_pool.sprite_list.draw()
+
+        with profiler.phase("player"):
+            self.player_list.draw()
+
+        # Drawn as far into the next tick as the player is
+        with profiler.phase("particles"):
+            self.particles.draw(self.tick_time)
+
+        # Counters, hotbar and messages, which stay put on screen
+        with profiler.phase("hud"):
+            self.ctx.projection_2d = (0, self.width, 0, self.height)
+            interaction = self.farm.interaction()
+            self.hud.update(self.sapling_counter, self.tomato_counter, self.current_tool,
+                            self.sapling_message, self.camera.to_screen(*self.message_position),
+                            self.day_message if self.show_day_message else None, self.fade_out,
+                            PROMPTS[interaction[0]] if interaction else None)
+            self.hud.draw()
+
+        if self.show_profiler:
+            with profiler.phase("overlay"):
+                self.profiler_overlay.update()
+                self.profiler_overlay.draw()
+
+        profiler.end_frame()
+        self.record_startup_time()
+
+    def export_profile(self):
+        """ Save the recorded frames as CSV, JSON and a Chrome trace. """
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, time.strftime("frames-%Y%m%d-%H%M%S"))
+        self.profiler.to_csv(base + ".csv")
+        self.profiler.to_json(base + ".json")
+        self.profiler.to_chrome_trace(base + ".trace.json")
+        perf_log.info("Frame profile saved to %s.*: %s", base, self.profiler.summary()["frame"])
+
+    def record_startup_time(self):
+        """ Report how long after launch the first frame, and the first game frame, were drawn. """
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter() - LAUNCH_TIME
+            perf_log.info("Time to first frame: %.0f ms", self.first_frame_time * 1000)
+        if self.ready_time is None and not self.loading:
+            self.ready_time = time.perf_counter() - LAUNCH_TIME
+            perf_log.info("Time to first game frame: %.0f ms", self.ready_time * 1000)
+
+    def interpolate_player(self):
+        """ Draw the player between their last two simulated positions, by how far into the next tick we are. """
+        player = self.farm.player
+        x, y = player.x, player.y
+        if self.previous_player_position:
+            previous_x, previous_y, room = self.previous_player_position
+            if room == self.current_room:  # No sliding across the screen when changing rooms
+                alpha = self.tick_time / TICK
+                x = previous_x + (x - previous_x) * alpha
+                y = previous_y + (y - previous_y) * alpha
+        self.player_sprite.center_x = x
+        self.player_sprite.center_y = y
 
     def on_key_press(self, key, modifiers):
         """Called whenever a key is pressed. """
-
-        if key == arcade.key.UP:
-            self.player_sprite.change_y = MOVEMENT_SPEED
-        elif key == arcade.key.DOWN:
-            self.player_sprite.change_y = -MOVEMENT_SPEED
-        elif key == arcade.key.LEFT:
-            self.player_sprite.change_x = -MOVEMENT_SPEED
-        elif key == arcade.key.RIGHT:
-            self.player_sprite.change_x = MOVEMENT_SPEED
-
-        # Switch tool with key press
-        if key == arcade.key.KEY_1:
-            self.current_tool = "watering_can"
-            print(f"Selected tool: {self.current_tool}")
-        elif key == arcade.key.KEY_2:
-            self.current_tool = "shovel"
-            print(f"Selected tool: {self.current_tool}")
+        if self.loading:
+            return
+
+        # Profiler overlay and export, and saving the recording so far
+        if key == arcade.key.F3:
+            self.show_profiler = not self.show_profiler
+        elif key == arcade.key.F4 and self.profiler.frames:
+            self.export_profile()
+        elif key == arcade.key.F5 and self.recording:
+            self.save_recording()
+        else:
+            self.queue_input("key_press", key)
 
     def on_key_release(self, key, modifiers):
         """Called when the user releases a key. """
-
-        if key == arcade.key.UP or key == arcade.key.DOWN:
-            self.player_sprite.change_y = 0
-        elif key == arcade.key.LEFT or key == arcade.key.RIGHT:
-            self.player_sprite.change_x = 0
+        if self.loading:
+            return
+        self.queue_input("key_release", key)
 
     def on_mouse_press(self, x, y, button, modifiers):
-        saplings_hit = []
-        # Check if we can collect a sapling
-
-        for sapling in self.rooms[self.current_room].sapling_list:
-            distance_to_player = math.sqrt((self.player_sprite.center_x - sapling.center_x) ** 2 + (self.player_sprite.center_y - sapling.center_y) ** 2)
-            distance_to_click = math.sqrt((x - sapling.center_x) ** 2 + (y - sapling.center_y) ** 2)
-
-            print(f"Sapling Position: {sapling.center_x}, {sapling.center_y}")  # Print sapling position for DEBUG
-
-            if distance_to_player < 80 and distance_to_click < 50:  # Adjust these values to tweak distance to sapling
-                saplings_hit.append(sapling)
-
-        if saplings_hit:
-            print("Sapling interacted with!")
-            for sapling in saplings_hit:
-                if not hasattr(sapling, "state"):
-                    sapling.state = "default"
-
-                # Change sapling state based on interaction
-                if self.current_tool == "watering_can":
-                    sapling.water()
-
-                if self.current_tool == "shovel" and sapling.state != "dug":
-                    if sapling.state == "grown":
-                        self.tomato_counter += 1
-                        print(f"Tomato counter: {self.tomato_counter}")
-                    else: self.dig_sapling()
-
-                    if sapling.dirt_patch:
-                        sapling.dirt_patch.is_planted = False
-
-                    sapling.remove_from_sprite_lists()
-
-                    # Set message for sapling collection
-                    if self.current_room == 0:  # Check if in room 1
-                        self.sapling_message = "Mystery sapling collected"
-                    elif self.current_room == 1:
-                        if sapling.state == "grown":
-                            self.sapling_message = "Tomato collected"
-                        else:
-                            self.sapling_message = "Sapling collected"
-                    self.message_duration = 2  # Set duration for the message
-                    self.message_position = (sapling.center_x, sapling.center_y)  # Position above sapling
-                    saplings_hit.clear()              
-
-        # Check if we can plant a sapling on a dirt patch
-        if self.sapling_counter > 0 and self.current_tool == "shovel":
-            for dirt_patch in self.rooms[self.current_room].dirt_patch_list:
-                distance_to_patch = math.sqrt(
-                    (x - dirt_patch.center_x) ** 2 + (y - dirt_patch.center_y) ** 2
-                )
-
-                # If within planting range, plant a sapling at this dirt patch
-                if distance_to_patch < 10 and not dirt_patch.is_planted:
-                    # Decrease sapling counter
-                    self.sapling_counter -= 1
-
-
-                    # Create a new sapling at this patch position in "planted" state
-                    sapling = Sapling(
-                        image_collected=":resources:images/tiles/mushroomRed.png",
-                        image_planted="textures/PPFE/tile_0075.png", 
-                        image_watered="textures/PPFE/tile_0075.png",
-                        image_grown="textures/PPFE/tile_0057.png", 
-                        scale=SPRITE_SCALING
-                    )
-                    sapling.plant(dirt_patch.center_x, dirt_patch.center_y, dirt_patch)
-                    self.rooms[self.current_room].sapling_list.append(sapling)
-                    dirt_patch.is_planted = True  # Mark patch as occupied
-                    print("Sapling planted on dirt patch!")
-                    return  # Exit after planting
-                
-        # Check if we can go to bed (interact with the bed)        
-        for bed in self.rooms[self.current_room].bed_list:
-            distance_to_bed = math.sqrt(
-                (x - bed.center_x) ** 2 + (y - bed.center_y) ** 2
-            )
-            # If within interaction range of the bed, start a new day
-            if distance_to_bed < 80:
-                self.current_day += 1  # Increment day count
-                self.day_message = f"Good morning!\nDay {self.current_day}"  # Set message
+        if self.loading:
+            return
+        # Queued, and recorded, as the point of the room clicked on
+        self.queue_input("mouse_press", *self.camera.to_room(x, y), button)
+
+    def queue_input(self, kind, *args):
+        """ Apply an input at the start of the next tick. Ignored while replaying. """
+        if not self.replayer:
+            self.pending_input.append((kind, args))
+
+    def apply_input(self, kind, args):
+        """ Apply one queued key or mouse input to the farm. """
+        player = self.farm.player
+        if kind == "key_press":
+            key = args[0]
+            if key == arcade.key.UP:
+                player.change_y = MOVEMENT_SPEED
+            elif key == arcade.key.DOWN:
+                player.change_y = -MOVEMENT_SPEED
+            elif key == arcade.key.LEFT:
+                player.change_x = -MOVEMENT_SPEED
+            elif key == arcade.key.RIGHT:
+                player.change_x = MOVEMENT_SPEED
+
+            # Switch tool with key press
+            if key == arcade.key.KEY_1:
+                self.farm.select_tool("watering_can")
+            elif key == arcade.key.KEY_2:
+                self.farm.select_tool("shovel")
+
+            # Use the tool on the nearest thing in reach
+            if key == INTERACT_KEY:
+                self.farm.interact()
+
+        elif kind == "key_release":
+            key = args[0]
+            if key == arcade.key.UP or key == arcade.key.DOWN:
+                player.change_y = 0
+            elif key == arcade.key.LEFT or key == arcade.key.RIGHT:
+                player.change_x = 0
+
+        elif kind == "mouse_press":
+            x, y, button = args
+            self.farm.click(x, y)
+
+        self.process_farm_events()
+
+    def process_farm_events(self):
+        """ Bring the sprites and messages up to date with what changed in the farm. """
+        for kind, room_index, obj in self.farm.drain_events():
+            if kind == "enter":
+                # Only the room on screen has sapling sprites
+                self.show_room(room_index)
+                continue
+            if kind == "evict":
+                # The farm packed the room away; its sprites are built again next time
+                room = self.rooms.pop(room_index, None)
+                if room:
+                    self.drop_room(room)
+                continue
+            if kind == "sleep":
+                self.day_message = f"Good morning!\nDay {obj}"  # Set message
                 self.show_day_message = True  # Trigger message display
                 self.message_timer = 3  # Set duration to show message
-                self.respawn_saplings_room0()
-                print("Going to bed for the night!")
-                self.grow_saplings()  # Check for growing saplings
-                return
-    def respawn_saplings_room0(self):
-        """Respawn saplings in room 0 at the start of the day at random locations"""
-        self.rooms[0].sapling_list = arcade.SpriteList() # Clear the sapling list
-        
-        daily_saplings = random.randint(1, 3)
-        print(f"Daily saplings: {daily_saplings}")
-
-        wall_positions = [
-            (1, 2), (1, 7), 
-            (2, 2), (2, 4), (2, 5), (2, 7),
-            (3, 2), (3, 3), (3, 4), (3, 7),
-            (4, 6), (4, 7),
-            (5, 1), (5, 2), (5, 3), (5, 4), (5, 6),
-            (6, 4), (6, 6), (6, 7),
-            (7, 1), (7, 3), (7, 4),
-            (8, 3), (8, 7),
-            (9, 2), (9, 3), (9, 4), (9, 5), (9, 7),
-            (10, 5), (10, 7),
-            (11, 2), (11, 4), (11, 5), (11, 7), (11, 8),
-            (12, 2)         
-        ]
-
-        # Find open positions in maze for saplings to grow
-        all_positions = [(x,y) for x in range(1, maze_width-1) for y in range(1, maze_height-1)]
-        open_positions = [pos for pos in all_positions if pos not in wall_positions]
-        chosen_positions = random.sample(open_positions, daily_saplings)
-
-        for x, y in chosen_positions:
-            sapling = Sapling(image_collected=":resources:images/tiles/mushroomRed.png",
-                              image_planted="textures/PPFE/tile_0075.png",
-                              image_watered="textures/PPFE/tile_0075.png",
-                              image_grown="textures/PPFE/tile_0057.png",
-                              scale=SPRITE_SCALING)
-            sapling.center_x = x * SPRITE_SIZE + 30
-            sapling.center_y = y * SPRITE_SIZE + 50
-
-            self.rooms[0].sapling_list.append(sapling)
-    def grow_saplings(self):
-        for sapling in self.rooms[self.current_room].sapling_list:
-            print(sapling.state)
-            if sapling.state == "watered":
-                sapling.grow()
-                print("Sapling grew!")
+                camera = self.camera
+                self.particles.scatter("bedtime", camera.left, camera.bottom, camera.width, camera.height,
+                                       BEDTIME_STARS, variant=obj)
+                if perf_log.isEnabledFor(logging.DEBUG):  # The stats take counting
+                    perf_log.debug("Sapling pool: %s", self.sapling_pool.stats())
+                    perf_log.debug("Static layers: %s", self.static_layers.stats())
+                    perf_log.debug("Particles: %s", self.particles.stats())
+                    perf_log.debug("World: %s", self.farm.rooms.stats())
+                if self.autosaver:
+                    self.autosaver.save(self.farm)
+                continue
+
+            room = self.rooms.get(room_index)
+            if room is None:
+                continue  # No sprites to update; they are created from the farm when shown
+
+            if kind == "spawn":
+                room.add_saplings(obj)
+
+            elif kind == "plant":
+                room.add_saplings([obj])
+
+            elif kind == "water":
+                room.update_saplings(obj)
+                room.update_dirt_patches()
+                if room.shown:
+                    store = room.state.crops
+                    self.particles.burst("splash", store.x[obj], store.y[obj])
+
+            elif kind == "grow":
+                room.update_saplings(obj)
+
+            elif kind == "soil":
+                room.update_dirt_patches()
+
+            elif kind == "clear":
+                room.clear_saplings()
+
+            elif kind in ("dig", "harvest"):
+                sapling = room.remove_sapling(obj)
+                if sapling is None:
+                    continue  # Not on screen
+
+                # Set message for sapling collection
+                if room_index == 0:  # Check if in room 1
+                    self.sapling_message = "Mystery sapling collected"
+                elif kind == "harvest":
+                    self.sapling_message = "Tomato collected"
+                else:
+                    self.sapling_message = "Sapling collected"
+                self.message_duration = 2  # Set duration for the message
+                self.message_position = (sapling.center_x, sapling.center_y)  # Position above sapling
+                if kind == "harvest":
+                    self.particles.burst("harvest", [sapling.center_x], [sapling.center_y])
 
     def on_update(self, delta_time):
-        """ Movement and game logic """
-
-        # Call update on all sprites (The sprites don't do much in this
-        # example though.)
-        self.physics_engine.update()
-
-        saplings_hit = arcade.check_for_collision_with_list(self.player_sprite, self.rooms[self.current_room].sapling_list)
-
+        """ Run as many fixed simulation ticks as the time since the last update covers. """
+        if self.loading:
+            self.update_loading()
+            return
+
+        self.tick_time += delta_time
+        ticks = 0
+        while self.tick_time >= TICK and ticks < MAX_TICKS_PER_UPDATE:
+            self.tick()
+            self.tick_time -= TICK
+            ticks += 1
+        if self.tick_time >= TICK:
+            self.tick_time = 0.0
+
+    def tick(self):
+        """ Movement and game logic for one fixed step """
+        profiler = self.profiler
+
+        with profiler.phase("input"):
+            if self.replayer:
+                inputs = self.replayer.inputs_for(self.tick_count)
+            else:
+                inputs = self.pending_input
+                self.pending_input = []
+            for kind, args in inputs:
+                if self.recording:
+                    self.recording.record(self.tick_count, kind, args)
+                self.apply_input(kind, args)
+
+        # Walk the player; the farm stops them at walls and moves them
+        # to another room when they walk through an exit.
+        with profiler.phase("movement"):
+            player = self.farm.player
+            self.previous_player_position = (player.x, player.y, self.current_room)
+            self.farm.move_player()
+            self.player_sprite.center_x = player.x
+            self.player_sprite.center_y = player.y
+
+        # What is within reach now, for auto-pickup and the prompt; only
+        # the tiles around the player are looked at
+        with profiler.phase("proximity"):
+            self.farm.update_proximity()
+
+        with profiler.phase("events"):
+            self.process_farm_events()
+
+        with profiler.phase("timers"):
+            self.update_message_timers(TICK)
+            self.particles.advance(TICK)
+
+        self.tick_count += 1
+        if self.replayer and self.replayer.done(self.tick_count):
+            self.finish_replay()
+
+    def finish_replay(self):
+        """ Check the replay ended where the recording did, and hand control back to the player. """
+        expected = self.replayer.recording.fingerprint
+        fingerprint = self.farm.fingerprint()
+        self.replay_matches = expected is None or fingerprint == expected
+        replay_log.log(logging.INFO if self.replay_matches else logging.ERROR,
+                       "Replay finished after %d ticks: state %s, recorded %s: %s", self.tick_count,
+                       fingerprint, expected, "match" if self.replay_matches else "MISMATCH")
+        self.replayer = None
+
+    def run_replay(self, draw=False):
+        """
+        Play the rest of the replay as fast as possible, drawing each tick
+        only if ``draw``. Returns whether it ended in the recorded state.
+        """
+        while self.replayer:
+            self.tick()
+            if draw:
+                self.on_draw()
+        return self.replay_matches
+
+    def save_recording(self):
+        """ Write the inputs so far, and the state they led to, to the recording file. """
+        self.recording.finish(self.tick_count, self.farm.fingerprint())
+        self.recording.save(self.record_path)
+        replay_log.info("Recorded %d ticks to %s", self.tick_count, self.record_path)
+
+    def on_close(self):
+        if self.recording:
+            self.save_recording()
+        if self.save_pool:
+            self.save_pool.shutdown(wait=True)  # Let the last autosave finish
+        super().on_close()
+
+    def update_message_timers(self, delta_time):
+        """ Fade out the day message and hide the sapling message when their time is up. """
         if self.show_day_message:
             self.message_timer -= delta_time
 
@@ -627,32 +920,35 @@ class MyGame(arcade.Window):
             if self.fade_out <=0:
                 self.show_day_message = False
 
-        # Do some logic here to figure out what room we are in, and if we need to go
-        # to a different room.
-        if self.player_sprite.center_x > SCREEN_WIDTH and self.current_room == 0:
-            self.current_room = 1
-            self.physics_engine = arcade.PhysicsEngineSimple(self.player_sprite,
-                                                             self.rooms[self.current_room].wall_list)
-            self.player_sprite.center_x = 0
-        elif self.player_sprite.center_x < 0 and self.current_room == 1:
-            self.current_room = 0
-            self.physics_engine = arcade.PhysicsEngineSimple(self.player_sprite,
-                                                             self.rooms[self.current_room].wall_list)
-            self.player_sprite.center_x = SCREEN_WIDTH
-        
         # Collecting sapling in room 1 message
         if self.message_duration >0:
             self.message_duration -= delta_time
             if self.message_duration <=0:
                 self.sapling_message = None
 
-    def dig_sapling(self):
-        self.sapling_counter += 1
-        print(f"Saplings collected: {self.sapling_counter}")
-
 def main():
     """ Main function """
-    window = MyGame(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    parser = argparse.ArgumentParser(description="Maysday")
+    parser.add_argument("--seed", type=int, help="seed for the farm, to play the same game again")
+    parser.add_argument("--record", metavar="PATH", help="record the session's inputs to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="play back a recorded session")
+    parser.add_argument("--new-game", action="store_true", help="start a new farm instead of loading the save")
+    parser.add_argument("--auto-pickup", action="store_true", help="pick up saplings by walking up to them")
+    parser.add_argument("--log", metavar="LEVELS", default="",
+                        help='log levels, e.g. "debug" or "growth=debug,input=warning"')
+    parser.add_argument("--log-file", metavar="PATH", help="write the log to PATH instead of stderr")
+    args = parser.parse_args()
+
+    setup_logging(args.log, path=args.log_file)
+
+    replay = Recording.load(args.replay) if args.replay else None
+    # The window changes to the game's directory, so fix the path first
+    record_path = os.path.abspath(args.record) if args.record else None
+    # Recorded and replayed sessions start from a new farm and are not saved
+    save_path = None if replay or record_path else SAVE_PATH
+    window = MyGame(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, seed=args.seed,
+                    record_path=record_path, replay=replay, save_path=save_path,
+                    load_saved=not args.new_game and args.seed is None, auto_pickup=args.auto_pickup)
     window.setup()
     arcade.run()
 
@@ -0,0 +1,201 @@
+"""
+Shared texture registry.
+
+Every image the game draws goes through ``textures.get(path)`` so each file is
+decoded and uploaded once, and sprites changing state only swap a reference
+to an already loaded ``arcade.Texture``.
+
+If build_assets.py has been run, the registry reads the images from the
+packed, pre-scaled atlas sheets listed in its manifest instead of the loose
+source files.
+
+``load_async`` decodes images on a thread pool; only creating the Texture
+objects (and uploading them) is left for the main thread.
+"""
+import json
+import os
+
+import arcade
+import PIL.Image
+
+ATLAS_DIR = os.path.join("textures", "atlas")
+ATLAS_MANIFEST = os.path.join(ATLAS_DIR, "manifest.json")
+MANIFEST_VERSION = 1
+
+
+class TextureRegistry:
+    """ Loads each image path once and hands out the shared Texture. """
+
+    def __init__(self):
+        self._textures = {}
+        self.hits = 0
+        self.misses = 0
+
+        # From the asset build: image path -> where it is packed
+        self._manifest = {}
+        self._sheet_files = []
+        self._sheets = {}  # Decoded atlas sheet file -> image, until release_sheets()
+        self.sheets_loaded = 0
+
+    def load_manifest(self, path=ATLAS_MANIFEST):
+        """
+        Load images from the atlas sheets listed in ``path`` from now on.
+        Returns False (and keeps using the loose files) if there is no
+        manifest or it was written by a different version of the build.
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path) as file:
+            data = json.load(file)
+        if data.get("version") != MANIFEST_VERSION:
+            return False
+
+        base = os.path.dirname(path)
+        self._sheet_files = [os.path.join(base, name) for name in data["sheets"]]
+        self._manifest = data["images"]
+        return True
+
+    def source_file(self, path):
+        """ The file ``path``'s pixels are decoded from: its atlas sheet or the image itself. """
+        entry = self._manifest.get(path)
+        if entry is not None:
+            return self._sheet_files[entry["sheet"]]
+        if path.startswith(":resources:"):
+            return str(arcade.resources.resolve_resource_path(path))
+        return path
+
+    def release_sheets(self):
+        """ Forget the decoded atlas sheets once everything has been cut out of them. """
+        self._sheets = {}
+
+    def _add(self, path, source_image):
+        """ Cut ``path`` out of its decoded source image and keep the Texture. """
+        entry = self._manifest.get(path)
+        if entry is None:
+            image = source_image
+        else:
+            x, y, width, height = entry["box"]
+            image = source_image.crop((x, y, x + width, y + height))
+            self._sheets[self._sheet_files[entry["sheet"]]] = source_image
+        texture = arcade.Texture(path, image)
+        self._textures[path] = texture
+        self.misses += 1
+        return texture
+
+    def _load(self, path):
+        source = self.source_file(path)
+        image = self._sheets.get(source)
+        if image is None:
+            image = decode_image(source)
+            if path in self._manifest:
+                self.sheets_loaded += 1
+        return self._add(path, image)
+
+    def scale(self, path, scale):
+        """
+        The sprite scale to use for ``path`` so it is drawn as if it were
+        ``scale`` times its source size, taking into account any scaling
+        already baked in by the asset build.
+        """
+        entry = self._manifest.get(path)
+        if entry is None:
+            return scale
+        return scale / entry["scale"]
+
+    def get(self, path):
+        """Return the texture for ``path``, loading it on first use."""
+        texture = self._textures.get(path)
+        if texture is not None:
+            self.hits += 1
+            return texture
+
+        return self._load(path)
+
+    def preload(self, paths):
+        """Load all the given paths up front so gameplay never hits the disk."""
+        for path in paths:
+            if path not in self._textures:
+                self._load(path)
+
+    def load_async(self, paths, executor):
+        """
+        Start decoding ``paths`` on ``executor`` and return a PendingLoad to
+        poll from the main thread until it is done.
+        """
+        return PendingLoad(self, paths, executor)
+
+    def __contains__(self, path):
+        return path in self._textures
+
+    def __len__(self):
+        return len(self._textures)
+
+    def memory_bytes(self):
+        """Approximate decoded size of all loaded textures (RGBA, 4 bytes per pixel)."""
+        return sum(texture.image.width * texture.image.height * 4
+                   for texture in self._textures.values())
+
+    def stats(self):
+        """Counters for tuning: loaded textures, cache hits/misses and memory."""
+        return {
+            "textures": len(self._textures),
+            "hits": self.hits,
+            "misses": self.misses,
+            "atlas_sheets": self.sheets_loaded,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+def decode_image(file_name):
+    """ Read and decode an image file to RGBA. Safe to call from worker threads. """
+    with PIL.Image.open(file_name) as image:
+        return image.convert("RGBA")
+
+
+class PendingLoad:
+    """
+    Textures being decoded on a thread pool. Each source file (a loose image
+    or an atlas sheet) is decoded once by a worker; ``poll()``, called from
+    the main thread, turns the finished ones into Textures.
+    """
+    def __init__(self, registry, paths, executor):
+        self.registry = registry
+        self._waiting = {}  # Source file -> paths cut out of it
+        for path in dict.fromkeys(paths):
+            if path not in registry:
+                self._waiting.setdefault(registry.source_file(path), []).append(path)
+        self.total = sum(len(paths) for paths in self._waiting.values())
+        self.loaded = 0
+        self._futures = {source: executor.submit(decode_image, source) for source in self._waiting}
+
+    @property
+    def progress(self):
+        """ Fraction of the textures that are ready, from 0 to 1. """
+        return self.loaded / self.total if self.total else 1.0
+
+    @property
+    def done(self):
+        return not self._futures
+
+    def poll(self):
+        """
+        Create the textures whose source has finished decoding, without
+        waiting for the rest. Returns the new textures so the caller can
+        upload them.
+        """
+        created = []
+        for source, future in list(self._futures.items()):
+            if not future.done():
+                continue
+            del self._futures[source]
+            image = future.result()  # Re-raises if the file could not be decoded
+            if source in self.registry._sheet_files:
+                self.registry.sheets_loaded += 1
+            for path in self._waiting.pop(source):
+                created.append(self.registry._add(path, image))
+        self.loaded += len(created)
+        return created
+
+
+# The one registry the whole game shares.
+textures = TextureRegistry()
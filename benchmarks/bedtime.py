@@ -0,0 +1,53 @@
+"""
+Time watering and going to bed on a farm with a lot of planted crops.
+
+    python benchmarks/bedtime.py [crops]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from farm import FLOOR_TILE, Farm, compile_room
+
+
+def make_farm(crops):
+    """ A farm with one square room holding ``crops`` planted dirt patches. """
+    side = int(crops ** 0.5) + 1
+    farm = Farm(events=False, room_files=[])
+    farm.add_room(compile_room({
+        "name": "field",
+        "tiles": [FLOOR_TILE * side] * side,
+        "dirt_patches": [[index % side, index // side] for index in range(crops)],
+    }))
+    farm.sapling_counter = crops
+    for patch in range(crops):
+        farm.plant(0, patch)
+    return farm
+
+
+def time_ms(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    crops = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    farm = make_farm(crops)
+    planted = farm.rooms[0].crops.ids()
+    print(f"{crops} crops planted")
+
+    print(f"nothing watered       sleep {time_ms(farm.sleep):8.2f} ms")
+
+    some = planted[:crops // 100]
+    print(f"1% watered            water {time_ms(lambda: farm.water(0, some)):8.2f} ms   "
+          f"sleep {time_ms(farm.sleep):8.2f} ms")
+
+    print(f"everything watered    water {time_ms(lambda: farm.water(0, planted)):8.2f} ms   "
+          f"sleep {time_ms(farm.sleep):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
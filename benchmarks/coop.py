@@ -0,0 +1,117 @@
+"""
+Run a co-op server with bots connected over loopback, and report the
+server's tick time and what each client receives.
+
+    python benchmarks/coop.py [players] [ticks] [saplings]
+
+The bots walk about and click at random. ``saplings`` extra saplings
+are scattered over the first room to start with. At the end the bots
+stop, and every client's copy of its room is checked against the
+server's; exits with status 1 if one does not match.
+"""
+import asyncio
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coop import TICK_RATE, CoopClient, CoopServer
+from farm import TOOLS
+
+
+async def bot(client, rng, stop):
+    """ Walk in a random direction for a while, click near the player now and then. """
+    while not stop.is_set():
+        client.move(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)))
+        if rng.random() < 0.3:
+            client.select_tool(rng.choice(TOOLS))
+        x, y = client.players.get(client.player_id, (100, 100))
+        client.click(x + rng.uniform(-40, 40), y + rng.uniform(-40, 40))
+        await asyncio.sleep(rng.uniform(0.05, 0.3))
+    client.move(0, 0)
+
+
+def mismatches(server, client):
+    """ How the client's copy of its room differs from the server's. """
+    problems = []
+    player = server.players[client.player_id]
+    if client.room != player.room:
+        return [f"room {client.room} != {player.room}"]
+    room = server.farm.rooms[player.room]
+    store = room.crops
+    crops = {int(crop): (int(min(store.x[crop], 65535)), int(min(store.y[crop], 65535)), int(store.state[crop]))
+             for crop in store.ids()}
+    if crops != client.crops:
+        problems.append(f"{len(crops)} crops, client has {len(client.crops)}")
+    moisture = (np.clip(room.patch_moisture(), 0, 1) * 255).astype(np.uint8)
+    patches = {index: (bool(room.patch_planted[index]), bool(room.patch_watered[index]), int(moisture[index]))
+               for index in range(len(room.patches))}
+    if patches != client.patches:
+        problems.append("patches differ")
+    players = {other.id: (np.float32(other.player.x), np.float32(other.player.y))
+               for other in server.players.values() if other.room == player.room}
+    if players != {key: (np.float32(x), np.float32(y)) for key, (x, y) in client.players.items()}:
+        problems.append(f"players {players} != {client.players}")
+    if (client.day, client.saplings, client.tomatoes) != (server.farm.current_day, server.farm.sapling_counter,
+                                                         server.farm.tomato_counter):
+        problems.append("counters differ")
+    return problems
+
+
+async def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    saplings = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    server = CoopServer(seed=1)
+    room = server.farm.rooms[0]
+    if saplings:
+        rng = np.random.default_rng(1)
+        room.add_crops(rng.uniform(0, room.pixel_width, saplings).tolist(),
+                       rng.uniform(0, room.pixel_height, saplings).tolist())
+    port = await server.start(port=0)
+
+    clients = []
+    for _ in range(players):
+        client = CoopClient()
+        await client.connect(port=port)
+        clients.append(client)
+    receivers = [asyncio.create_task(client.receive()) for client in clients]
+    stop = asyncio.Event()
+    bots = [asyncio.create_task(bot(client, random.Random(index), stop)) for index, client in enumerate(clients)]
+
+    await server.run(ticks, TICK_RATE)
+    stop.set()
+    await asyncio.gather(*bots)
+    await server.run(TICK_RATE, TICK_RATE)  # Let everything still queued go out
+    stats = server.stats()
+
+    seconds = (ticks + TICK_RATE) / TICK_RATE
+    received = [client.bytes_received for client in clients]
+    print(f"{players} players, {ticks} ticks, {len(room.crops)} crops in the first room")
+    print(f"tick {stats['tick_ms_mean']:.3f} ms mean, {stats['tick_ms_max']:.2f} ms max")
+    print(f"received per client: {np.mean(received) / seconds / 1024:.1f} KB/s mean, "
+          f"{max(received) / seconds / 1024:.1f} KB/s max, "
+          f"{np.mean([client.updates for client in clients]) / (ticks + TICK_RATE):.2f} updates/tick")
+
+    failed = False
+    for client in clients:
+        problems = mismatches(server, client)
+        if problems:
+            failed = True
+            print(f"player {client.player_id} in room {client.room}: {'; '.join(problems)}")
+    print("clients match the server" if not failed else "MISMATCH")
+
+    for client in clients:
+        await client.close()
+    await asyncio.gather(*receivers)
+    await server.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""
+Steps per second of a VectorFarmEnv with random actions, for growing
+numbers of worker processes.
+
+    python benchmarks/farm_env.py [envs] [steps]
+
+With one process per core, the steps per second should grow about as
+fast as the number of workers, up to the number of cores.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from farm_env import NOOP, SHOVEL, VectorFarmEnv
+
+
+def random_actions(rng, envs, rooms, height, width):
+    return np.column_stack([rng.integers(NOOP, SHOVEL + 1, envs), rng.integers(0, rooms, envs),
+                            rng.integers(0, width, envs), rng.integers(0, height, envs)])
+
+
+def main():
+    envs = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    cores = os.cpu_count() or 1
+    print(f"{envs} farms, {steps} steps, {cores} cores")
+
+    counts = [0] + [workers for workers in (1, 2, 4, 8, 16, 32) if workers <= cores]
+    single = None
+    for workers in counts:
+        with VectorFarmEnv(envs, workers=workers) as env:
+            rooms, _, height, width = env.observation_shape
+            rng = np.random.default_rng(0)
+            env.reset()
+            start = time.perf_counter()
+            for _ in range(steps):
+                env.step(random_actions(rng, envs, rooms, height, width))
+            per_second = envs * steps / (time.perf_counter() - start)
+        if workers == 1:
+            single = per_second
+        speedup = f"{per_second / single:5.2f}x" if single and workers else ""
+        print(f"{workers:3d} workers {per_second:10.0f} steps/s {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare the frame time of the retained HUD against the immediate-mode
+``arcade.draw_text`` HUD it replaced.
+
+    ARCADE_HEADLESS=1 python benchmarks/hud_frame_time.py [frames]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arcade
+
+import Maysday
+
+
+def draw_immediate_hud(game):
+    """ The HUD as on_draw and draw_sapling_counter used to draw it, every frame. """
+    hotbar_x = Maysday.SCREEN_WIDTH // 2
+    hotbar_y = 30
+    for idx, tool in enumerate(game.hotbar_icons):
+        icon_x = hotbar_x + (idx - 0.5) * 65
+        arcade.draw_texture_rectangle(icon_x, hotbar_y, 50, 50, game.hotbar_textures[tool])
+        if tool == game.current_tool:
+            arcade.draw_rectangle_outline(icon_x, hotbar_y, 60, 60, arcade.color.YELLOW, 3)
+
+    if game.show_day_message:
+        arcade.draw_text(game.day_message, Maysday.SCREEN_WIDTH // 2, Maysday.SCREEN_HEIGHT // 2,
+                         arcade.color.WHITE, 20, anchor_x="center", anchor_y="center")
+
+    icon_x = 30
+    icon_y = game.height - 10
+    box_width = 180
+    box_height = 30
+    box_x = icon_x - 20 + box_width / 2
+    box_y = icon_y - 15
+    arcade.draw_texture_rectangle(icon_x + box_width * 3 / 5, icon_y, 50, 50, game.sapling_icon)
+    arcade.draw_lrtb_rectangle_outline(box_x - box_width / 2, box_x + box_width / 2,
+                                       box_y + box_height / 2, box_y - box_height / 2,
+                                       arcade.color.WHITE)
+    arcade.draw_text(f"Saplings       {game.sapling_counter}",
+                     icon_x - 15, icon_y - 20, arcade.color.WHITE, 18)
+    if game.tomato_counter >= 1:
+        tomato_y = icon_y - 60
+        tomato_box_y = box_y - 60
+        arcade.draw_texture_rectangle(icon_x + box_width * 3 / 5, tomato_box_y, 25, 25, game.tomato_icon)
+        arcade.draw_lrtb_rectangle_outline(box_x - box_width / 2, box_x + box_width / 2,
+                                           tomato_box_y + box_height / 2, tomato_box_y - box_height / 2,
+                                           arcade.color.WHITE)
+        arcade.draw_text(f"Tomatoes      {game.tomato_counter}",
+                         icon_x - 15, tomato_y - 20, arcade.color.WHITE, 18)
+
+    if game.sapling_message:
+        arcade.draw_text(game.sapling_message, game.message_position[0], game.message_position[1],
+                         arcade.color.WHITE, 18, anchor_x="center", anchor_y="bottom")
+    if game.day_message:
+        alpha_value = int(255 * game.fade_out)
+        arcade.draw_text(game.day_message, Maysday.SCREEN_WIDTH // 2, Maysday.SCREEN_HEIGHT // 2,
+                         (255, 255, 255, alpha_value), 20, anchor_x="center", anchor_y="center")
+
+
+def draw_retained_hud(game):
+    game.hud.update(game.sapling_counter, game.tomato_counter, game.current_tool,
+                    game.sapling_message, game.message_position,
+                    game.day_message if game.show_day_message else None, game.fade_out)
+    game.hud.draw()
+
+
+def time_frames(game, draw_hud, frames):
+    """ Average milliseconds per frame spent drawing the HUD, GPU work included. """
+    for _ in range(10):
+        draw_hud(game)
+    game.ctx.finish()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw_hud(game)
+    game.ctx.finish()
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    game = Maysday.MyGame(Maysday.SCREEN_WIDTH, Maysday.SCREEN_HEIGHT, "HUD benchmark",
+                          async_loading=False)
+    game.setup()
+
+    # Everything on screen: both counters, a pickup message and the day message
+    game.farm.sapling_counter = 3
+    game.farm.tomato_counter = 2
+    game.sapling_message = "Tomato collected"
+    game.message_position = (400, 300)
+    game.day_message = "Good morning!\nDay 2"
+    game.show_day_message = True
+
+    immediate = time_frames(game, draw_immediate_hud, frames)
+    retained = time_frames(game, draw_retained_hud, frames)
+    print(f"immediate HUD: {immediate:.3f} ms/frame")
+    print(f"retained HUD:  {retained:.3f} ms/frame ({immediate / retained:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Time path finding and flow fields on a big maze-like room.
+
+    python benchmarks/navigation.py [side] [agents]
+
+The room is ``side`` x ``side`` tiles (256 by default) with a third of
+them walls, and a sapling on every 500th open tile. ``agents`` helpers
+(500 by default) look up their next step towards the saplings every frame.
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from farm import FLOOR_TILE, SPRITE_SIZE, WALL_TILE, Farm, compile_room
+import navigation
+
+
+def time_ms(function, repeat=1):
+    """ The best of ``repeat`` runs, in milliseconds. """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def make_room(side, wall_fraction=0.33, seed=1):
+    rng = random.Random(seed)
+    tiles = ["".join(WALL_TILE if rng.random() < wall_fraction else FLOOR_TILE for _ in range(side))
+             for _ in range(side)]
+    return compile_room({"name": "labyrinth", "tiles": tiles})
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    agents = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    farm = Farm(events=False, room_files=[])
+    room = farm.rooms[farm.add_room(make_room(side))]
+    open_tiles = np.flatnonzero(np.frombuffer(bytes(room.walls.cells), dtype=np.uint8) == 0)
+    targets = open_tiles[::500]
+    room.add_crops(((targets % side) * SPRITE_SIZE + SPRITE_SIZE / 2).tolist(),
+                   ((targets // side) * SPRITE_SIZE + SPRITE_SIZE / 2).tolist())
+    print(f"{side} x {side} tiles, {len(targets)} saplings, {agents} agents")
+
+    nav = None
+
+    def build():
+        nonlocal nav
+        navigation._layouts.clear()
+        room._navigation = None
+        nav = room.navigation()
+
+    print(f"nav grid              {time_ms(build):8.2f} ms")
+    print(f"flow field            {time_ms(room.crop_flow_field):8.2f} ms   "
+          f"cached {time_ms(room.crop_flow_field, 100):8.3f} ms")
+
+    rng = np.random.default_rng(1)
+    starts = open_tiles[rng.integers(len(open_tiles), size=100)]
+    goals = open_tiles[rng.integers(len(open_tiles), size=100)]
+    pairs = [((int(a % side), int(a // side)), (int(b % side), int(b // side))) for a, b in zip(starts, goals)]
+
+    def paths():
+        for start, goal in pairs:
+            nav.find_path(start, goal)
+
+    print(f"100 A* paths          {time_ms(paths):8.2f} ms   cached {time_ms(paths, 10):8.3f} ms")
+
+    picks = open_tiles[rng.integers(len(open_tiles), size=agents)]
+    xs = ((picks % side) * SPRITE_SIZE + SPRITE_SIZE / 2).astype(np.float64)
+    ys = ((picks // side) * SPRITE_SIZE + SPRITE_SIZE / 2).astype(np.float64)
+
+    def frame():
+        field = room.crop_flow_field()
+        step_columns, step_rows = field.steps(xs, ys)
+        xs[:] += step_columns
+        ys[:] += step_rows
+
+    print(f"{agents} agents per frame {time_ms(frame, 100):8.3f} ms")
+    print(nav.stats())
+
+
+if __name__ == "__main__":
+    main()
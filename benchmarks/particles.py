@@ -0,0 +1,70 @@
+"""
+Frame time with tens of thousands of particles alive, drawn headlessly.
+
+    python benchmarks/particles.py [particles] [frames]
+
+Each frame emits enough splashes, harvest bursts and bedtime stars all
+over the screen to keep about ``particles`` (50000 by default) alive,
+split between the effects by their capacity, then advances the clock
+and draws them, waiting for the GPU. On a GPU a frame should stay well
+under 16.7 ms; a software renderer spends most of it filling in pixels,
+so try fewer particles there.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["ARCADE_HEADLESS"] = "1"
+
+import arcade
+import numpy as np
+
+from particles import EFFECTS, ParticleSystem
+
+WIDTH, HEIGHT = 896, 640
+TICK = 1 / 60
+
+
+def percentile_ms(times, q):
+    return float(np.percentile(times, q)) * 1000
+
+
+def main():
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    window = arcade.Window(WIDTH, HEIGHT, "Particles benchmark")
+    particles = ParticleSystem(window.ctx, seed=1)
+    rng = np.random.default_rng(2)
+
+    # Particles per tick for each effect to keep its share of the target alive
+    capacity = sum(settings["capacity"] for settings in EFFECTS.values())
+    rates = {name: target * settings["capacity"] / capacity / (sum(settings["lifetime"]) / 2) * TICK
+             for name, settings in EFFECTS.items()}
+
+    emit_times = []
+    frame_times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        for name, rate in rates.items():
+            count = rng.poisson(rate)
+            particles.emitters[name].emit(rng.uniform(0, WIDTH, count), rng.uniform(0, HEIGHT, count),
+                                          particles.time)
+        emitted = time.perf_counter()
+        particles.advance(TICK)
+        window.clear()
+        particles.draw()
+        window.ctx.finish()
+        done = time.perf_counter()
+        emit_times.append(emitted - start)
+        frame_times.append(done - start)
+
+    alive = sum(stats["alive"] for stats in particles.stats().values())
+    print(f"{alive} particles alive in {len(EFFECTS)} effects")
+    print(f"emit    p50 {percentile_ms(emit_times, 50):7.2f} ms   p99 {percentile_ms(emit_times, 99):7.2f} ms")
+    print(f"frame   p50 {percentile_ms(frame_times, 50):7.2f} ms   p99 {percentile_ms(frame_times, 99):7.2f} ms"
+          f"   {frames / sum(frame_times):6.1f} fps")
+
+
+if __name__ == "__main__":
+    main()
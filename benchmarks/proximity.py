@@ -0,0 +1,75 @@
+"""
+Time keeping track of what is within reach of a walking player, against
+checking every sapling in the room each frame.
+
+    python benchmarks/proximity.py [side] [saplings]
+
+The room is ``side`` x ``side`` tiles (128 by default) with ``saplings``
+(20000 by default) scattered over it. The player walks across it for a
+few thousand frames; the time per frame should not grow with the number
+of saplings, only with how many are near the player.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from farm import FLOOR_TILE, MOVEMENT_SPEED, PICKUP_RANGE, SPRITE_SIZE, Farm, compile_room
+
+FRAMES = 3000
+EVERY_FRAMES = 100  # Checking every sapling is slow enough that a few frames tell
+
+
+def walk(side):
+    """ Player positions, frame by frame, zigzagging across the room at walking speed. """
+    rng = random.Random(2)
+    x = y = side * SPRITE_SIZE / 2
+    limit = side * SPRITE_SIZE - 1
+    change_x, change_y = MOVEMENT_SPEED, 0
+    for frame in range(FRAMES):
+        if frame % 60 == 0:
+            change_x, change_y = rng.choice([(MOVEMENT_SPEED, 0), (-MOVEMENT_SPEED, 0),
+                                             (0, MOVEMENT_SPEED), (0, -MOVEMENT_SPEED), (0, 0)])
+        x = min(max(x + change_x, 0), limit)
+        y = min(max(y + change_y, 0), limit)
+        yield x, y
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    saplings = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    farm = Farm(events=False, room_files=[])
+    room_index = farm.add_room(compile_room({"name": "field", "tiles": [FLOOR_TILE * side] * side}))
+    farm.enter_room(room_index)
+    room = farm.rooms[room_index]
+    rng = random.Random(1)
+    pixels = side * SPRITE_SIZE
+    room.add_crops([rng.uniform(0, pixels) for _ in range(saplings)],
+                   [rng.uniform(0, pixels) for _ in range(saplings)])
+    print(f"{side} x {side} tiles, {saplings} saplings, {FRAMES} frames")
+
+    path = list(walk(side))
+    player = farm.player
+    events = 0
+    start = time.perf_counter()
+    for player.x, player.y in path:
+        entered, left = farm.update_proximity()
+        events += len(entered) + len(left)
+    proximity = (time.perf_counter() - start) / FRAMES
+
+    store = room.crops
+    crops = store.ids().tolist()
+    xs, ys = store.x, store.y
+    start = time.perf_counter()
+    for x, y in path[:EVERY_FRAMES]:
+        [crop for crop in crops if (xs[crop] - x) ** 2 + (ys[crop] - y) ** 2 < PICKUP_RANGE ** 2]
+    every = (time.perf_counter() - start) / EVERY_FRAMES
+
+    print(f"proximity        {proximity * 1e6:10.1f} us/frame   {events / FRAMES:.2f} enter/exit per frame")
+    print(f"every sapling    {every * 1e6:10.1f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
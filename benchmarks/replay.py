@@ -0,0 +1,49 @@
+"""
+Replay a recorded session headlessly, as fast as it will go, and check it
+ends in the state it was recorded in.
+
+    python Maysday.py --record session.json    # play, then close the window
+    python benchmarks/replay.py session.json [--draw]
+
+Without --draw only the simulation runs; with it every tick is also drawn,
+which is the frame loop to profile. Exits with status 1 if the replay
+does not end where the recording did.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["ARCADE_HEADLESS"] = "1"
+
+import Maysday
+from game_log import setup_logging
+from replay import Recording
+
+SESSION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions", "first_harvest.json")
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    path = os.path.abspath(args[0] if args else SESSION)
+    draw = "--draw" in sys.argv
+
+    setup_logging("replay=info,warning")  # Only the replay's verdict
+    recording = Recording.load(path)
+    game = Maysday.MyGame(Maysday.SCREEN_WIDTH, Maysday.SCREEN_HEIGHT, "Replay",
+                          async_loading=False, replay=recording)
+    game.setup()
+
+    start = time.perf_counter()
+    matches = game.run_replay(draw=draw)
+    elapsed = time.perf_counter() - start
+
+    played = recording.ticks / Maysday.TICK_RATE
+    print(f"{recording.ticks} ticks ({played:.1f} s of play) in {elapsed:.2f} s: "
+          f"{recording.ticks / elapsed:.0f} ticks/s, {played / elapsed:.1f}x real time")
+    if not matches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
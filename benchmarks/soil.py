@@ -0,0 +1,50 @@
+"""
+Time the soil moisture simulation and the patch tints on a big field.
+
+    python benchmarks/soil.py [side]
+
+The field is ``side`` x ``side`` tiles (1000 x 1000 by default), all of
+them soil with a dirt patch on top.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from patch_layer import moisture_colors
+from soil import SoilGrid
+
+
+def time_ms(function, repeat=5):
+    """ The best of ``repeat`` runs, in milliseconds. """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rows, columns = np.divmod(np.arange(side * side), side)
+    soil = SoilGrid(side, side)
+    print(f"{side} x {side} tiles, add soil {time_ms(lambda: soil.add_soil(columns, rows), 1):8.2f} ms")
+
+    some = slice(0, side * side, 100)
+    print(f"water 1%              {time_ms(lambda: soil.water(columns[some], rows[some])):8.2f} ms")
+    print(f"rain                  {time_ms(lambda: soil.rain(0.5)):8.2f} ms")
+    print(f"one day               {time_ms(soil.step):8.2f} ms")
+    print(f"one tick (1/3600 day) {time_ms(lambda: soil.step(1 / 3600)):8.2f} ms")
+
+    tiles = rows * side + columns
+    colors = np.empty((side * side, 4), dtype=np.uint8)
+    tint = lambda: moisture_colors(soil.moisture.ravel().take(tiles), colors)
+    print(f"patch tints           {time_ms(tint):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Time from launch to the first frame on screen and to the first game frame,
+loading the textures on the main thread against decoding them on a thread
+pool behind the loading screen.
+
+Each run is a fresh process so nothing is already decoded.  With --cold the
+OS page cache is dropped before every run (needs root), so the image files
+really come off the disk.
+
+    ARCADE_HEADLESS=1 python benchmarks/startup.py [runs] [--cold]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child process: set up the game and pump frames until the first
+# real one (not the loading screen) has been drawn.
+RUN_GAME = """
+import Maysday
+game = Maysday.MyGame(Maysday.SCREEN_WIDTH, Maysday.SCREEN_HEIGHT, "Startup benchmark",
+                      async_loading={async_loading})
+game.setup()
+while game.ready_time is None:
+    game.on_update(1 / 60)
+    game.on_draw()
+print(game.first_frame_time * 1000, game.ready_time * 1000)
+"""
+
+
+def drop_caches():
+    """ Ask the kernel to forget cached file contents. Returns False if not allowed. """
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as file:
+            file.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def startup_times(async_loading, cold):
+    if cold and not drop_caches():
+        sys.exit("--cold needs permission to write /proc/sys/vm/drop_caches")
+    env = dict(os.environ, ARCADE_HEADLESS="1")
+    output = subprocess.run([sys.executable, "-c", RUN_GAME.format(async_loading=async_loading)],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    first_frame, game_frame = output.splitlines()[-1].split()
+    return float(first_frame), float(game_frame)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    runs = int(args[0]) if args else 5
+    cold = "--cold" in sys.argv
+
+    print(f"{runs} runs, {'cold' if cold else 'warm'} cache")
+    for name, async_loading in (("main thread", False), ("thread pool", True)):
+        first_frames, game_frames = zip(*[startup_times(async_loading, cold)
+                                          for _ in range(runs)])
+        for label, times in (("first frame", first_frames), ("game frame", game_frames)):
+            print(f"{name:12} {label:12} median {statistics.median(times):6.0f} ms   "
+                  f"min {min(times):6.0f} ms   max {max(times):6.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
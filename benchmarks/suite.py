@@ -0,0 +1,332 @@
+"""
+Headless benchmark suite.
+
+Drives MyGame in arcade's headless mode through synthetic scenarios much
+bigger than the real game: thousands of saplings on screen, a large maze,
+long click sequences, many nights in bed and a long walk through the
+generated rooms. Each scenario runs in its own
+process and reports frames per second, per-call latency (p50/p99) and the
+process's peak memory.
+
+Results are compared against benchmarks/baseline.json, and the suite exits
+with status 1 if any metric got worse by more than the threshold. Baselines
+depend on the machine, so save them again when moving to another one.
+
+    python benchmarks/suite.py                 # compare against the baseline
+    python benchmarks/suite.py --save          # write a new baseline
+    python benchmarks/suite.py --threshold 0.5 --only clicks day_cycles
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.25  # Fail if a metric is more than 25% worse than its baseline
+
+# Metrics ending like this are better when higher; all others when lower
+HIGHER_IS_BETTER = ("_fps", "_per_s")
+# Only these are checked for regressions; the rest (sizes, counts) are for information
+CHECKED = ("_fps", "_per_s", "_ms", "_mb")
+# Tail latencies are noisier, so they get this many times the threshold
+P99_SLACK = 2
+# Timings this close to their baseline are within the timer/scheduler noise
+NOISE_MS = 0.5
+
+
+def percentile_ms(times, q):
+    times = sorted(times)
+    return times[min(len(times) - 1, int(len(times) * q / 100))] * 1000
+
+
+def latency(name, times):
+    """ p50/p99 metrics in ms for a list of call durations in seconds. """
+    return {f"{name}_p50_ms": percentile_ms(times, 50), f"{name}_p99_ms": percentile_ms(times, 99)}
+
+
+def run_frames(game, frames):
+    """ Update and draw ``frames`` frames, waiting for the GPU each time. Returns their durations. """
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        game.on_update(1 / 60)
+        game.on_draw()
+        game.ctx.finish()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def frame_metrics(game, frames=300):
+    times = run_frames(game, frames)
+    return {"frame_fps": len(times) / sum(times), **latency("frame", times)}
+
+
+def teleport(game, x, y):
+    game.farm.player.x, game.farm.player.y = x, y
+    game.player_sprite.center_x, game.player_sprite.center_y = x, y
+
+
+def field_room(side, patches=True, wall_fraction=0.0, seed=1):
+    """ Room data for a ``side`` x ``side`` room, optionally full of dirt patches or random walls. """
+    from farm import FLOOR_TILE, WALL_TILE
+
+    rng = random.Random(seed)
+    tiles = ["".join(WALL_TILE if rng.random() < wall_fraction else FLOOR_TILE for _ in range(side))
+             for _ in range(side)]
+    data = {"name": "field", "background": "textures/Backgrounds/Grass.png", "tiles": tiles}
+    if patches:
+        data["dirt_patches"] = [[column, row] for row in range(side) for column in range(side)]
+        data["beds"] = [[side / 2, side / 2]]
+    return data
+
+
+def add_room(game, data):
+    """ Compile ``data`` into a new room of the game and enter it. Returns the build time in ms. """
+    from farm import compile_room
+
+    start = time.perf_counter()
+    room_index = game.farm.add_room(compile_room(data))
+    game.farm.enter_room(room_index)
+    game.process_farm_events()  # Creates the room's sprites
+    return (time.perf_counter() - start) * 1000
+
+
+def draw_saplings(game, count=2000):
+    """ Thousands of saplings on screen at once. Most of the frame is the GPU filling them in. """
+    import Maysday
+
+    rng = random.Random(1)
+    state = game.farm.rooms[game.current_room]
+    xs = [rng.uniform(0, Maysday.SCREEN_WIDTH) for _ in range(count)]
+    ys = [rng.uniform(0, Maysday.SCREEN_HEIGHT) for _ in range(count)]
+    game.farm._emit("spawn", game.current_room, state.add_crops(xs, ys))
+
+    start = time.perf_counter()
+    game.process_farm_events()
+    show_ms = (time.perf_counter() - start) * 1000
+    return {"saplings": len(state.crops), "show_ms": show_ms, **frame_metrics(game, frames=60)}
+
+
+def large_maze(game, side=200):
+    """ A big maze: building its sprites, walking through it and drawing it. """
+    build_ms = add_room(game, field_room(side, patches=False, wall_fraction=0.3))
+    state = game.farm.rooms[game.current_room]
+    teleport(game, state.pixel_width / 2, state.pixel_height / 2)
+
+    rng = random.Random(2)
+    player = game.farm.player
+    moves = []
+    for _ in range(2000):
+        player.change_x = rng.choice((-5, 0, 5))
+        player.change_y = rng.choice((-5, 0, 5))
+        start = time.perf_counter()
+        game.farm.move_player()
+        moves.append(time.perf_counter() - start)
+    player.change_x = player.change_y = 0
+    teleport(game, state.pixel_width / 2, state.pixel_height / 2)
+
+    return {"walls": len(state.walls), "build_ms": build_ms,
+            **latency("move", moves), **frame_metrics(game)}
+
+
+def clicks(game, count=5000, side=40):
+    """ A long sequence of plant/water/dig clicks over a field of dirt patches. """
+    import arcade
+    from farm import SPRITE_SIZE
+
+    add_room(game, field_room(side))
+    game.farm.sapling_counter = count
+    rng = random.Random(3)
+    keys = (arcade.key.KEY_1, arcade.key.KEY_2)
+    times = []
+    for _ in range(count):
+        if rng.random() < 0.3:
+            game.on_key_press(rng.choice(keys), 0)
+        # Aim at a patch, standing next to it; beds are left alone
+        x = rng.randrange(side) * SPRITE_SIZE
+        y = rng.randrange(side) * SPRITE_SIZE
+        if abs(x - side * SPRITE_SIZE / 2) < 200 and abs(y - side * SPRITE_SIZE / 2) < 200:
+            continue
+        teleport(game, x - 40, y)
+        start = time.perf_counter()
+        game.queue_input("mouse_press", x, y, arcade.MOUSE_BUTTON_LEFT)  # A point of the room, not the screen
+        game.tick()  # Input is applied on the next tick
+        times.append(time.perf_counter() - start)
+    return {"clicks": len(times), "crops": len(game.farm.rooms[game.current_room].crops),
+            **latency("click", times)}
+
+
+def day_cycles(game, nights=300, side=40):
+    """
+    Going to bed night after night in a field of crops: all of them grow the
+    first night, after that the schedule has nothing due.
+    """
+    import arcade
+
+    add_room(game, field_room(side))
+    farm = game.farm
+    room_index = farm.current_room
+    state = farm.rooms[room_index]
+    farm.sapling_counter = len(state.patches)
+    for patch in range(len(state.patches)):
+        farm.plant(room_index, patch)
+    game.process_farm_events()
+
+    bed = state.beds[0]
+    teleport(game, bed.x - 40, bed.y)
+    crops = state.crops.ids()
+    times = []
+    for _ in range(nights):
+        farm.water(room_index, crops)  # Only the ones still just planted start growing
+        game.process_farm_events()
+        start = time.perf_counter()
+        game.queue_input("mouse_press", bed.x, bed.y, arcade.MOUSE_BUTTON_LEFT)
+        game.tick()
+        times.append(time.perf_counter() - start)
+
+    # The same nights without anything drawing them
+    from farm import Farm
+
+    headless = Farm(seed=4, events=False)
+    start = time.perf_counter()
+    headless.fast_forward(10_000)
+    headless_per_s = 10_000 / (time.perf_counter() - start)
+
+    return {"crops": len(state.crops), **latency("sleep", times), "headless_nights_per_s": headless_per_s}
+
+
+def world_walk(game, rooms=1000, memory_budget=256 * 1024):
+    """
+    Walking from room to room through the wilds with a small memory budget,
+    so most rooms get packed away behind the player. Each step prefetches
+    the next room, draws a frame, then walks in.
+    """
+    from farm import wild_room_name
+
+    farm = game.farm
+    farm.rooms.memory_budget = memory_budget
+    enters = []
+    first_frames = []
+    for step in range(rooms):
+        x, y = 1 + step // 32, step % 32
+        name = wild_room_name(x, y if x % 2 else 31 - y)  # Up one column, down the next
+        farm.rooms.prefetch(name)
+        run_frames(game, 1)
+        start = time.perf_counter()
+        farm.enter_room(farm.rooms.index_of(name))
+        game.process_farm_events()
+        entered = time.perf_counter()
+        game.on_draw()
+        game.ctx.finish()
+        enters.append(entered - start)
+        first_frames.append(time.perf_counter() - entered)
+        game.ctx.gc()  # Normally done when the window flips
+    stats = farm.rooms.stats()
+    return {"rooms": stats["rooms"], "resident": stats["resident"],
+            "world_memory_kb": stats["memory_bytes"] / 1024, **latency("enter", enters),
+            **latency("first_frame", first_frames)}
+
+
+SCENARIOS = {
+    "draw_saplings": draw_saplings,
+    "large_maze": large_maze,
+    "clicks": clicks,
+    "day_cycles": day_cycles,
+    "world_walk": world_walk,
+}
+
+
+def run_scenario(name):
+    """ Run one scenario in this process and print its metrics as JSON. """
+    os.environ["ARCADE_HEADLESS"] = "1"
+    sys.path.insert(0, ROOT)
+    import contextlib
+    import Maysday
+
+    random.seed(0)
+    with contextlib.redirect_stdout(sys.stderr):  # Keep the game's prints out of the results
+        game = Maysday.MyGame(Maysday.SCREEN_WIDTH, Maysday.SCREEN_HEIGHT, f"Benchmark: {name}",
+                              async_loading=False)
+        game.setup()
+        metrics = SCENARIOS[name](game)
+    metrics["peak_memory_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(metrics))
+
+
+def run_all(names):
+    results = {}
+    for name in names:
+        output = subprocess.run([sys.executable, __file__, "--run-scenario", name], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        results[name] = json.loads(output.splitlines()[-1])
+    return results
+
+
+def is_worse(metric, value, baseline, threshold):
+    if not metric.endswith(CHECKED):
+        return False
+    if metric.endswith("_ms") and abs(value - baseline) < NOISE_MS:
+        return False
+    if "_p99_" in metric:
+        threshold *= P99_SLACK
+    if metric.endswith(HIGHER_IS_BETTER):
+        return value < baseline * (1 - threshold)
+    return value > baseline * (1 + threshold)
+
+
+def compare(results, baselines, threshold):
+    """ Print every metric next to its baseline and return the ones that regressed. """
+    regressions = []
+    for name, metrics in results.items():
+        print(name)
+        baseline = baselines.get(name, {})
+        for metric, value in metrics.items():
+            line = f"  {metric:24} {value:12.3f}"
+            if metric in baseline:
+                change = (value - baseline[metric]) / baseline[metric] if baseline[metric] else 0.0
+                line += f"   baseline {baseline[metric]:12.3f} ({change:+.0%})"
+                if is_worse(metric, value, baseline[metric], threshold):
+                    line += "  REGRESSION"
+                    regressions.append((name, metric))
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="how much worse than the baseline a metric may get (0.25 = 25%%)")
+    parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="scenarios to run")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        run_scenario(args.run_scenario)
+        return
+
+    results = run_all(args.only or list(SCENARIOS))
+
+    baselines = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            baselines = json.load(file)
+    regressions = compare(results, baselines, args.threshold)
+
+    if args.save:
+        baselines.update(results)
+        with open(BASELINE, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {BASELINE}")
+    elif regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
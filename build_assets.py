@@ -0,0 +1,140 @@
+"""
+Build-time asset step.
+
+Packs every sprite Maysday draws into atlas sheets, pre-scales images to the
+size they are actually drawn at, and writes textures/atlas/manifest.json,
+which the game loads at startup (see assets.TextureRegistry).
+
+    python build_assets.py
+
+Run it again after changing or adding any of the images. If the atlas is
+missing the game falls back to the loose image files.
+"""
+import json
+import os
+
+import arcade
+import PIL.Image
+
+import Maysday
+from assets import ATLAS_DIR, ATLAS_MANIFEST, MANIFEST_VERSION
+from farm import ROOM_FILES, SPRITE_SCALING, WILD_BACKGROUND
+
+SHEET_SIZE = 1024
+PADDING = 2  # Empty pixels around each packed image
+
+# Sprites always drawn at one scale get that scale baked in. Crop images are
+# left at their source size because one sprite swaps between them and keeps
+# its scale, and the tiny PPFE tiles are drawn scaled up anyway.
+BAKED_SCALES = {
+    Maysday.WALL_IMAGE: SPRITE_SCALING,
+    Maysday.PLAYER_IMAGE: SPRITE_SCALING,
+    Maysday.BED_IMAGE: Maysday.BED_SCALING,
+}
+
+
+def resolve(path):
+    """ File name for a game image path, including arcade's :resources: ones. """
+    if path.startswith(":resources:"):
+        return str(arcade.resources.resolve_resource_path(path))
+    return path
+
+
+def room_backgrounds():
+    """ The room files' backgrounds and the wilds'. """
+    backgrounds = [WILD_BACKGROUND]
+    for path in ROOM_FILES:
+        with open(path) as file:
+            background = json.load(file).get("background")
+        if background and background not in backgrounds:
+            backgrounds.append(background)
+    return backgrounds
+
+
+def load_image(path, scale=1.0, size=None):
+    image = PIL.Image.open(resolve(path)).convert("RGBA")
+    if size is None and scale != 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if size is not None and size != image.size:
+        image = image.resize(size, PIL.Image.Resampling.LANCZOS)
+    return image
+
+
+def pack(images):
+    """
+    Shelf-pack ``{path: image}`` onto as few SHEET_SIZE sheets as needed,
+    tallest images first. Returns the sheets and ``{path: (sheet, box)}``.
+    """
+    sheets = []
+    placements = {}
+    x = y = shelf_height = 0
+    sheet = None
+
+    for path, image in sorted(images.items(), key=lambda item: -item[1].height):
+        width = image.width + 2 * PADDING
+        height = image.height + 2 * PADDING
+        if width > SHEET_SIZE or height > SHEET_SIZE:
+            raise ValueError(f"{path} is too big for a {SHEET_SIZE}px atlas sheet")
+
+        if sheet is not None and x + width > SHEET_SIZE:
+            # Start a new shelf
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        if sheet is None or y + height > SHEET_SIZE:
+            sheet = PIL.Image.new("RGBA", (SHEET_SIZE, SHEET_SIZE))
+            sheets.append(sheet)
+            x = y = shelf_height = 0
+
+        sheet.paste(image, (x + PADDING, y + PADDING))
+        placements[path] = (len(sheets) - 1, (x + PADDING, y + PADDING, image.width, image.height))
+        x += width
+        shelf_height = max(shelf_height, height)
+
+    # Don't store the empty bottom of the last sheet
+    if sheets:
+        sheets[-1] = sheets[-1].crop((0, 0, SHEET_SIZE, y + shelf_height))
+    return sheets, placements
+
+
+def main():
+    os.makedirs(ATLAS_DIR, exist_ok=True)
+    manifest = {"version": MANIFEST_VERSION, "sheets": [], "images": {}}
+
+    sprites = {}
+    for path in dict.fromkeys(Maysday.PRELOAD_TEXTURES):
+        sprites[path] = load_image(path, BAKED_SCALES.get(path, 1.0))
+
+    sheets, placements = pack(sprites)
+    for index, sheet in enumerate(sheets):
+        name = f"atlas_{index}.png"
+        sheet.save(os.path.join(ATLAS_DIR, name), optimize=True)
+        manifest["sheets"].append(name)
+    for path, (sheet_index, box) in placements.items():
+        manifest["images"][path] = {"sheet": sheet_index, "box": box,
+                                    "scale": BAKED_SCALES.get(path, 1.0)}
+
+    # Backgrounds are stretched over the whole window, so store them at that size
+    for index, path in enumerate(room_backgrounds()):
+        image = load_image(path, size=(Maysday.SCREEN_WIDTH, Maysday.SCREEN_HEIGHT))
+        if path.lower().endswith((".jpg", ".jpeg")):
+            name = f"background_{index}.jpg"
+            image.convert("RGB").save(os.path.join(ATLAS_DIR, name), quality=90)
+        else:
+            name = f"background_{index}.png"
+            image.save(os.path.join(ATLAS_DIR, name), optimize=True)
+        manifest["images"][path] = {"sheet": len(manifest["sheets"]),
+                                    "box": [0, 0, image.width, image.height],
+                                    "scale": image.width / PIL.Image.open(resolve(path)).width}
+        manifest["sheets"].append(name)
+
+    with open(ATLAS_MANIFEST, "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    total = sum(os.path.getsize(os.path.join(ATLAS_DIR, name)) for name in manifest["sheets"])
+    print(f"Packed {len(manifest['images'])} images into {len(manifest['sheets'])} files "
+          f"({total // 1024} KB) in {ATLAS_DIR}")
+
+
+if __name__ == "__main__":
+    main()
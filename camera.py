@@ -0,0 +1,68 @@
+"""
+Which part of a room is on screen.
+
+A Camera is a window-sized view that follows the player around a room,
+stopping at the room's edges; a room smaller than the window is shown in
+the middle of it. Rooms are drawn in square chunks of CHUNK_TILES x
+CHUNK_TILES tiles, and only the chunks the view overlaps are drawn at all,
+so a frame costs a screenful of the room however big the room is.
+
+Positions are in pixels, (0, 0) at the bottom left of the room for the
+room and of the window for the screen.
+
+Nothing here imports arcade.
+"""
+import math
+
+CHUNK_TILES = 16
+
+# Chunks this close to the view count as in it, so sprites sticking out
+# of a chunk next to the view are not cut off
+CULL_MARGIN = 128
+
+
+class Camera:
+    """ A ``width`` x ``height`` view of a room, with its bottom left corner at (left, bottom) in the room. """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.left = 0
+        self.bottom = 0
+
+    def follow(self, x, y, room_width, room_height):
+        """ Centre the view on (x, y), as far as the edges of a ``room_width`` x ``room_height`` room allow. """
+        self.left = self._clamp(x, self.width, room_width)
+        self.bottom = self._clamp(y, self.height, room_height)
+
+    @staticmethod
+    def _clamp(centre, view, room):
+        if room <= view:
+            return (room - view) // 2
+        # Whole pixels, so the room does not shimmer as the view moves
+        return int(min(max(centre - view / 2, 0), room - view))
+
+    @property
+    def projection(self):
+        """ (left, right, bottom, top) of the view, as an orthographic projection. """
+        return self.left, self.left + self.width, self.bottom, self.bottom + self.height
+
+    def to_room(self, x, y):
+        """ The point of the room under screen position (x, y). """
+        return x + self.left, y + self.bottom
+
+    def to_screen(self, x, y):
+        """ Where the point (x, y) of the room is on screen. """
+        return x - self.left, y - self.bottom
+
+    def chunks(self, chunk_size, columns, rows):
+        """
+        (column, row) of every chunk of ``chunk_size`` pixels the view
+        overlaps, in a room ``columns`` x ``rows`` chunks big.
+        """
+        first_column = max(int((self.left - CULL_MARGIN) // chunk_size), 0)
+        last_column = min(math.ceil((self.left + self.width + CULL_MARGIN) / chunk_size) - 1, columns - 1)
+        first_row = max(int((self.bottom - CULL_MARGIN) // chunk_size), 0)
+        last_row = min(math.ceil((self.bottom + self.height + CULL_MARGIN) / chunk_size) - 1, rows - 1)
+        return [(column, row) for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)]
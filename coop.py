@@ -0,0 +1,511 @@
+"""
+Local co-op.
+
+A CoopServer owns the one Farm everybody plays on and runs it in fixed
+ticks on an asyncio loop. Clients connect over TCP (on localhost, or
+anywhere else), send their inputs, and get back only what changed in the
+room their player is in:
+
+    players   players in the room that moved, and those who left it
+    crops     crops that were added or changed state, and those removed
+    patches   planted and watered flags and soil moisture that changed
+    counters  the day, the shared saplings and tomatoes, the player's tool
+
+Updates are worked out from the farm's events, not by comparing states:
+a tick in which nothing happened costs nothing, and a tick that changed a
+few crops sends those few. What is sent is the crop's current state, so
+a client that missed some changes (see below) is brought up to date by
+the next message about that crop. When a player enters a room, their
+client is sent the whole room.
+
+To keep bandwidth bounded however busy the farm gets, each message holds
+at most MAX_RECORDS crops and patches; the rest wait in the client's
+queue for the next ticks. Clients whose connection is not keeping up get
+nothing more until it has drained.
+
+Every message is a uint32 length and then the body. Longer messages than
+the other side ever sends (MAX_INPUT and MAX_UPDATE bytes) close the
+connection instead of being read. A server message
+starts with its type, the tick, and flags for the optional parts; the
+records follow as packed arrays (the dtypes below). Bodies bigger than
+COMPRESS_OVER bytes, such as a whole room, are zlib compressed.
+
+    python coop.py [--port 7777] [--seed 1]
+
+runs a server. The players share one inventory; each has their own room,
+position and tool. Nothing here imports arcade.
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from crops import NO_PATCH
+from farm import MOVEMENT_SPEED, START_POSITION, TOOLS, Farm, Player
+from game_log import perf_log, setup_logging
+
+TICK_RATE = 60
+DEFAULT_PORT = 7777
+
+MAX_RECORDS = 2048  # Crops and patches per message, each; the rest are sent on the next ticks
+MAX_BUFFERED = 256 * 1024  # Skip clients with this many bytes still waiting to go out
+COMPRESS_OVER = 1024
+
+LENGTH = struct.Struct("<I")
+
+# Server messages
+WELCOME, UPDATE = 1, 2
+WELCOME_BODY = struct.Struct("<BH")  # type, player id
+UPDATE_HEADER = struct.Struct("<BIB")  # type, tick, flags
+ROOM_CHANGED, HAS_COUNTERS, COMPRESSED = 1, 2, 4
+ROOM = struct.Struct("<H")  # The room the player is now in, if ROOM_CHANGED
+COUNTERS = struct.Struct("<IiiB")  # day, saplings, tomatoes, tool
+COUNTS = struct.Struct("<HHIII")  # players, players gone, crops, crops removed, patches
+PLAYER_DTYPE = np.dtype([("id", "<u2"), ("x", "<f4"), ("y", "<f4")])
+CROP_DTYPE = np.dtype([("id", "<u4"), ("x", "<u2"), ("y", "<u2"), ("state", "u1")])
+PATCH_DTYPE = np.dtype([("index", "<u4"), ("flags", "u1"), ("moisture", "u1")])
+PLANTED_FLAG, WATERED_FLAG = 1, 2
+
+# Client messages
+MOVE, CLICK, TOOL = 1, 2, 3
+MOVE_BODY = struct.Struct("<Bbb")  # type, x and y direction (-1, 0 or 1)
+CLICK_BODY = struct.Struct("<Bff")  # type, x, y
+TOOL_BODY = struct.Struct("<BB")  # type, index into TOOLS
+INPUT_BODIES = {MOVE: MOVE_BODY, CLICK: CLICK_BODY, TOOL: TOOL_BODY}
+
+# Longest messages read, in bytes: any client message, and a whole room
+MAX_INPUT = max(layout.size for layout in INPUT_BODIES.values())
+MAX_UPDATE = 64 * 1024 * 1024
+
+
+def frame(body):
+    return LENGTH.pack(len(body)) + body
+
+
+async def read_frame(reader, max_length):
+    """
+    The body of the next message, or None once the connection is closed or
+    the message is longer than ``max_length`` bytes.
+    """
+    try:
+        (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+        if length > max_length:
+            perf_log.warning("Message of %d bytes is longer than %d, closing the connection", length, max_length)
+            return None
+        return await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+class RoomChanges:
+    """ What changed in one room during a tick. """
+    __slots__ = ("crops", "patches", "cleared")
+
+    def __init__(self):
+        self.crops = []  # Arrays and ids of crops that changed
+        self.patches = []
+        self.cleared = False  # Every crop was removed (before any added since)
+
+
+class CoopPlayer:
+    """
+    A connected player: their Player, room and tool, the inputs waiting
+    for the next tick, and what their client has been sent.
+    """
+
+    def __init__(self, player_id, writer, room=0):
+        self.id = player_id
+        self.writer = writer
+        self.player = Player(*START_POSITION)
+        self.room = room
+        self.tool = TOOLS[0]
+        self.inputs = []
+
+        # Sent to the client so far, or still to send
+        self.sent_room = None
+        self.sent_counters = None
+        self.sent_players = {}  # Player id -> (x, y) last sent
+        self.pending_crops = {}  # Crop ids to send, in order (the values are unused)
+        self.pending_patches = {}
+        self.clear_room = False
+        self.bytes_sent = 0
+
+
+class CoopServer:
+    """
+    The authoritative farm and the players connected to it. ``tick()``
+    advances the game by one step and sends every client its update; it
+    is called by ``run`` on a timer, or directly in tests.
+    """
+    def __init__(self, farm=None, seed=None):
+        self.farm = farm or Farm(seed=seed)
+        self.farm.drain_events()
+        self.players = {}  # Player id -> CoopPlayer
+        self.next_id = 1
+        self.tick_count = 0
+        self.tick_times = []  # Seconds each tick took, since the last stats()
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """ Start listening; returns the port, useful with ``port=0``. """
+        self.server = await asyncio.start_server(self._serve, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def run(self, ticks=None, tick_rate=TICK_RATE):
+        """ Tick at ``tick_rate`` until cancelled, or for ``ticks`` ticks. """
+        loop = asyncio.get_running_loop()
+        step = 1 / tick_rate
+        next_tick = loop.time()
+        while ticks is None or ticks > 0:
+            self.tick()
+            if ticks is not None:
+                ticks -= 1
+            next_tick += step
+            delay = next_tick - loop.time()
+            if delay < 0:
+                next_tick = loop.time()  # Running late: drop time rather than catch up
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for coop_player in list(self.players.values()):
+            coop_player.writer.close()
+
+    async def _serve(self, reader, writer):
+        coop_player = CoopPlayer(self.next_id, writer)  # In the first room, where everybody starts
+        self.next_id += 1
+        self.players[coop_player.id] = coop_player
+        self._pin_rooms()
+        writer.write(frame(WELCOME_BODY.pack(WELCOME, coop_player.id)))
+        perf_log.info("Player %d joined", coop_player.id)
+        try:
+            while True:
+                body = await read_frame(reader, MAX_INPUT)
+                if body is None:
+                    break
+                coop_player.inputs.append(body)
+        finally:
+            del self.players[coop_player.id]
+            self._pin_rooms()
+            writer.close()
+            perf_log.info("Player %d left", coop_player.id)
+
+    def _pin_rooms(self):
+        self.farm.rooms.pinned = {coop_player.room for coop_player in self.players.values()}
+
+    def _act_as(self, coop_player):
+        """ Point the farm's current room and tool at a player's, so its rules act for them. """
+        farm = self.farm
+        farm.current_room = farm.rooms.current = coop_player.room
+        farm.current_tool = coop_player.tool
+
+    def _apply_input(self, coop_player, body):
+        """ Apply one client message. Raises ValueError if it is not one the client could have sent. """
+        kind = body[0] if body else None
+        layout = INPUT_BODIES.get(kind)
+        if layout is None or len(body) != layout.size:
+            raise ValueError(f"Not a message: {len(body)} bytes, type {kind}")
+        _, *values = layout.unpack(body)
+        player = coop_player.player
+        if kind == MOVE:
+            x, y = values
+            player.change_x = max(-1, min(1, x)) * MOVEMENT_SPEED
+            player.change_y = max(-1, min(1, y)) * MOVEMENT_SPEED
+        elif kind == CLICK:
+            x, y = values
+            if not (math.isfinite(x) and math.isfinite(y)):
+                raise ValueError("Click off the map")
+            room = self.farm.rooms[coop_player.room]
+            x = max(0.0, min(room.pixel_width, x))
+            y = max(0.0, min(room.pixel_height, y))
+            self._act_as(coop_player)
+            self.farm.click(x, y, player)
+        elif kind == TOOL:
+            tool, = values
+            if tool < len(TOOLS):
+                coop_player.tool = TOOLS[tool]
+
+    def tick(self):
+        """ Apply everyone's inputs, move everyone, and send each client what changed in its room. """
+        start = time.perf_counter()
+        farm = self.farm
+        for coop_player in list(self.players.values()):
+            inputs, coop_player.inputs = coop_player.inputs, []
+            for body in inputs:
+                # A bad message is dropped; it must not stop the farm for everybody else
+                try:
+                    self._apply_input(coop_player, body)
+                except Exception:
+                    perf_log.warning("Player %d sent a malformed message: %r", coop_player.id, body,
+                                     exc_info=True)
+            self._act_as(coop_player)
+            farm.move_player(coop_player.player)
+            coop_player.room = farm.current_room
+        self._pin_rooms()
+
+        changes = self._changes(farm.drain_events())
+        by_room = {}
+        for coop_player in self.players.values():
+            by_room.setdefault(coop_player.room, []).append(coop_player)
+        for coop_player in list(self.players.values()):
+            self._send_update(coop_player, changes.get(coop_player.room), by_room[coop_player.room])
+        self.tick_count += 1
+        self.tick_times.append(time.perf_counter() - start)
+
+    def _changes(self, events):
+        """ RoomChanges by room index, from a tick's farm events. """
+        changes = {}
+        for kind, room_index, obj in events:
+            if kind in ("tool", "sleep", "enter", "evict"):
+                continue
+            # Nobody is in a room that is not resident, and loading it would undo the memory budget
+            room = self.farm.rooms.get_loaded(room_index)
+            if room is None:
+                continue
+            room_changes = changes.get(room_index)
+            if room_changes is None:
+                room_changes = changes[room_index] = RoomChanges()
+            if kind == "clear":
+                room_changes.cleared = True
+                room_changes.crops = []
+            elif kind == "soil":
+                room_changes.patches.append(np.arange(len(room.patches)))
+            elif obj is not None:
+                crops = np.atleast_1d(np.asarray(obj, dtype=np.int64))
+                room_changes.crops.append(crops)
+                patches = room.crops.patch[crops]
+                room_changes.patches.append(patches[patches != NO_PATCH])
+        return changes
+
+    def _send_update(self, coop_player, room_changes, roommates):
+        farm = self.farm
+        room = farm.rooms[coop_player.room]
+        if coop_player.sent_room != coop_player.room:
+            # New room: forget what was sent about the old one and queue all of this one
+            coop_player.sent_room = coop_player.room
+            coop_player.sent_players = {}
+            coop_player.clear_room = True
+            coop_player.pending_crops = dict.fromkeys(room.crops.ids().tolist())
+            coop_player.pending_patches = dict.fromkeys(range(len(room.patches)))
+        elif room_changes is not None:
+            if room_changes.cleared:
+                coop_player.clear_room = True
+                coop_player.pending_crops = {}
+            for crops in room_changes.crops:
+                coop_player.pending_crops.update(dict.fromkeys(crops.tolist()))
+            for patches in room_changes.patches:
+                coop_player.pending_patches.update(dict.fromkeys(patches.tolist()))
+
+        if coop_player.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            return  # Still sending earlier updates; everything stays queued
+
+        flags = 0
+        parts = []
+        if coop_player.clear_room:
+            # The client drops its crops, and gets the room's from this message on
+            coop_player.clear_room = False
+            flags |= ROOM_CHANGED
+            parts.append(ROOM.pack(coop_player.room))
+
+        counters = (farm.current_day, farm.sapling_counter, farm.tomato_counter, TOOLS.index(coop_player.tool))
+        if counters != coop_player.sent_counters:
+            coop_player.sent_counters = counters
+            flags |= HAS_COUNTERS
+            parts.append(COUNTERS.pack(*counters))
+
+        # Players: those that moved since they were last sent, and those who left the room
+        moved = []
+        here = set()
+        for other in roommates:
+            here.add(other.id)
+            position = (other.player.x, other.player.y)
+            if coop_player.sent_players.get(other.id) != position:
+                coop_player.sent_players[other.id] = position
+                moved.append((other.id, *position))
+        gone = [player_id for player_id in coop_player.sent_players if player_id not in here]
+        for player_id in gone:
+            del coop_player.sent_players[player_id]
+
+        crops, removed = self._take_crops(coop_player, room)
+        patches = self._take_patches(coop_player, room)
+        if not (flags or moved or gone or len(crops) or len(removed) or len(patches)):
+            return
+        parts.append(COUNTS.pack(len(moved), len(gone), len(crops), len(removed), len(patches)))
+        parts.append(np.array(moved, dtype=PLAYER_DTYPE).tobytes())
+        parts.append(np.array(gone, dtype="<u2").tobytes())
+        parts += [crops.tobytes(), removed.tobytes(), patches.tobytes()]
+        body = b"".join(parts)
+        if len(body) > COMPRESS_OVER:
+            body = zlib.compress(body, 1)
+            flags |= COMPRESSED
+        message = frame(UPDATE_HEADER.pack(UPDATE, self.tick_count, flags) + body)
+        coop_player.writer.write(message)
+        coop_player.bytes_sent += len(message)
+
+    def _take_crops(self, coop_player, room):
+        """ Up to MAX_RECORDS queued crops: records of those alive, ids of those removed. """
+        pending = coop_player.pending_crops
+        if not pending:
+            return np.zeros(0, dtype=CROP_DTYPE), np.zeros(0, dtype="<u4")
+        ids = list(itertools.islice(pending, MAX_RECORDS))
+        for crop in ids:
+            del pending[crop]
+        ids = np.array(ids, dtype=np.int64)
+        store = room.crops
+        ids = ids[ids < store.size]
+        alive = store.alive[ids]
+        live = ids[alive]
+        records = np.empty(len(live), dtype=CROP_DTYPE)
+        records["id"] = live
+        records["x"] = np.clip(store.x[live], 0, 65535)
+        records["y"] = np.clip(store.y[live], 0, 65535)
+        records["state"] = store.state[live]
+        return records, ids[~alive].astype("<u4")
+
+    def _take_patches(self, coop_player, room):
+        pending = coop_player.pending_patches
+        if not pending:
+            return np.zeros(0, dtype=PATCH_DTYPE)
+        patches = list(itertools.islice(pending, MAX_RECORDS))
+        for patch in patches:
+            del pending[patch]
+        patches = np.array(patches, dtype=np.int64)
+        records = np.empty(len(patches), dtype=PATCH_DTYPE)
+        records["index"] = patches
+        records["flags"] = (room.patch_planted[patches] * PLANTED_FLAG
+                            + room.patch_watered[patches] * WATERED_FLAG)
+        records["moisture"] = np.clip(room.patch_moisture(patches), 0, 1) * 255
+        return records
+
+    def stats(self):
+        """ Tick times since the last call, and bytes sent per player. """
+        times = np.array(self.tick_times or [0.0]) * 1000
+        self.tick_times = []
+        return {"players": len(self.players), "ticks": self.tick_count,
+                "tick_ms_mean": float(times.mean()), "tick_ms_max": float(times.max()),
+                "bytes_sent": {player_id: coop_player.bytes_sent
+                               for player_id, coop_player in self.players.items()}}
+
+
+class CoopClient:
+    """
+    A connection to a CoopServer, and the client's copy of the room its
+    player is in: ``crops`` (id -> (x, y, state)), ``patches`` (index ->
+    (planted, watered, moisture)) and ``players`` (id -> (x, y)).
+    """
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.player_id = None
+        self.room = None
+        self.tick = None
+        self.day = self.saplings = self.tomatoes = None
+        self.tool = None
+        self.crops = {}
+        self.patches = {}
+        self.players = {}
+        self.bytes_received = 0
+        self.updates = 0
+
+    async def connect(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        body = await read_frame(self.reader, MAX_UPDATE)
+        _, self.player_id = WELCOME_BODY.unpack(body)
+
+    def move(self, x, y):
+        """ Start walking in direction (x, y), each -1, 0 or 1; (0, 0) stops. """
+        self.writer.write(frame(MOVE_BODY.pack(MOVE, x, y)))
+
+    def click(self, x, y):
+        self.writer.write(frame(CLICK_BODY.pack(CLICK, x, y)))
+
+    def select_tool(self, tool):
+        self.writer.write(frame(TOOL_BODY.pack(TOOL, TOOLS.index(tool))))
+
+    async def receive(self):
+        """ Read and apply updates until the connection closes. """
+        while True:
+            body = await read_frame(self.reader, MAX_UPDATE)
+            if body is None:
+                return
+            self.apply(body)
+
+    def apply(self, body):
+        """ Bring the copy up to date with one update message. """
+        self.bytes_received += LENGTH.size + len(body)
+        self.updates += 1
+        _, self.tick, flags = UPDATE_HEADER.unpack_from(body)
+        data = body[UPDATE_HEADER.size:]
+        if flags & COMPRESSED:
+            data = zlib.decompress(data)
+        offset = 0
+        if flags & ROOM_CHANGED:
+            (room,) = ROOM.unpack_from(data, offset)
+            offset += ROOM.size
+            if room != self.room:
+                self.players = {}
+                self.patches = {}
+            self.room = room
+            self.crops = {}
+        if flags & HAS_COUNTERS:
+            self.day, self.saplings, self.tomatoes, tool = COUNTERS.unpack_from(data, offset)
+            self.tool = TOOLS[tool]
+            offset += COUNTERS.size
+        counts = COUNTS.unpack_from(data, offset)
+        offset += COUNTS.size
+
+        arrays = []
+        for count, dtype in zip(counts, (PLAYER_DTYPE, np.dtype("<u2"), CROP_DTYPE, np.dtype("<u4"),
+                                         PATCH_DTYPE)):
+            arrays.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset))
+            offset += count * dtype.itemsize
+        moved, gone, crops, removed, patches = arrays
+
+        for player_id, x, y in moved.tolist():
+            self.players[player_id] = (x, y)
+        for player_id in gone.tolist():
+            self.players.pop(player_id, None)
+        for crop, x, y, state in crops.tolist():
+            self.crops[crop] = (x, y, state)
+        for crop in removed.tolist():
+            self.crops.pop(crop, None)
+        for index, patch_flags, moisture in patches.tolist():
+            self.patches[index] = (bool(patch_flags & PLANTED_FLAG), bool(patch_flags & WATERED_FLAG),
+                                   moisture)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Maysday co-op server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed", type=int, help="Seed of the farm (random if not given)")
+    parser.add_argument("--log", help='Log levels, e.g. "perf=debug"')
+    args = parser.parse_args()
+    setup_logging(args.log)
+
+    async def serve():
+        server = CoopServer(seed=args.seed)
+        port = await server.start(args.host, args.port)
+        perf_log.info("Serving farm %d on %s:%d", server.farm.seed, args.host, port)
+        await server.run()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Crop storage.
+
+The crops of a room live in a CropStore: one NumPy array per field, with a
+crop being an integer id (its row). Watering and growing a batch of crops
+is then a handful of array operations instead of a Python loop over crop
+objects.
+
+Nothing here imports arcade.
+"""
+import numpy as np
+
+# State names, indexed by the state codes stored for each crop. Crop kinds
+# with growth stages of their own add their names to the end.
+STATE_NAMES = ["collected", "planted", "watered", "grown"]
+COLLECTED, PLANTED, WATERED, GROWN = range(4)
+
+NO_PATCH = -1  # Patch of crops that are not planted on one
+NOT_DUE = np.iinfo(np.int32).max  # Due day of crops that are not growing
+
+
+def state_code(name):
+    """ The code stored for the state called ``name``, adding it if it is new. """
+    if name not in STATE_NAMES:
+        STATE_NAMES.append(name)
+    return STATE_NAMES.index(name)
+
+
+class CropKind:
+    """
+    How a kind of crop grows once it is watered. ``stages`` lists the states
+    it goes through, starting with "watered", and how many nights it spends
+    in each; after the last one it is "grown" and can be harvested.
+    """
+    __slots__ = ("name", "index", "stages")
+
+    def __init__(self, name, index, stages):
+        self.name = name
+        self.index = index  # Stored in CropStore.kind
+        self.stages = tuple(stages)
+
+
+class CropKinds:
+    """
+    The crop kinds there are, by name. Their stages are also kept as
+    (kind, stage) tables, so a whole batch of crops can look up its next
+    state and growth time at once.
+    """
+    def __init__(self):
+        self._kinds = {}
+        self.stage_states = np.zeros((0, 0), dtype=np.int8)
+        self.stage_nights = np.zeros((0, 0), dtype=np.int32)
+        self.stage_counts = np.zeros(0, dtype=np.int8)
+
+    def add(self, name, stages):
+        kind = CropKind(name, len(self._kinds), stages)
+        self._kinds[name] = kind
+
+        kinds = list(self._kinds.values())
+        longest = max(len(kind.stages) for kind in kinds)
+        self.stage_states = np.zeros((len(kinds), longest), dtype=np.int8)
+        self.stage_nights = np.zeros((len(kinds), longest), dtype=np.int32)
+        for kind in kinds:
+            for stage, (state, nights) in enumerate(kind.stages):
+                self.stage_states[kind.index, stage] = state_code(state)
+                self.stage_nights[kind.index, stage] = nights
+        self.stage_counts = np.array([len(kind.stages) for kind in kinds], dtype=np.int8)
+        return kind
+
+    def __getitem__(self, name):
+        return self._kinds[name]
+
+    def __contains__(self, name):
+        return name in self._kinds
+
+
+CROP_KINDS = CropKinds()
+CROP_KINDS.add("tomato", [("watered", 1)])
+DEFAULT_CROP = "tomato"
+
+
+class CropStore:
+    """
+    The crops of one room, one array per field, indexed by crop id.
+
+    Ids of removed crops are handed out again to new ones, so an id is only
+    meaningful while ``alive[id]`` is set.
+    """
+    FIELDS = {
+        "x": np.float32,
+        "y": np.float32,
+        "state": np.int8,  # Index into STATE_NAMES
+        "kind": np.int8,  # CropKind.index
+        "stage": np.int8,  # Index into the kind's stages while growing, else -1
+        "patch": np.int32,  # Index into the room's patches, or NO_PATCH
+        "watered": np.bool_,
+        "planted_day": np.int32,
+        "due_day": np.int32,  # Day of the next growth stage, or NOT_DUE
+        "alive": np.bool_,
+    }
+
+    def __init__(self, capacity=16):
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.size = 0  # Rows ever used; everything past this is spare capacity
+        self._free = []  # Ids of removed crops, to reuse
+        self._count = 0
+
+    def _reserve(self, count):
+        """ Make room for ``count`` more rows past ``size``. """
+        capacity = len(self.alive)
+        if self.size + count <= capacity:
+            return
+        capacity = max(capacity * 2, self.size + count)
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _reset(self, ids, x, y):
+        self.x[ids] = x
+        self.y[ids] = y
+        self.state[ids] = COLLECTED
+        self.kind[ids] = 0
+        self.stage[ids] = -1
+        self.patch[ids] = NO_PATCH
+        self.watered[ids] = False
+        self.planted_day[ids] = 0
+        self.due_day[ids] = NOT_DUE
+        self.alive[ids] = True
+
+    def add(self, x, y):
+        """ Add one collectable crop at (x, y) and return its id. """
+        if self._free:
+            crop = self._free.pop()
+        else:
+            self._reserve(1)
+            crop = self.size
+            self.size += 1
+        self._reset(crop, x, y)
+        self._count += 1
+        return crop
+
+    def add_many(self, xs, ys):
+        """ Add a collectable crop at each of the positions and return their ids. """
+        count = len(xs)
+        if not self._free:
+            # New rows only, e.g. after clear(): set them as one slice, which
+            # is several times quicker than by index for a handful of crops
+            self._reserve(count)
+            start = self.size
+            self.size += count
+            self._reset(slice(start, self.size), xs, ys)
+            self._count += count
+            return np.arange(start, self.size)
+        reused = self._free[len(self._free) - min(count, len(self._free)):]
+        del self._free[len(self._free) - len(reused):]
+        self._reserve(count - len(reused))
+        fresh = np.arange(self.size, self.size + count - len(reused))
+        self.size += len(fresh)
+        crops = np.concatenate([np.array(reused, dtype=np.int64), fresh])
+        self._reset(crops, xs, ys)
+        self._count += count
+        return crops
+
+    def remove(self, crop):
+        self.alive[crop] = False
+        self.due_day[crop] = NOT_DUE
+        self._free.append(int(crop))
+        self._count -= 1
+
+    def clear(self):
+        self.alive[:] = False
+        self.size = 0
+        self._free = []
+        self._count = 0
+
+    def columns(self):
+        """ Copies of the used rows of every field, plus the free ids, e.g. to save them. """
+        columns = {name: getattr(self, name)[:self.size].copy() for name in self.FIELDS}
+        return columns, np.array(self._free, dtype=np.int32)
+
+    def restore(self, columns, free):
+        """ Replace the contents with what ``columns()`` returned. """
+        size = len(columns["alive"])
+        for name, dtype in self.FIELDS.items():
+            array = np.zeros(max(size, 16), dtype=dtype)
+            array[:size] = columns[name]
+            setattr(self, name, array)
+        self.size = size
+        self._free = np.asarray(free).tolist()
+        self._count = int(np.count_nonzero(self.alive[:size]))
+
+    def ids(self):
+        """ Ids of all the crops in the store. """
+        return np.flatnonzero(self.alive[:self.size])
+
+    def state_name(self, crop):
+        return STATE_NAMES[self.state[crop]]
+
+    def __contains__(self, crop):
+        return 0 <= crop < self.size and bool(self.alive[crop])
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,829 @@
+"""
+Headless farm simulation.
+
+This module owns the rules of Maysday: the rooms, the crops growing in them,
+the dirt patches they are planted on, the inventory and the day count.
+Nothing here imports arcade, so the day cycle and the tool interactions can
+run (and be tested) without a window or a GL context. ``MyGame`` in
+Maysday.py only draws this state and forwards input to it.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+
+import numpy as np
+
+from crops import CROP_KINDS, COLLECTED, DEFAULT_CROP, GROWN, NO_PATCH, NOT_DUE, PLANTED, CropStore
+from game_log import economy_log, growth_log, input_log, spawn_log
+from grid import OccupancyMap, SpatialGrid
+from growth import GrowthSchedule
+from navigation import nav_grid
+from proximity import Proximity
+from soil import DRY, SoilGrid
+from world import PackedRoom, World
+
+SPRITE_SCALING = 0.5
+SPRITE_NATIVE_SIZE = 128
+SPRITE_SIZE = int(SPRITE_NATIVE_SIZE * SPRITE_SCALING)
+
+# Size of the window, in tiles. Rooms are this size too.
+maze_width = 14
+maze_height = 10
+
+MOVEMENT_SPEED = 5
+
+START_POSITION = (100, 100)  # Where the player stands at the start, in the first room
+
+# The player's hit box around their centre: left, bottom, right, top
+PLAYER_HIT_BOX = (-16, -32, 16, 16)
+
+# Interaction ranges, in pixels
+PICKUP_RANGE = 80  # Player has to stand this close to a sapling
+CLICK_RANGE = 50   # and click this close to it
+PLANT_RANGE = 10   # Click this close to the middle of a dirt patch to plant
+BED_RANGE = 80     # Click this close to the bed to sleep
+
+# How close the player has to be to each kind of thing for it to count as
+# within reach, for auto-pickup and the "press E" prompt
+REACH = {"crop": PICKUP_RANGE, "patch": PICKUP_RANGE, "bed": BED_RANGE}
+
+TOOLS = ("watering_can", "shovel")
+
+# Room files, loaded in this order. The first one is where the player starts.
+ROOMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rooms")
+ROOM_FILES = [os.path.join(ROOMS_DIR, name) for name in ("maze.json", "farm.json")]
+
+# Characters used in a room file's "tiles" rows
+WALL_TILE = "#"
+FLOOR_TILE = "."
+
+# The wilds east of the farm: generated rooms named "wild:<x>,<y>", x from 1
+# to WILD_WIDTH and y from -WILD_HEIGHT // 2, each leading to its neighbours.
+# "wild:1,0" is behind the farm's east exit.
+WILD_PREFIX = "wild:"
+WILD_WIDTH = 64
+WILD_HEIGHT = 64
+WILD_BACKGROUND = "textures/Backgrounds/Grass.png"
+WILD_CRATES = 0.12  # Share of the inside of a wild room filled with crates
+WILD_SPAWN = {"saplings": [0, 3], "margin": 1, "offset": [30, 50]}
+
+# Start building the room behind an exit when the player is this close to it
+PREFETCH_DISTANCE = 2 * SPRITE_SIZE
+
+# Chance of rain on any night, and how much water it brings to the soil
+RAIN_CHANCE = 0.15
+RAIN_AMOUNT = (0.3, 0.8)
+
+
+class Player:
+    """ Where the player stands and how fast they are walking. """
+    __slots__ = ("x", "y", "change_x", "change_y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.change_x = 0
+        self.change_y = 0
+
+
+class Patch:
+    """ A designated planting area. Whether it is planted or watered is kept by its room. """
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Bed:
+    """ Clicking the bed ends the day. """
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class RoomState:
+    """
+    A compiled room. Walls are stored as an OccupancyMap of (column, row)
+    tiles, everything else in pixel coordinates.
+
+    The crops are rows of a CropStore and are referred to by id. Patches
+    are referred to by their index in ``patches``; whether each one is
+    planted or watered is kept in the ``patch_planted`` and
+    ``patch_watered`` arrays. ``soil`` holds the moisture of every tile,
+    with soil under the patches; ``patch_columns`` and ``patch_rows`` give
+    the tile of each patch, and ``patch_tiles`` its index in the flattened
+    moisture array.
+
+    Crops, patches and beds are also kept in a SpatialGrid each, so a click
+    only has to look at the objects on the tiles around it. Add and remove
+    crops through the methods below to keep the grid up to date.
+
+    ``free_cells`` holds the flat index (row * width + column) of every open
+    tile saplings may spawn on, worked out once when the room is loaded.
+
+    ``version`` goes up whenever the Farm changes anything in the room, so
+    an autosave can skip the rooms that are as they were last time.
+
+    ``navigation()`` gives the NavGrid of the room's walls, for helpers
+    finding their way around it (see navigation.py).
+    """
+    def __init__(self, name, walls, patches=(), beds=(), exits=None, spawn=None,
+                 background=None):
+        self.name = name
+        self.walls = walls
+        self.width = walls.width
+        self.height = walls.height
+        self.crops = CropStore()
+        self.patches = list(patches)
+        self.patch_planted = np.zeros(len(self.patches), dtype=bool)
+        self.patch_watered = np.zeros(len(self.patches), dtype=bool)
+        self.beds = list(beds)
+        self.exits = exits or {}  # "east"/"west"/"north"/"south" -> room name
+        self.spawn = spawn  # Sapling spawn rule, or None if nothing grows here
+        self.background = background
+
+        self.free_cells = np.zeros(0, dtype=np.int64)
+        self.version = 0
+        self._navigation = None
+        self._navigation_version = None  # Version of the walls _navigation was made for
+
+        self.patch_columns = np.array([int(patch.x // SPRITE_SIZE) for patch in self.patches], dtype=np.int64)
+        self.patch_rows = np.array([int(patch.y // SPRITE_SIZE) for patch in self.patches], dtype=np.int64)
+        self.patch_tiles = self.patch_rows * self.width + self.patch_columns
+        self.soil = SoilGrid(self.width, self.height)
+        self.soil.add_soil(self.patch_columns, self.patch_rows)
+
+        self.crop_grid = SpatialGrid(SPRITE_SIZE)
+        self.patch_grid = SpatialGrid(SPRITE_SIZE)
+        self.bed_grid = SpatialGrid(SPRITE_SIZE)
+        for index, patch in enumerate(self.patches):
+            self.patch_grid.add(index, patch.x, patch.y)
+        for bed in self.beds:
+            self.bed_grid.add(bed, bed.x, bed.y)
+
+    @property
+    def pixel_width(self):
+        return self.width * SPRITE_SIZE
+
+    @property
+    def pixel_height(self):
+        return self.height * SPRITE_SIZE
+
+    def add_crop(self, x, y):
+        """ Add a collectable crop at (x, y) and return its id. """
+        crop = self.crops.add(x, y)
+        self.crop_grid.add(crop, x, y)
+        return crop
+
+    def add_crops(self, xs, ys):
+        """ Add a collectable crop at each of the positions and return their ids. """
+        crops = self.crops.add_many(xs, ys)
+        self.crop_grid.add_many(crops.tolist(), xs, ys)
+        return crops
+
+    def remove_crop(self, crop):
+        self.crop_grid.remove(crop, self.crops.x[crop], self.crops.y[crop])
+        self.crops.remove(crop)
+
+    def clear_crops(self):
+        self.crops.clear()
+        self.crop_grid.clear()
+
+    def restore_crops(self, columns, free):
+        """ Replace the crops with saved ones (see CropStore.columns) and rebuild their grid. """
+        self.crops.restore(columns, free)
+        self.crop_grid.clear()
+        crops = self.crops.ids()
+        self.crop_grid.add_many(crops.tolist(), self.crops.x[crops].tolist(), self.crops.y[crops].tolist())
+
+    def patch_moisture(self, patches=None):
+        """ Soil moisture under the given patches (an index array), or under all of them. """
+        tiles = self.patch_tiles if patches is None else self.patch_tiles[patches]
+        return self.soil.moisture.ravel().take(tiles)
+
+    def navigation(self):
+        """ The NavGrid of the room's walls as they are now. """
+        if self._navigation is None or self._navigation_version != self.walls.version:
+            self._navigation = nav_grid(self.walls)
+            self._navigation_version = self.walls.version
+        return self._navigation
+
+    def crop_flow_field(self, states=(COLLECTED,)):
+        """ The FlowField towards every crop in one of ``states``; by default the saplings to pick up. """
+        crops = self.crops.ids()
+        crops = crops[np.isin(self.crops.state[crops], states)]
+        return self.navigation().flow_field((self.crops.x[crops] // SPRITE_SIZE).astype(np.int64),
+                                            (self.crops.y[crops] // SPRITE_SIZE).astype(np.int64))
+
+    def sample_free_cells(self, rng, count):
+        """ ``count`` different open (column, row) tiles, picked in O(count). """
+        count = min(count, len(self.free_cells))
+        picks = self.free_cells[rng.sample(range(len(self.free_cells)), count)].tolist()
+        width = self.width
+        return [(cell % width, cell // width) for cell in picks]
+
+
+def compile_room(data):
+    """
+    Turn the contents of a room file into a RoomState.
+
+    ``tiles`` lists the rows of the room from top to bottom, one character
+    per tile (``WALL_TILE`` or ``FLOOR_TILE``). Dirt patches and beds are
+    given in tile units, ``exits`` map a side of the room to the name of the
+    room behind it, and ``spawn`` says how many saplings grow there.
+    """
+    rows = data["tiles"]
+    height = len(rows)
+    width = len(rows[0])
+    if any(len(row) != width for row in rows):
+        raise ValueError(f"Room {data['name']!r}: all tile rows must be {width} tiles wide")
+
+    # Row 0 is the bottom of the room, so read the rows bottom up
+    tiles = np.frombuffer("".join(reversed(rows)).encode("ascii"), dtype=np.uint8)
+    blocked = tiles == ord(WALL_TILE)
+    walls = OccupancyMap(width, height, SPRITE_SIZE)
+    walls.cells[:] = blocked.astype(np.uint8).tobytes()
+
+    patches = [Patch(x * SPRITE_SIZE, y * SPRITE_SIZE) for x, y in data.get("dirt_patches", ())]
+    beds = [Bed(x * SPRITE_SIZE, y * SPRITE_SIZE) for x, y in data.get("beds", ())]
+
+    room = RoomState(data["name"], walls, patches, beds, exits=data.get("exits"),
+                     spawn=data.get("spawn"), background=data.get("background"))
+
+    # Open tiles saplings can spawn on, keeping clear of the border
+    if room.spawn:
+        margin = room.spawn.get("margin", 0)
+        spawnable = ~blocked.reshape(height, width)
+        spawnable[:margin, :] = False
+        spawnable[height - margin:, :] = False
+        spawnable[:, :margin] = False
+        spawnable[:, width - margin:] = False
+        room.free_cells = np.flatnonzero(spawnable)
+
+    return room
+
+
+def load_room(path):
+    """ Read a room file from disk and compile it. """
+    with open(path) as file:
+        return compile_room(json.load(file))
+
+
+def wild_room_name(x, y):
+    return f"{WILD_PREFIX}{x},{y}"
+
+
+def generate_room(seed, name):
+    """
+    Room data for the wild room called ``name``: crates scattered around,
+    with open rows and columns through the middle joining the exits. The
+    same seed and name always give the same room.
+    """
+    x, y = (int(part) for part in name[len(WILD_PREFIX):].split(","))
+    lowest = -(WILD_HEIGHT // 2)
+    if not (1 <= x <= WILD_WIDTH and lowest <= y < lowest + WILD_HEIGHT):
+        raise KeyError(f"No room called {name!r}")
+    rng = random.Random(f"{seed}:{name}")
+
+    # Rows are listed top down; the exits line up with the farm's east exit
+    middle_rows = (maze_height // 2 - 1, maze_height // 2)
+    middle_columns = (maze_width // 2 - 1, maze_width // 2)
+    exits = {"west": "farm" if x == 1 else wild_room_name(x - 1, y)}
+    if x < WILD_WIDTH:
+        exits["east"] = wild_room_name(x + 1, y)
+    if y + 1 < lowest + WILD_HEIGHT:
+        exits["north"] = wild_room_name(x, y + 1)
+    if y > lowest:
+        exits["south"] = wild_room_name(x, y - 1)
+
+    tiles = []
+    for row in range(maze_height):
+        line = []
+        for column in range(maze_width):
+            border = row in (0, maze_height - 1) or column in (0, maze_width - 1)
+            if row in middle_rows and column in middle_columns:
+                tile = FLOOR_TILE
+            elif border:
+                opening = ((row in middle_rows and (column == 0 or "east" in exits))
+                           or (column in middle_columns
+                               and ("north" if row == 0 else "south") in exits))
+                tile = FLOOR_TILE if opening else WALL_TILE
+            elif row in middle_rows or column in middle_columns:
+                tile = FLOOR_TILE
+            else:
+                tile = WALL_TILE if rng.random() < WILD_CRATES else FLOOR_TILE
+            line.append(tile)
+        tiles.append("".join(line))
+
+    return {"name": name, "background": WILD_BACKGROUND, "tiles": tiles, "exits": exits,
+            "spawn": WILD_SPAWN}
+
+
+def _distance_squared(x1, y1, x2, y2):
+    return (x1 - x2) ** 2 + (y1 - y2) ** 2
+
+
+def _first_due(store):
+    """ The first day any crop in ``store`` is due to grow, or NOT_DUE. """
+    due_day = store.due_day[:store.size][store.alive[:store.size]]
+    return int(due_day.min()) if len(due_day) else NOT_DUE
+
+
+class Farm:
+    """
+    The whole game state and the rules that change it.
+
+    Every change is also recorded in ``events`` as a ``(kind, room, obj)``
+    tuple, so a renderer can keep its sprites in step. For crops ``obj`` is
+    a crop id, or an array of them for "spawn", "water" and "grow". Pass
+    ``events=False`` when nothing is listening, e.g. when fast-forwarding
+    in a balance test.
+
+    All randomness comes from the farm's own ``rng``, seeded with ``seed``
+    (a random one if not given), so the same seed and the same inputs
+    always play out the same way.
+
+    ``rooms`` is a World: the rooms from ``room_files`` are loaded up front,
+    the wild rooms are generated the first time the player walks into them,
+    and rooms not visited for a while are packed away. A room that was
+    packed catches up on the nights it missed when it is next entered.
+    Changes to a room are only made while it is resident.
+
+    ``proximity`` knows what is within reach of the player, as of the last
+    ``update_proximity()``. With ``auto_pickup`` on, saplings are picked up
+    by walking up to them instead of clicking on them with the shovel.
+    """
+    def __init__(self, seed=None, events=True, room_files=ROOM_FILES, memory_budget=None):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        # Kept apart so the weather does not change what the rest of the game rolls
+        self.weather_rng = random.Random(f"{self.seed}:weather")
+        self.events = [] if events else None
+
+        self.current_room = 0
+        self.player = Player(*START_POSITION)
+        self.proximity = Proximity(REACH)
+        self.auto_pickup = False
+
+        self.current_day = 1
+        self.growth = GrowthSchedule()
+        self.current_tool = "watering_can"
+        self.sapling_counter = 0
+        self.tomato_counter = 0
+
+        self.rooms = World(self._build_room, lambda: self.current_day, self._room_loaded,
+                           self._room_packed)
+        if memory_budget is not None:
+            self.rooms.memory_budget = memory_budget
+        self.rooms.current = self.current_room
+        self.room_paths = {}  # Name -> file of the rooms that are not generated
+        for path in room_files:
+            room = load_room(path)
+            self.room_paths[room.name] = path
+            self.rooms.add(room)
+
+    def _build_room(self, name):
+        """ A new RoomState for the room called ``name``. Runs on the World's background thread too. """
+        if name in self.room_paths:
+            return load_room(self.room_paths[name])
+        if name.startswith(WILD_PREFIX):
+            return compile_room(generate_room(self.seed, name))
+        raise KeyError(f"No room called {name!r}")
+
+    def add_room(self, room):
+        """ Add a RoomState built elsewhere, e.g. a test field, and return its index. It is never packed. """
+        return self.rooms.add(room, reloadable=False)
+
+    def _room_loaded(self, room_index, room, packed):
+        """ A room became resident: new ones get their saplings, packed ones catch up. """
+        if packed is None:
+            # Saplings to collect on the first day
+            if room.spawn:
+                self.spawn_saplings(room_index)
+            return
+
+        missed = self.current_day - packed.day
+        if missed > 0 and room.spawn and room.spawn.get("daily"):
+            room.clear_crops()
+            self._emit("clear", room_index)
+            self.spawn_saplings(room_index)
+
+        # Book the crops still growing
+        store = room.crops
+        alive = store.alive[:store.size]
+        due_day = store.due_day[:store.size]
+        later = np.flatnonzero(alive & (due_day != NOT_DUE) & (due_day > self.current_day))
+        if len(later):
+            self._schedule_growth(room_index, later, store.due_day[later] - self.current_day)
+
+        # Then go through the nights it missed one by one, as if it had been
+        # resident: the soil dries out (no rain while nobody was looking),
+        # then the crops due that night grow if their soil is still moist,
+        # their next stage counted from that night
+        next_due = _first_due(store)
+        for day in range(packed.day + 1, self.current_day + 1):
+            room.soil.step()
+            if next_due <= day:
+                overdue = np.flatnonzero(store.alive[:store.size] & (store.due_day[:store.size] <= day))
+                self._grow_if_moist(room_index, overdue, day)
+                next_due = _first_due(store)
+        if missed > 0 and room.soil.wet:
+            self._emit("soil", room_index)
+
+    def _room_packed(self, room_index):
+        self._emit("evict", room_index)
+
+    def _emit(self, kind, room, obj=None):
+        state = self.rooms.get_loaded(room)
+        if state is not None:
+            state.version += 1
+        if self.events is not None:
+            self.events.append((kind, room, obj))
+
+    def drain_events(self):
+        """ Return the events since the last call and forget them. """
+        if not self.events:
+            return []
+        events = self.events
+        self.events = []
+        return events
+
+    def select_tool(self, tool):
+        if tool not in TOOLS:
+            raise ValueError(f"Unknown tool {tool!r}")
+        self.current_tool = tool
+        input_log.info("Selected tool: %s", tool)
+        self._emit("tool", self.current_room, tool)
+
+    def move_player(self, player=None):
+        """
+        Walk the player one step, stopping at walls, and move them to the
+        next room when they walk out through an exit.
+        """
+        player = player or self.player
+        room = self.rooms[self.current_room]
+        player.x, player.y = room.walls.move_box(player.x, player.y, PLAYER_HIT_BOX,
+                                                 player.change_x, player.change_y)
+
+        # Figure out if we need to go to a different room
+        exits = room.exits
+        if player.x > room.pixel_width and "east" in exits:
+            self.enter_room(self.rooms.index_of(exits["east"]))
+            player.x = 0
+        elif player.x < 0 and "west" in exits:
+            player.x = self.enter_room(self.rooms.index_of(exits["west"])).pixel_width
+        elif player.y > room.pixel_height and "north" in exits:
+            self.enter_room(self.rooms.index_of(exits["north"]))
+            player.y = 0
+        elif player.y < 0 and "south" in exits:
+            player.y = self.enter_room(self.rooms.index_of(exits["south"])).pixel_height
+        elif exits:
+            self._prefetch_exits(room, player)
+
+    def _prefetch_exits(self, room, player):
+        """ Start building the room behind any exit the player is close to. """
+        exits = room.exits
+        if "east" in exits and player.x > room.pixel_width - PREFETCH_DISTANCE:
+            self.rooms.prefetch(exits["east"])
+        if "west" in exits and player.x < PREFETCH_DISTANCE:
+            self.rooms.prefetch(exits["west"])
+        if "north" in exits and player.y > room.pixel_height - PREFETCH_DISTANCE:
+            self.rooms.prefetch(exits["north"])
+        if "south" in exits and player.y < PREFETCH_DISTANCE:
+            self.rooms.prefetch(exits["south"])
+
+    def enter_room(self, room_index):
+        self.current_room = self.rooms.current = room_index
+        room = self.rooms[room_index]
+        self._emit("enter", room_index)
+        return room
+
+    def click(self, x, y, player=None):
+        """
+        Use the current tool at (x, y): water or dig saplings next to the
+        player, plant on a dirt patch, or go to bed.
+        """
+        player = player or self.player
+        player_x, player_y = player.x, player.y
+        room_index = self.current_room
+        room = self.rooms[room_index]
+        input_log.debug("Click at (%d, %d) with the %s, player at (%d, %d)",
+                        x, y, self.current_tool, player_x, player_y)
+
+        # Check if we can collect a sapling, nearest to the click first
+        crops = room.crops
+        saplings_hit = [
+            crop for crop in room.crop_grid.query(x, y, CLICK_RANGE)
+            if _distance_squared(player_x, player_y, crops.x[crop], crops.y[crop]) < PICKUP_RANGE ** 2
+        ]
+
+        # Change sapling state based on interaction
+        if self.current_tool == "watering_can":
+            self.water(room_index, saplings_hit)
+
+        elif self.current_tool == "shovel" and saplings_hit:
+            # The shovel only digs up one sapling per click
+            self.dig(room_index, saplings_hit[0])
+
+        # Check if we can plant a sapling on a dirt patch
+        if self.sapling_counter > 0 and self.current_tool == "shovel":
+            for patch in room.patch_grid.query(x, y, PLANT_RANGE):
+                # If within planting range, plant a sapling at this dirt patch
+                if not room.patch_planted[patch]:
+                    self.plant(room_index, patch)
+                    return
+
+        # Check if we can go to bed
+        if room.bed_grid.query(x, y, BED_RANGE):
+            self.sleep()
+            return
+
+    def update_proximity(self):
+        """
+        Look at what is within reach of the player since they last moved,
+        picking up saplings that came into reach if ``auto_pickup`` is on.
+        Returns the (kind, item) pairs that came into reach and those that
+        went out of it (see proximity.py).
+        """
+        room_index = self.current_room
+        room = self.rooms[room_index]
+        entered, left = self.proximity.update(room_index, room, self.player.x, self.player.y)
+        if self.auto_pickup and entered:
+            picked = [thing for thing in entered
+                      if thing[0] == "crop" and room.crops.state[thing[1]] == COLLECTED]
+            for thing in picked:
+                self.dig(room_index, thing[1])
+                self.proximity.discard(thing)
+            if picked:
+                entered = [thing for thing in entered if thing not in picked]
+        return entered, left
+
+    def interaction(self):
+        """
+        What clicking on the nearest thing within reach would do with the
+        current tool: ("dig", "harvest", "water", "plant" or "sleep", x, y),
+        or None if there is nothing to do.
+        """
+        room = self.rooms[self.current_room]
+        store = room.crops
+        shovel = self.current_tool == "shovel"
+        for kind, item in self.proximity.nearby:
+            if kind == "crop":
+                state = store.state[item]
+                if shovel:
+                    action = "harvest" if state == GROWN else "dig"
+                elif state == PLANTED:
+                    action = "water"
+                else:
+                    continue
+                return action, float(store.x[item]), float(store.y[item])
+            if kind == "patch":
+                if shovel and self.sapling_counter > 0 and not room.patch_planted[item]:
+                    patch = room.patches[item]
+                    return "plant", patch.x, patch.y
+            elif kind == "bed":
+                return "sleep", item.x, item.y
+        return None
+
+    def interact(self):
+        """ Click on the nearest thing within reach that the current tool does something to. """
+        interaction = self.interaction()
+        if interaction:
+            _, x, y = interaction
+            self.click(x, y)
+
+    def water(self, room_index, crops):
+        """
+        Planted saplings among ``crops`` become watered, and so do their
+        patches, and start growing. Crops in any other state are left alone.
+        """
+        room = self.rooms[room_index]
+        store = room.crops
+        crops = np.asarray(crops, dtype=np.int64)
+        crops = crops[store.state[crops] == PLANTED]
+        if not len(crops):
+            return
+
+        kinds = store.kind[crops]
+        store.stage[crops] = 0
+        store.state[crops] = CROP_KINDS.stage_states[kinds, 0]
+        store.watered[crops] = True
+        self._schedule_growth(room_index, crops, CROP_KINDS.stage_nights[kinds, 0])
+        self._set_patches_watered(room, crops, True)
+        patches = store.patch[crops]
+        patches = patches[patches != NO_PATCH]
+        room.soil.water(room.patch_columns[patches], room.patch_rows[patches])
+        self._emit("water", room_index, crops)
+
+    def _schedule_growth(self, room_index, crops, nights, day=None):
+        """
+        Book the next growth stage of ``crops``, ``nights`` (an array) from
+        ``day``, today by default. Stages due by today, when catching up on
+        nights gone by, are only written to the crops.
+        """
+        store = self.rooms[room_index].crops
+        due_days = (self.current_day if day is None else day) + nights
+        store.due_day[crops] = due_days
+        if day is not None:
+            later = due_days > self.current_day
+            crops, due_days = crops[later], due_days[later]
+            if not len(crops):
+                return
+        first_day = due_days[0]
+        if (due_days == first_day).all():  # Usually the whole batch grows at the same pace
+            self.growth.schedule(int(first_day), room_index, crops)
+            return
+        for due_day in set(due_days.tolist()):
+            self.growth.schedule(due_day, room_index, crops[due_days == due_day])
+
+    def _set_patches_watered(self, room, crops, watered):
+        patches = room.crops.patch[crops]
+        room.patch_watered[patches[patches != NO_PATCH]] = watered
+
+    def dig(self, room_index, crop):
+        """ Take a sapling out of the ground: grown ones give a tomato, others a sapling back. """
+        room = self.rooms[room_index]
+        if room.crops.state[crop] == GROWN:
+            self.tomato_counter += 1
+            kind = "harvest"
+            economy_log.info("Tomato counter: %d", self.tomato_counter)
+        else:
+            self.sapling_counter += 1
+            kind = "dig"
+            economy_log.info("Saplings collected: %d", self.sapling_counter)
+
+        patch = room.crops.patch[crop]
+        if patch != NO_PATCH:
+            room.patch_planted[patch] = False
+
+        # Its growth schedule entry is skipped when it comes due
+        room.remove_crop(crop)
+        self._emit(kind, room_index, crop)
+
+    def plant(self, room_index, patch, kind=DEFAULT_CROP):
+        """ Spend a sapling from the inventory on an empty dirt patch (given by index). """
+        room = self.rooms[room_index]
+        self.sapling_counter -= 1
+        position = room.patches[patch]
+        crop = room.add_crop(position.x, position.y)
+        store = room.crops
+        store.state[crop] = PLANTED
+        store.kind[crop] = CROP_KINDS[kind].index
+        store.patch[crop] = patch
+        store.planted_day[crop] = self.current_day
+        room.patch_planted[patch] = True  # Mark patch as occupied
+        economy_log.info("Sapling planted on dirt patch %d, %d saplings left", patch, self.sapling_counter)
+        self._emit("plant", room_index, crop)
+        return crop
+
+    def sleep(self):
+        """ End the day: new saplings in the maze, and crops due to grow do, in every room. """
+        self.current_day += 1
+        growth_log.info("Going to bed for the night! Day %d", self.current_day)
+        self._emit("sleep", self.current_room, self.current_day)
+        self.respawn_saplings()
+        self.update_soil()
+        self.grow_saplings()
+
+    def update_soil(self, days=1, weather=True):
+        """
+        Let the soil of the resident rooms dry out and spread its water for
+        ``days``, and, if ``weather``, maybe rain on it.
+        """
+        rain = 0.0
+        if weather and self.weather_rng.random() < RAIN_CHANCE:
+            rain = self.weather_rng.uniform(*RAIN_AMOUNT)
+            growth_log.info("It rained in the night: %.2f", rain)
+        for room_index, room in self.rooms.loaded():
+            if not room.patches or not (rain or room.soil.wet):
+                continue  # Nothing to dry out or rain on
+            room.soil.step(days)
+            if rain:
+                room.soil.rain(rain)
+            self._emit("soil", room_index)
+
+    def spawn_saplings(self, room_index):
+        """ Put saplings on random open tiles of a room, as many as its spawn rule says. """
+        room = self.rooms[room_index]
+        low, high = room.spawn["saplings"]
+        offset_x, offset_y = room.spawn.get("offset", (SPRITE_SIZE // 2, SPRITE_SIZE // 2))
+        daily_saplings = self.rng.randint(low, high)
+
+        cells = room.sample_free_cells(self.rng, daily_saplings)
+        xs = [x * SPRITE_SIZE + offset_x for x, _ in cells]
+        ys = [y * SPRITE_SIZE + offset_y for _, y in cells]
+        crops = room.add_crops(xs, ys)
+        spawn_log.info("%d saplings spawned in %s", len(crops), room.name)
+        if spawn_log.isEnabledFor(logging.DEBUG):
+            spawn_log.debug("Sapling positions in %s: %s", room.name, list(zip(xs, ys)))
+        self._emit("spawn", room_index, crops)
+
+    def respawn_saplings(self):
+        """ Replace yesterday's saplings with new ones in rooms that regrow them daily. """
+        for room_index, room in self.rooms.loaded():
+            if room.spawn and room.spawn.get("daily"):
+                room.clear_crops()
+                self._emit("clear", room_index)
+                self.spawn_saplings(room_index)
+
+    def grow_saplings(self):
+        """
+        Move every crop whose growth stage is over on to the next one. Only
+        the crops due today are looked at.
+        """
+        today = self.current_day
+        batches = {}
+        for room_index, crops in self.growth.pop_due(today):
+            batches.setdefault(room_index, []).append(crops)
+
+        for room_index, due in batches.items():
+            room = self.rooms.get_loaded(room_index)
+            if room is None:
+                continue  # Packed rooms catch up when they are next loaded
+            store = room.crops
+            # Each crop once, skipping those dug up or rescheduled since (their
+            # ids may have been reused)
+            is_due = np.zeros(store.size, dtype=bool)
+            is_due[np.concatenate(due)] = True
+            is_due &= store.alive[:store.size] & (store.due_day[:store.size] <= today)
+            crops = np.flatnonzero(is_due)
+            if len(crops):
+                self._grow_if_moist(room_index, crops)
+
+    def _grow_if_moist(self, room_index, crops, day=None):
+        """
+        Grow ``crops``, except those on patches too dry for it, which try
+        again the next night. ``day`` is the night it happens on, today by
+        default.
+        """
+        room = self.rooms[room_index]
+        patches = room.crops.patch[crops]
+        on_patch = np.flatnonzero(patches != NO_PATCH)
+        dry = on_patch[room.patch_moisture(patches[on_patch]) < DRY]
+        if len(dry):
+            growth_log.info("%d crops in %s too dry to grow", len(dry), room.name)
+            self._schedule_growth(room_index, crops[dry], np.ones(len(dry), dtype=np.int32), day)
+            crops = np.delete(crops, dry)
+        if len(crops):
+            self.grow(room_index, crops, day)
+
+    def grow(self, room_index, crops, day=None):
+        """
+        Next growth stage for each of ``crops``, counted from the night of
+        ``day`` (today by default); fully grown ones dry out their patch.
+        """
+        room = self.rooms[room_index]
+        store = room.crops
+        kinds = store.kind[crops]
+        stages = store.stage[crops] + 1
+        store.stage[crops] = stages
+
+        growing = stages < CROP_KINDS.stage_counts[kinds]
+        if growing.any():
+            next_kinds, next_stages = kinds[growing], stages[growing]
+            store.state[crops[growing]] = CROP_KINDS.stage_states[next_kinds, next_stages]
+            self._schedule_growth(room_index, crops[growing],
+                                  CROP_KINDS.stage_nights[next_kinds, next_stages], day)
+
+        grown = crops[~growing]
+        store.state[grown] = GROWN
+        store.due_day[grown] = NOT_DUE
+        store.watered[grown] = False
+        self._set_patches_watered(room, grown, False)
+        growth_log.info("Saplings grew in %s: %d, %d of them fully grown", room.name, len(crops), len(grown))
+        if growth_log.isEnabledFor(logging.DEBUG):
+            growth_log.debug("Crop states in %s: %s", room.name,
+                             {int(crop): store.state_name(crop) for crop in crops})
+        self._emit("grow", room_index, crops)
+
+    def fingerprint(self):
+        """ A short hash of the whole game state, to check that a replay ended where its recording did. """
+        digest = hashlib.sha1(repr((
+            self.current_room, self.current_day, self.current_tool, self.sapling_counter,
+            self.tomato_counter, self.player.x, self.player.y,
+        )).encode())
+        for _, room in self.rooms.entries():
+            if isinstance(room, PackedRoom):
+                columns, _, planted, watered, moisture = room.unpack()
+            else:
+                crops = room.crops
+                columns = {name: getattr(crops, name)[:crops.size] for name in crops.FIELDS}
+                planted, watered = room.patch_planted, room.patch_watered
+                moisture = room.soil.moisture
+            for name in CropStore.FIELDS:
+                digest.update(columns[name].tobytes())
+            digest.update(planted.tobytes())
+            digest.update(watered.tobytes())
+            digest.update(moisture.tobytes())
+        return digest.hexdigest()[:16]
+
+    def fast_forward(self, days):
+        """ Sleep through ``days`` nights in a row and return the new day number. """
+        for _ in range(days):
+            self.sleep()
+        return self.current_day
@@ -0,0 +1,298 @@
+"""
+Farms as environments for bots and balancing runs.
+
+A FarmEnv is one Farm driven by array actions, with array observations,
+through the same rules the game uses: every action is a Farm.click with a
+tool, so planting, watering, digging, harvesting and going to bed behave
+exactly as when a player clicks.
+
+An action is four integers, (tool, room, column, row):
+
+    tool      NOOP, WATERING_CAN or SHOVEL
+    room      index of the room to act in (one of the room files)
+    column    the tile to click on
+    row
+
+The player is put on the tile and clicks on what is there: a crop, else a
+dirt patch, else a bed, else the middle of the tile. Walking is left out;
+clicking on a wall does nothing.
+
+An observation is a (rooms, CHANNELS, height, width) uint8 grid, with
+rooms smaller than the biggest one padded with walls, plus SCALARS floats
+(the day, the inventory and the tool). The reward of a step is the
+tomatoes it harvested. An episode ends after ``days`` days.
+
+VectorFarmEnv steps N FarmEnvs at once, split over worker processes that
+write their observations straight into shared memory, so nothing but a
+one word command goes through a pipe each step. With ``workers=0`` the
+environments are stepped in this process instead.
+
+Nothing here imports arcade.
+"""
+import multiprocessing
+import os
+import random
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from crops import COLLECTED, GROWN, PLANTED, STATE_NAMES
+from farm import ROOM_FILES, SPRITE_SIZE, TOOLS, Farm
+
+NOOP, WATERING_CAN, SHOVEL = range(3)
+ACTION_SIZE = 4  # tool, room, column, row
+
+# Observation channels, one (height, width) plane each per room
+CHANNELS = ("wall", "patch", "bed", "sapling", "planted", "growing", "grown", "moisture", "player")
+WALL, PATCH, BED, SAPLING, PLANTED_CROP, GROWING, GROWN_CROP, MOISTURE, PLAYER = range(len(CHANNELS))
+SCALARS = ("day", "saplings", "tomatoes", "tool", "room")
+
+DEFAULT_DAYS = 30
+
+
+def crop_channels():
+    """ The observation channel of each crop state code. """
+    channels = np.full(len(STATE_NAMES), GROWING, dtype=np.int64)
+    channels[COLLECTED] = SAPLING
+    channels[PLANTED] = PLANTED_CROP
+    channels[GROWN] = GROWN_CROP
+    return channels
+
+
+class FarmEnv:
+    """ One farm, stepped with array actions. ``seed`` seeds the farm of every episode in turn. """
+
+    def __init__(self, seed=None, days=DEFAULT_DAYS, room_files=ROOM_FILES):
+        self.seeds = random.Random(seed)
+        self.days = days
+        self.room_files = room_files
+        self.farm = None
+        self.reset()
+
+        rooms = [self.farm.rooms[index] for index in range(len(self.farm.rooms))]
+        self.height = max(room.height for room in rooms)
+        self.width = max(room.width for room in rooms)
+        self.observation_shape = (len(rooms), len(CHANNELS), self.height, self.width)
+
+        # What never changes: the walls (and the padding), patches and beds
+        self._layout = np.zeros(self.observation_shape, dtype=np.uint8)
+        self._layout[:, WALL] = 1
+        self._targets = []  # Room index -> {(column, row): click point} of its patches and beds
+        for index, room in enumerate(rooms):
+            walls = np.frombuffer(bytes(room.walls.cells), dtype=np.uint8).reshape(room.height, room.width)
+            self._layout[index, WALL, :room.height, :room.width] = walls
+            targets = {}
+            for obj, channel in [(bed, BED) for bed in room.beds] + [(patch, PATCH) for patch in room.patches]:
+                column, row = int(obj.x // SPRITE_SIZE), int(obj.y // SPRITE_SIZE)
+                self._layout[index, channel, row, column] = 1
+                targets[column, row] = (obj.x, obj.y)  # Patches win over beds on the same tile
+            self._targets.append(targets)
+
+    def reset(self):
+        """ Start a new episode on a new farm. """
+        self.farm = Farm(seed=self.seeds.randrange(2 ** 32), events=False, room_files=self.room_files)
+
+    def step(self, action):
+        """ Apply one action; returns (reward, done). Does not reset by itself. """
+        farm = self.farm
+        tomatoes = farm.tomato_counter
+        tool, room_index, column, row = (int(value) for value in action)
+        if tool != NOOP and 0 <= room_index < len(self._targets):
+            room = farm.rooms[room_index]
+            if 0 <= column < room.width and 0 <= row < room.height and not room.walls.is_blocked(column, row):
+                if room_index != farm.current_room:
+                    farm.enter_room(room_index)
+                x, y = self._click_point(room, room_index, column, row)
+                farm.player.x, farm.player.y = x, y
+                if farm.current_tool != TOOLS[tool - 1]:
+                    farm.select_tool(TOOLS[tool - 1])
+                farm.click(x, y)
+        return farm.tomato_counter - tomatoes, farm.current_day > self.days
+
+    def _click_point(self, room, room_index, column, row):
+        crops = room.crop_grid.cells.get((column, row))
+        if crops:
+            x, y, _ = crops[0]
+            return x, y
+        target = self._targets[room_index].get((column, row))
+        if target:
+            return target
+        return (column + 0.5) * SPRITE_SIZE, (row + 0.5) * SPRITE_SIZE
+
+    def observe(self, grid, scalars):
+        """ Write the observation into ``grid`` (observation_shape, uint8) and ``scalars`` (float32). """
+        farm = self.farm
+        grid[:] = self._layout
+        channels = crop_channels()
+        for index in range(len(self._targets)):
+            room = farm.rooms[index]
+            planes = grid[index]
+            store = room.crops
+            crops = store.ids()
+            if len(crops):
+                columns = (store.x[crops] // SPRITE_SIZE).astype(np.int64)
+                rows = (store.y[crops] // SPRITE_SIZE).astype(np.int64)
+                tiles = (channels[store.state[crops]] * self.height + rows) * self.width + columns
+                counts = np.bincount(tiles, minlength=planes.size).reshape(planes.shape)
+                planes += np.minimum(counts, 255).astype(np.uint8)
+            planes[MOISTURE, :room.height, :room.width] = room.soil.moisture * 255
+        player = farm.player
+        column, row = int(player.x // SPRITE_SIZE), int(player.y // SPRITE_SIZE)
+        if 0 <= column < self.width and 0 <= row < self.height:
+            grid[farm.current_room, PLAYER, row, column] = 1
+        scalars[:] = (farm.current_day, farm.sapling_counter, farm.tomato_counter,
+                      TOOLS.index(farm.current_tool), farm.current_room)
+
+
+class SharedArrays:
+    """
+    The arrays a VectorFarmEnv and its workers share: actions, grids,
+    scalars, rewards and dones for every environment, each in a block of
+    shared memory. Workers attach to the blocks by name.
+    """
+    def __init__(self, count, observation_shape, names=None):
+        self.specs = {
+            "actions": ((count, ACTION_SIZE), np.int32),
+            "grids": ((count, *observation_shape), np.uint8),
+            "scalars": ((count, len(SCALARS)), np.float32),
+            "rewards": ((count,), np.float32),
+            "dones": ((count,), np.bool_),
+        }
+        self.owner = names is None
+        self.blocks = {}
+        for name, (shape, dtype) in self.specs.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if self.owner:
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[name])
+            self.blocks[name] = block
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=block.buf))
+
+    def names(self):
+        return {name: block.name for name, block in self.blocks.items()}
+
+    def close(self):
+        for name in self.specs:
+            setattr(self, name, None)  # Let go of the buffers before closing them
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+
+
+def _run_worker(connection, names, count, observation_shape, seeds, days, room_files, first):
+    """ Step environments ``first`` to ``first + len(seeds)`` for a VectorFarmEnv, until told to stop. """
+    arrays = SharedArrays(count, observation_shape, names)
+    envs = [FarmEnv(seed, days, room_files) for seed in seeds]
+    try:
+        while True:
+            command = connection.recv()
+            if command == "close":
+                break
+            _apply(command, envs, arrays, first)
+            connection.send(command)
+    finally:
+        arrays.close()
+        connection.close()
+
+
+def _apply(command, envs, arrays, first):
+    """ Run ``command`` ("step" or "reset") on ``envs``, environments ``first`` onwards of ``arrays``. """
+    for offset, env in enumerate(envs):
+        index = first + offset
+        if command == "step":
+            reward, done = env.step(arrays.actions[index])
+            arrays.rewards[index] = reward
+            arrays.dones[index] = done
+            if done:
+                env.reset()  # The observation is the first of the next episode
+        else:
+            env.reset()
+            arrays.rewards[index] = 0
+            arrays.dones[index] = False
+        env.observe(arrays.grids[index], arrays.scalars[index])
+
+
+class VectorFarmEnv:
+    """
+    ``count`` FarmEnvs stepped together, split as evenly as possible over
+    ``workers`` processes (one per CPU by default). Environment ``i`` is
+    seeded with ``seed + i``.
+
+    ``step(actions)`` takes a (count, ACTION_SIZE) integer array and returns
+    (grids, scalars, rewards, dones). Environments whose episode ended are
+    reset straight away, so their observation is the start of the next
+    one. The arrays returned live in shared memory and are overwritten by
+    the next step; copy them to keep them.
+    """
+    def __init__(self, count, seed=0, days=DEFAULT_DAYS, workers=None, room_files=ROOM_FILES,
+                 context=None):
+        self.count = count
+        self.seed = seed
+        self.days = days
+        self.room_files = room_files
+        self.observation_shape = FarmEnv(seed, days, room_files).observation_shape
+        self.arrays = SharedArrays(count, self.observation_shape)
+
+        workers = min(count, os.cpu_count() or 1) if workers is None else min(workers, count)
+        self.envs = []  # Stepped in this process when there are no workers
+        self.processes = []
+        self.connections = []
+        if workers == 0:
+            self.envs = [FarmEnv(seed + index, days, room_files) for index in range(count)]
+        else:
+            context = multiprocessing.get_context(context)
+            bounds = np.linspace(0, count, workers + 1).astype(int)
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                ours, theirs = context.Pipe()
+                process = context.Process(
+                    target=_run_worker, daemon=True,
+                    args=(theirs, self.arrays.names(), count, self.observation_shape,
+                          [seed + index for index in range(first, last)], days, room_files, int(first)))
+                process.start()
+                theirs.close()
+                self.processes.append(process)
+                self.connections.append(ours)
+
+    @property
+    def workers(self):
+        return len(self.processes)
+
+    def _run(self, command):
+        if self.envs:
+            _apply(command, self.envs, self.arrays, 0)
+            return
+        for connection in self.connections:
+            connection.send(command)
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self):
+        """ Start a new episode in every environment; returns (grids, scalars). """
+        self._run("reset")
+        return self.arrays.grids, self.arrays.scalars
+
+    def step(self, actions):
+        self.arrays.actions[:] = actions
+        self._run("step")
+        arrays = self.arrays
+        return arrays.grids, arrays.scalars, arrays.rewards, arrays.dones
+
+    def close(self):
+        for connection in self.connections:
+            connection.send("close")
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.processes = []
+        self.connections = []
+        self.arrays.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
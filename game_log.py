@@ -0,0 +1,126 @@
+"""
+Game logging.
+
+Messages are grouped into categories, each with a logger of its own under
+"maysday" whose level can be set separately:
+
+    input    tools selected, clicks
+    growth   nights slept, crops growing
+    spawn    saplings appearing in the rooms
+    economy  saplings and tomatoes gained and spent
+    perf     texture loading, startup times, sprite pools, profiles
+    replay   recording and replaying sessions
+
+A message below its category's level costs one cached ``isEnabledFor``
+check. Anything expensive to put together (lists of positions, per-crop
+detail) is only built inside ``if log.isEnabledFor(logging.DEBUG):``.
+
+Nothing is written until ``setup_logging`` is called. After that, records
+are put on a queue and a background thread writes them out, so the game
+never waits on the terminal or a log file.
+
+Nothing here imports arcade.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+CATEGORIES = ("input", "growth", "spawn", "economy", "perf", "replay")
+DEFAULT_LEVEL = logging.INFO
+LOG_FORMAT = "%(relativeCreated)9.0f ms %(levelname)-7s %(name)s: %(message)s"
+
+# Levels can also be given as MAYSDAY_LOG="growth=debug,input=warning"
+LEVELS_ENV = "MAYSDAY_LOG"
+
+root_log = logging.getLogger("maysday")
+
+
+def get_logger(category):
+    """ The logger of one category. """
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown log category {category!r}")
+    return root_log.getChild(category)
+
+
+input_log = get_logger("input")
+growth_log = get_logger("growth")
+spawn_log = get_logger("spawn")
+economy_log = get_logger("economy")
+perf_log = get_logger("perf")
+replay_log = get_logger("replay")
+
+
+def parse_levels(text):
+    """
+    "debug" or "growth=debug,input=warning" -> {category: level}. A bare
+    level applies to every category; None stands for all of them.
+    """
+    levels = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        category, _, level = item.rpartition("=")
+        number = logging.getLevelName(level.strip().upper())
+        if not isinstance(number, int):
+            raise ValueError(f"Unknown log level {level!r}")
+        if category and category not in CATEGORIES:
+            raise ValueError(f"Unknown log category {category!r}")
+        levels[category or None] = number
+    return levels
+
+
+def set_levels(levels):
+    """ Set category levels from a {category: level} dict, None meaning all categories. """
+    if None in levels:
+        root_log.setLevel(levels[None])
+    for category, level in levels.items():
+        if category is not None:
+            get_logger(category).setLevel(level)
+
+
+# Writes out the queued records on a thread of its own, once setup_logging has run
+_listener = None
+
+
+def setup_logging(levels=None, stream=None, path=None):
+    """
+    Start writing log records from a background thread, to ``stream``
+    (stderr by default) or to the file at ``path``. ``levels`` is a
+    {category: level} dict or a string for ``parse_levels``; levels from
+    the MAYSDAY_LOG environment variable are applied on top. Calling it
+    again only changes the levels.
+    """
+    global _listener
+    root_log.setLevel(DEFAULT_LEVEL)
+    if isinstance(levels, str):
+        levels = parse_levels(levels)
+    set_levels(levels or {})
+    set_levels(parse_levels(os.environ.get(LEVELS_ENV, "")))
+
+    if _listener is not None:
+        return
+    if path:
+        handler = logging.FileHandler(path)
+    else:
+        handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.SimpleQueue()
+    root_log.addHandler(logging.handlers.QueueHandler(records))
+    root_log.propagate = False
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """ Write out whatever is still queued and stop the background thread. """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        for handler in root_log.handlers[:]:
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root_log.removeHandler(handler)
+        root_log.propagate = True
@@ -0,0 +1,180 @@
+"""
+Tile-grid helpers shared by the farm simulation.
+
+Nothing here imports arcade.
+"""
+import math
+
+import numpy as np
+
+
+class SpatialGrid:
+    """
+    Buckets items by the tile their pixel position falls on, so "what is
+    near this point" only looks at a few neighbouring tiles instead of every
+    item in the room. Items can be anything, e.g. an object or an id into
+    arrays; their position is given when they are added.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> list of (x, y, item)
+        self._count = 0
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def add(self, item, x, y):
+        self.cells.setdefault(self.cell_of(x, y), []).append((x, y, item))
+        self._count += 1
+
+    def add_many(self, items, xs, ys):
+        """ Add each of ``items`` at the matching position in ``xs`` and ``ys`` (lists). """
+        size = self.cell_size
+        cells = self.cells
+        if len(items) < 64:  # Converting to arrays only pays off for bigger batches
+            columns = [int(x // size) for x in xs]
+            rows = [int(y // size) for y in ys]
+        else:
+            columns = (np.asarray(xs) // size).astype(np.int64).tolist()
+            rows = (np.asarray(ys) // size).astype(np.int64).tolist()
+        for item, x, y, cell in zip(items, xs, ys, zip(columns, rows)):
+            bucket = cells.get(cell)
+            if bucket is None:
+                cells[cell] = [(x, y, item)]
+            else:
+                bucket.append((x, y, item))
+        self._count += len(items)
+
+    def remove(self, item, x, y):
+        cell = self.cell_of(x, y)
+        bucket = self.cells[cell]
+        for index, entry in enumerate(bucket):
+            if entry[2] == item:
+                del bucket[index]
+                break
+        else:
+            raise ValueError(f"{item!r} is not in the grid at ({x}, {y})")
+        if not bucket:
+            del self.cells[cell]
+        self._count -= 1
+
+    def clear(self):
+        self.cells = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def near(self, x, y, radius):
+        """ (squared distance, item) for the items closer than ``radius`` to (x, y), in no order. """
+        size = self.cell_size
+        radius_squared = radius * radius
+        found = []
+        for column in range(int((x - radius) // size), int((x + radius) // size) + 1):
+            for row in range(int((y - radius) // size), int((y + radius) // size) + 1):
+                for item_x, item_y, item in self.cells.get((column, row), ()):
+                    distance_squared = (item_x - x) ** 2 + (item_y - y) ** 2
+                    if distance_squared < radius_squared:
+                        found.append((distance_squared, item))
+        return found
+
+    def in_box(self, left, bottom, right, top):
+        """ Items on the tiles from (left, bottom) up to, not including, (right, top), in pixels. """
+        size = self.cell_size
+        cells = self.cells
+        found = []
+        for column in range(int(left // size), int(math.ceil(right / size))):
+            for row in range(int(bottom // size), int(math.ceil(top / size))):
+                bucket = cells.get((column, row))
+                if bucket:
+                    found.extend(item for _, _, item in bucket)
+        return found
+
+    def query(self, x, y, radius):
+        """ Items closer than ``radius`` to (x, y), nearest first. """
+        found = self.near(x, y, radius)
+        found.sort(key=lambda pair: pair[0])
+        return [item for _, item in found]
+
+
+class OccupancyMap:
+    """
+    One byte per tile saying whether it is blocked. Tiles outside the map
+    count as open, so the player can walk out through gaps in the border.
+
+    Supports ``(column, row) in occupancy`` and iterating over the blocked
+    tiles, like the set of wall positions it replaces. ``version`` goes up
+    whenever a tile is changed with ``set_blocked``.
+    """
+    def __init__(self, width, height, cell_size):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.cells = bytearray(width * height)
+        self.version = 0
+
+    @classmethod
+    def from_cells(cls, width, height, cell_size, blocked):
+        occupancy = cls(width, height, cell_size)
+        for column, row in blocked:
+            occupancy.cells[row * width + column] = 1
+        return occupancy
+
+    def is_blocked(self, column, row):
+        if 0 <= column < self.width and 0 <= row < self.height:
+            return self.cells[row * self.width + column] == 1
+        return False
+
+    def set_blocked(self, column, row, blocked=True):
+        self.cells[row * self.width + column] = 1 if blocked else 0
+        self.version += 1
+
+    def __contains__(self, cell):
+        return self.is_blocked(*cell)
+
+    def __iter__(self):
+        width = self.width
+        for index, blocked in enumerate(self.cells):
+            if blocked:
+                yield index % width, index // width
+
+    def __len__(self):
+        return self.cells.count(1)
+
+    def box_blocked(self, left, bottom, right, top):
+        """ Whether a box (in pixels) overlaps any blocked tile. Touching an edge is not overlapping. """
+        size = self.cell_size
+        for row in range(int(bottom // size), int(math.ceil(top / size))):
+            for column in range(int(left // size), int(math.ceil(right / size))):
+                if self.is_blocked(column, row):
+                    return True
+        return False
+
+    def move_box(self, x, y, hit_box, change_x, change_y):
+        """
+        Move a box centred on (x, y) by (change_x, change_y) and return where
+        it ends up. ``hit_box`` is (left, bottom, right, top) relative to the
+        centre. Each axis is moved on its own, so the box slides along walls,
+        and is stopped flush against the first blocked tile.
+        Only the few tiles the box overlaps are looked at.
+        """
+        left, bottom, right, top = hit_box
+        size = self.cell_size
+
+        if change_y:
+            y += change_y
+            if self.box_blocked(x + left, y + bottom, x + right, y + top):
+                if change_y > 0:
+                    y = math.ceil((y + top) / size - 1) * size - top
+                else:
+                    y = (int((y + bottom) // size) + 1) * size - bottom
+
+        if change_x:
+            x += change_x
+            if self.box_blocked(x + left, y + bottom, x + right, y + top):
+                if change_x > 0:
+                    x = math.ceil((x + right) / size - 1) * size - right
+                else:
+                    x = (int((x + left) // size) + 1) * size - left
+
+        return x, y
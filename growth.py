@@ -0,0 +1,53 @@
+"""
+When crops are due to grow.
+
+Nothing here imports arcade.
+"""
+import heapq
+
+
+class GrowthSchedule:
+    """
+    Batches of crops waiting for their next growth stage, bucketed by the
+    day it is due. A batch is a room and an array of crop ids in it.
+
+    Only the days that have something due are kept in the heap, so ending a
+    day costs O(log days) plus the crops that actually change, however many
+    others are still growing.
+
+    Entries are never taken out early: when a crop is dug up or rescheduled
+    the caller just ignores its stale entry when it comes due.
+    """
+    def __init__(self):
+        self._days = []  # Heap of days with something due
+        self._due = {}  # Day -> [(room_index, crops)] in the order they were scheduled
+        self._count = 0
+
+    def schedule(self, day, room_index, crops):
+        bucket = self._due.get(day)
+        if bucket is None:
+            bucket = self._due[day] = []
+            heapq.heappush(self._days, day)
+        bucket.append((room_index, crops))
+        self._count += len(crops)
+
+    def pop_due(self, today):
+        """ Remove and return every (room_index, crops) batch due on ``today`` or earlier. """
+        due = []
+        while self._days and self._days[0] <= today:
+            due.extend(self._due.pop(heapq.heappop(self._days)))
+        self._count -= sum(len(crops) for _, crops in due)
+        return due
+
+    def next_day(self):
+        """ The first day something is due, or None if nothing is growing. """
+        return self._days[0] if self._days else None
+
+    def clear(self):
+        self._days = []
+        self._due = {}
+        self._count = 0
+
+    def __len__(self):
+        """ Crops scheduled, counting stale entries. """
+        return self._count
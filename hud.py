@@ -0,0 +1,190 @@
+"""
+Retained heads-up display.
+
+The counters, hotbar and messages are kept as persistent ``arcade.Text``
+objects, one icon SpriteList and one ShapeElementList of outlines. They are
+only rebuilt when the value they show changes, so a normal frame draws the
+HUD without laying out any text.
+"""
+import arcade
+
+# Sapling/tomato counter boxes in the top left corner
+COUNTER_ICON_X = 30
+COUNTER_BOX_WIDTH = 180
+COUNTER_BOX_HEIGHT = 30
+COUNTER_SPACING = 60  # Tomato counter sits this far below the sapling counter
+
+# Hotbar at the bottom centre of the screen
+HOTBAR_Y = 30
+HOTBAR_SPACING = 65
+HOTBAR_ICON_SIZE = 50
+HOTBAR_OUTLINE_SIZE = 60
+
+# "Press E to ..." prompt just above the hotbar
+PROMPT_Y = HOTBAR_Y + HOTBAR_OUTLINE_SIZE
+
+
+class Hud:
+    """ Everything drawn over the room: counters, hotbar, messages and the interaction prompt. """
+
+    def __init__(self, width, height, hotbar_textures, sapling_icon, tomato_icon):
+        self.width = width
+        self.height = height
+        self.hotbar_textures = hotbar_textures
+
+        icon_x = COUNTER_ICON_X
+        icon_y = height - 10
+        self.box_x = icon_x - 20 + COUNTER_BOX_WIDTH / 2
+        self.box_y = icon_y - 15
+
+        # Icons never move; only the tomato icon is shown or hidden
+        self.icon_list = arcade.SpriteList()
+        self.sapling_icon = self._icon(sapling_icon, icon_x + COUNTER_BOX_WIDTH * 3 / 5, icon_y, 50)
+        self.tomato_icon = self._icon(tomato_icon, icon_x + COUNTER_BOX_WIDTH * 3 / 5,
+                                      self.box_y - COUNTER_SPACING, 25)
+        self.tomato_icon.visible = False
+        for idx, tool in enumerate(hotbar_textures):
+            self._icon(hotbar_textures[tool], self._hotbar_x(idx), HOTBAR_Y, HOTBAR_ICON_SIZE)
+
+        self.sapling_text = arcade.Text("", icon_x - 15, icon_y - 20, arcade.color.WHITE, 18)
+        self.tomato_text = arcade.Text("", icon_x - 15, icon_y - COUNTER_SPACING - 20,
+                                       arcade.color.WHITE, 18)
+        self.message_text = arcade.Text("", 0, 0, arcade.color.WHITE, 18,
+                                        anchor_x="center", anchor_y="bottom")
+        self.day_text = arcade.Text("", width // 2, height // 2, arcade.color.WHITE, 20,
+                                    anchor_x="center", anchor_y="center")
+        self.prompt_text = arcade.Text("", width // 2, PROMPT_Y, arcade.color.WHITE, 14,
+                                       anchor_x="center", anchor_y="bottom")
+
+        self.outlines = None
+
+        # What is currently shown, to tell when something has to be rebuilt
+        self._sapling_counter = None
+        self._tomato_counter = None
+        self._current_tool = None
+        self._message = None
+        self._message_position = None
+        self._day_message = None
+        self._day_alpha = None
+        self._prompt = None
+
+    def _icon(self, texture, x, y, size):
+        icon = arcade.Sprite(texture=texture, center_x=x, center_y=y)
+        icon.width = size
+        icon.height = size
+        self.icon_list.append(icon)
+        return icon
+
+    def _hotbar_x(self, idx):
+        return self.width // 2 + (idx - 0.5) * HOTBAR_SPACING
+
+    def _build_outlines(self):
+        """ Counter boxes and the highlight around the selected tool. """
+        self.outlines = arcade.ShapeElementList()
+        boxes = [self.box_y]
+        if self._tomato_counter >= 1:
+            boxes.append(self.box_y - COUNTER_SPACING)
+        for box_y in boxes:
+            self.outlines.append(arcade.create_rectangle_outline(
+                self.box_x, box_y, COUNTER_BOX_WIDTH, COUNTER_BOX_HEIGHT, arcade.color.WHITE))
+
+        for idx, tool in enumerate(self.hotbar_textures):
+            # Highlight the selected tool
+            if tool == self._current_tool:
+                self.outlines.append(arcade.create_rectangle_outline(
+                    self._hotbar_x(idx), HOTBAR_Y, HOTBAR_OUTLINE_SIZE, HOTBAR_OUTLINE_SIZE,
+                    arcade.color.YELLOW, 3))
+
+    def update(self, sapling_counter, tomato_counter, current_tool,
+               message=None, message_position=(0, 0), day_message=None, fade_out=1.0, prompt=None):
+        """ Bring the HUD up to date, rebuilding only the parts whose value changed. """
+        outlines_changed = False
+
+        if sapling_counter != self._sapling_counter:
+            self._sapling_counter = sapling_counter
+            self.sapling_text.text = f"Saplings       {sapling_counter}"
+
+        if tomato_counter != self._tomato_counter:
+            outlines_changed = (self._tomato_counter is None
+                                or (tomato_counter >= 1) != (self._tomato_counter >= 1))
+            self._tomato_counter = tomato_counter
+            self.tomato_text.text = f"Tomatoes      {tomato_counter}"
+            self.tomato_icon.visible = tomato_counter >= 1
+
+        if current_tool != self._current_tool:
+            self._current_tool = current_tool
+            outlines_changed = True
+
+        if outlines_changed:
+            self._build_outlines()
+
+        if message != self._message:
+            self._message = message
+            self.message_text.text = message or ""
+        if message and message_position != self._message_position:
+            self._message_position = message_position
+            self.message_text.position = message_position
+
+        if day_message != self._day_message:
+            self._day_message = day_message
+            self.day_text.text = day_message or ""
+        alpha = int(255 * fade_out)
+        if day_message and alpha != self._day_alpha:
+            self._day_alpha = alpha
+            self.day_text.color = (255, 255, 255, alpha)
+
+        if prompt != self._prompt:
+            self._prompt = prompt
+            self.prompt_text.text = prompt or ""
+
+    def draw(self):
+        self.outlines.draw()
+        self.icon_list.draw()
+        self.sapling_text.draw()
+        if self._tomato_counter >= 1:
+            self.tomato_text.draw()
+        if self._message:
+            self.message_text.draw()
+        if self._day_message:
+            self.day_text.draw()
+        if self._prompt:
+            self.prompt_text.draw()
+
+
+# Profiler overlay in the top right corner
+OVERLAY_MARGIN = 10
+OVERLAY_LINE_HEIGHT = 16
+OVERLAY_REFRESH_FRAMES = 30  # Percentiles are recomputed this often, not every frame
+
+
+class ProfilerOverlay:
+    """ p50/p99 frame and phase times from a profiler.FrameProfiler, one retained text line each. """
+
+    def __init__(self, profiler, width, height):
+        self.profiler = profiler
+        self.lines = []
+        for index in range(len(profiler.phases) + 1):
+            self.lines.append(arcade.Text("", width - OVERLAY_MARGIN,
+                                          height - OVERLAY_MARGIN - index * OVERLAY_LINE_HEIGHT,
+                                          arcade.color.YELLOW, 11, font_name="monospace",
+                                          anchor_x="right", anchor_y="top"))
+        self._refreshed_at = None
+
+    def update(self):
+        """ Recompute the shown times every OVERLAY_REFRESH_FRAMES frames. """
+        frames = self.profiler.frames
+        if self._refreshed_at is not None and frames - self._refreshed_at < OVERLAY_REFRESH_FRAMES:
+            return
+        self._refreshed_at = frames
+
+        summary = self.profiler.summary()
+        for line, name in zip(self.lines, ["frame"] + self.profiler.phases):
+            times = summary.get(name)
+            if times is None:
+                line.text = f"{name:>12}      -"
+            else:
+                line.text = f"{name:>12} p50 {times['p50']:6.2f} ms  p99 {times['p99']:6.2f} ms"
+
+    def draw(self):
+        for line in self.lines:
+            line.draw()
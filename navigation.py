@@ -0,0 +1,285 @@
+"""
+Finding the way around a room's walls.
+
+A NavGrid is the graph of a room's open tiles, each linked to the open
+tiles above, below, left and right of it. It answers two questions:
+
+    find_path(start, goal)   the shortest path between two tiles (A*)
+    flow_field(targets)      for every tile, which way to step to get
+                             closer to the nearest of ``targets`` (a BFS
+                             from all of them at once)
+
+A flow field is searched once and then read by any number of agents, a
+lookup per agent, so a crowd of helpers heading for the saplings costs
+no more searching than one.
+
+Both kinds of answers are cached on the NavGrid, and NavGrids are cached
+by the room layout: a room that is packed and built again, or two rooms
+with the same walls, share one. Changing a wall (OccupancyMap.set_blocked)
+makes it a different layout, with a NavGrid of its own, so nothing worked
+out for the old walls is used again. Flow fields are kept per set of
+target tiles, so they are only searched again when the targets move.
+
+Tiles are (column, row), row 0 at the bottom, like the OccupancyMap.
+Only tiles inside the room are walked; exits out of it are not.
+
+Nothing here imports arcade.
+"""
+import hashlib
+import heapq
+from collections import OrderedDict
+
+import numpy as np
+
+# Directions a flow field can point in, as (column, row) steps
+DIRECTIONS = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int8)
+NO_DIRECTION = -1  # At a target, or nowhere to go
+UNREACHABLE = np.iinfo(np.int32).max
+
+# How many of each answer are kept before the least recently used ones go
+LAYOUT_CACHE_SIZE = 64
+PATH_CACHE_SIZE = 4096
+FLOW_FIELD_CACHE_SIZE = 16
+
+
+class FlowField:
+    """
+    The result of a search from a set of target tiles: ``distance`` to the
+    nearest target in steps (UNREACHABLE where there is no way there) and
+    the ``direction`` to step in (an index into DIRECTIONS, or
+    NO_DIRECTION), both (height, width) arrays.
+    """
+    def __init__(self, distance, direction, cell_size):
+        self.distance = distance
+        self.direction = direction
+        self.cell_size = cell_size
+        self.height, self.width = distance.shape
+
+    def step(self, column, row):
+        """ The (column, row) step to take from a tile; (0, 0) at a target or out of reach. """
+        if not (0 <= column < self.width and 0 <= row < self.height):
+            return 0, 0
+        direction = self.direction[row, column]
+        if direction == NO_DIRECTION:
+            return 0, 0
+        step_column, step_row = DIRECTIONS[direction]
+        return int(step_column), int(step_row)
+
+    def steps(self, xs, ys):
+        """
+        The (column, row) steps to take for agents standing at pixel
+        positions ``xs``, ``ys`` (arrays), as two int8 arrays. Agents
+        outside the room, at a target or out of reach get (0, 0).
+        """
+        columns = (np.asarray(xs) // self.cell_size).astype(np.int64)
+        rows = (np.asarray(ys) // self.cell_size).astype(np.int64)
+        inside = (columns >= 0) & (columns < self.width) & (rows >= 0) & (rows < self.height)
+        direction = np.full(len(columns), NO_DIRECTION, dtype=np.int8)
+        direction[inside] = self.direction[rows[inside], columns[inside]]
+        moving = direction != NO_DIRECTION
+        step_columns = np.zeros(len(columns), dtype=np.int8)
+        step_rows = np.zeros(len(columns), dtype=np.int8)
+        step_columns[moving] = DIRECTIONS[direction[moving], 0]
+        step_rows[moving] = DIRECTIONS[direction[moving], 1]
+        return step_columns, step_rows
+
+
+class NavGrid:
+    """
+    The open tiles of an OccupancyMap as a graph, with the paths and flow
+    fields found on it so far. It is built from a copy of the walls and
+    never changes. Get one with ``nav_grid(walls)`` rather than building
+    it, so rooms with the same layout share it.
+
+    Internally tiles are numbered on a grid one tile bigger on every side,
+    whose border is blocked, so a tile's neighbours are always at fixed
+    offsets of its number and never wrap around or fall off the grid.
+    """
+    def __init__(self, walls):
+        self.width = walls.width
+        self.height = walls.height
+        self.cell_size = walls.cell_size
+        self._stride = self.width + 2
+
+        blocked = np.frombuffer(bytes(walls.cells), dtype=np.uint8).reshape(self.height, self.width)
+        self.open = np.zeros((self.height + 2, self._stride), dtype=bool)
+        self.open[1:-1, 1:-1] = blocked == 0
+        self._open_flat = self.open.ravel()
+        self._open_bytes = self._open_flat.tobytes()  # Quicker to index one tile at a time
+        self._offsets = np.array([1, -1, self._stride, -self._stride], dtype=np.int64)
+
+        self._components = np.zeros(self._open_flat.shape, dtype=np.int32)  # 0: not labelled yet
+        self._component_count = 0
+        self._paths = OrderedDict()  # (start, goal) -> list of tiles, or None
+        self._fields = OrderedDict()  # Target tile bytes -> FlowField
+        self.searches = 0  # A* searches and flow fields actually run, not served from the cache
+        self.hits = 0
+
+    def _number(self, column, row):
+        return (row + 1) * self._stride + column + 1
+
+    def _tile(self, number):
+        row, column = divmod(number, self._stride)
+        return column - 1, row - 1
+
+    def is_open(self, column, row):
+        return 0 <= column < self.width and 0 <= row < self.height and bool(self.open[row + 1, column + 1])
+
+    def find_path(self, start, goal):
+        """
+        The shortest list of tiles from ``start`` to ``goal`` (both
+        (column, row), included), or None if there is no way.
+        """
+        key = (start, goal)
+        if key in self._paths:
+            self._paths.move_to_end(key)
+            self.hits += 1
+            return self._paths[key]
+
+        path = self._search(start, goal)
+        self._paths[key] = path
+        if len(self._paths) > PATH_CACHE_SIZE:
+            self._paths.popitem(last=False)
+        return path
+
+    def _component(self, number):
+        """
+        Which connected part of the room a tile is in. Labelled the first
+        time a tile of it is asked about, by flooding it, so telling that
+        there is no path between two tiles never takes a search.
+        """
+        label = self._components[number]
+        if label:
+            return label
+        self._component_count += 1
+        label = self._component_count
+        self._flood(np.array([number]), self._components, 0, label)
+        return label
+
+    def _flood(self, frontier, reached, unset, value=None):
+        """
+        Breadth first search from the tiles in ``frontier``, one whole ring
+        of tiles per step, over open tiles where ``reached`` is still
+        ``unset``. Each tile reached is set to ``value``, or to the number
+        of steps it took if ``value`` is None.
+        """
+        is_open = self._open_flat
+        reached[frontier] = 0 if value is None else value
+        steps = 0
+        while len(frontier):
+            steps += 1
+            neighbours = (frontier[:, None] + self._offsets).ravel()
+            neighbours = neighbours[is_open[neighbours] & (reached[neighbours] == unset)]
+            frontier = np.unique(neighbours)
+            reached[frontier] = steps if value is None else value
+
+    def _search(self, start, goal):
+        self.searches += 1
+        if not (self.is_open(*start) and self.is_open(*goal)):
+            return None
+        start_number = self._number(*start)
+        goal_number = self._number(*goal)
+        if self._component(start_number) != self._component(goal_number):
+            return None
+        goal_column, goal_row = goal
+        stride = self._stride
+        is_open = self._open_bytes
+        offsets = self._offsets.tolist()
+
+        came_from = {start_number: None}
+        cost = {start_number: 0}
+        # (estimate, -steps so far, tile): the Manhattan distance never
+        # overestimates on a 4-way grid, and of equal estimates the tile
+        # furthest along is tried first, which saves exploring ties
+        frontier = [(abs(start[0] - goal_column) + abs(start[1] - goal_row), 0, start_number)]
+        while frontier:
+            _, steps, number = heapq.heappop(frontier)
+            if number == goal_number:
+                break
+            steps = -steps
+            if steps > cost[number]:
+                continue  # Stale entry, the tile was reached faster since
+            steps += 1
+            for offset in offsets:
+                neighbour = number + offset
+                if not is_open[neighbour] or cost.get(neighbour, steps + 1) <= steps:
+                    continue
+                cost[neighbour] = steps
+                came_from[neighbour] = number
+                row, column = divmod(neighbour, stride)
+                estimate = steps + abs(column - 1 - goal_column) + abs(row - 1 - goal_row)
+                heapq.heappush(frontier, (estimate, -steps, neighbour))
+        else:
+            return None
+
+        path = []
+        number = goal_number
+        while number is not None:
+            path.append(self._tile(number))
+            number = came_from[number]
+        path.reverse()
+        return path
+
+    def flow_field(self, columns, rows):
+        """ The FlowField towards the target tiles at ``columns``, ``rows`` (arrays). """
+        columns = np.asarray(columns, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        inside = (columns >= 0) & (columns < self.width) & (rows >= 0) & (rows < self.height)
+        targets = np.unique((rows[inside] + 1) * self._stride + columns[inside] + 1)
+        key = targets.tobytes()
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            self.hits += 1
+            return field
+
+        field = self._flow(targets)
+        self._fields[key] = field
+        if len(self._fields) > FLOW_FIELD_CACHE_SIZE:
+            self._fields.popitem(last=False)
+        return field
+
+    def _flow(self, targets):
+        """ The FlowField towards ``targets`` (tile numbers), searching from all of them at once. """
+        self.searches += 1
+        distance = np.full(self._open_flat.shape, UNREACHABLE, dtype=np.int32)
+        self._flood(targets[self._open_flat[targets]], distance, UNREACHABLE)
+
+        # Point every tile at its closest neighbour; one of them is a step nearer a target
+        distance = distance.reshape(self.open.shape)
+        neighbour_distances = np.stack([
+            np.roll(distance, -1, axis=1),  # Right
+            np.roll(distance, 1, axis=1),  # Left
+            np.roll(distance, -1, axis=0),  # Up
+            np.roll(distance, 1, axis=0),  # Down
+        ])
+        direction = np.argmin(neighbour_distances, axis=0).astype(np.int8)
+        direction[(distance == 0) | (distance == UNREACHABLE)] = NO_DIRECTION
+        return FlowField(distance[1:-1, 1:-1].copy(), direction[1:-1, 1:-1].copy(), self.cell_size)
+
+    def stats(self):
+        return {"searches": self.searches, "hits": self.hits, "paths": len(self._paths),
+                "flow_fields": len(self._fields)}
+
+
+_layouts = OrderedDict()  # Layout digest -> NavGrid
+
+
+def layout_key(walls):
+    """ A digest of the walls of a room, the same for any room laid out the same way. """
+    digest = hashlib.blake2b(bytes(walls.cells), digest_size=16)
+    digest.update(f"{walls.width}x{walls.height}@{walls.cell_size}".encode())
+    return digest.digest()
+
+
+def nav_grid(walls):
+    """ The NavGrid of a room with these walls (an OccupancyMap), shared by every room laid out alike. """
+    key = layout_key(walls)
+    grid = _layouts.get(key)
+    if grid is None:
+        grid = _layouts[key] = NavGrid(walls)
+        if len(_layouts) > LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+    else:
+        _layouts.move_to_end(key)
+    return grid
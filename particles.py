@@ -0,0 +1,256 @@
+"""
+Particle effects: water splashes, harvest bursts and the stars of bedtime.
+
+Each kind of effect has a fixed-size ring of particles in one GL buffer,
+mirrored in a NumPy struct array: where and when each particle was
+emitted, its velocity, how long it lives and its colour. Emitting writes
+a whole batch of new particles into the ring at once (one buffer write,
+two when it wraps around), and nothing is written after that: the vertex
+shader works out where each particle is from the time since it was
+emitted, under the effect's gravity, and fades it out over its life. So a
+frame costs one uniform write and one draw call per kind of effect,
+however many particles are alive.
+
+Particles are drawn as point sprites, one vertex each, over the part of
+the ring emitted recently enough to still be alive; particles in it that
+died early are dropped in the vertex shader. Nothing is drawn for an
+effect with no particles alive.
+
+Particles are positioned in room pixels and drawn with arcade's
+projection, like sprites. Their randomness comes from their own
+generator, never from the farm's, so effects do not change how a game
+plays out.
+"""
+from collections import deque
+
+import numpy as np
+from arcade.gl import BufferDescription
+
+VERTEX_SHADER = """
+#version 330
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+uniform float time;
+uniform vec2 gravity;
+uniform float size;
+in vec2 in_origin;
+in vec2 in_velocity;
+in vec2 in_life;  // Time emitted, seconds to live
+in vec4 in_color;
+out vec4 color;
+
+void main() {
+    float age = time - in_life.x;
+    if (age < 0.0 || age >= in_life.y) {
+        gl_Position = vec4(2.0, 2.0, 0.0, 1.0);  // Dead, or not born yet: off screen
+        gl_PointSize = 0.0;
+        return;
+    }
+    vec2 position = in_origin + in_velocity * age + 0.5 * gravity * age * age;
+    gl_Position = proj.matrix * vec4(position, 0.0, 1.0);
+    gl_PointSize = size;
+    color = vec4(in_color.rgb, in_color.a * (1.0 - age / in_life.y));
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+in vec4 color;
+out vec4 fragColor;
+
+void main() {
+    // Round, with a soft edge
+    float edge = 1.0 - smoothstep(0.6, 1.0, length(gl_PointCoord * 2.0 - 1.0));
+    fragColor = vec4(color.rgb, color.a * edge);
+}
+"""
+
+PARTICLE = np.dtype([
+    ("origin", np.float32, 2),
+    ("velocity", np.float32, 2),
+    ("life", np.float32, 2),  # Time emitted, seconds to live
+    ("color", np.uint8, 4),
+])
+
+# What each kind of effect looks like. Speeds are in pixels per second,
+# angles in degrees (90 is straight up) and gravity in pixels per second
+# squared. ``count`` particles are emitted per origin.
+EFFECTS = {
+    "splash": {"capacity": 32768, "count": 40, "size": 5, "lifetime": (0.4, 0.8),
+               "speed": (60, 180), "angle": 90, "spread": 120, "gravity": (0, -500),
+               "colors": [(80, 160, 255, 255), (140, 200, 255, 230), (40, 110, 220, 255)]},
+    "harvest": {"capacity": 16384, "count": 120, "size": 6, "lifetime": (0.6, 1.2),
+                "speed": (80, 260), "angle": 90, "spread": 360, "gravity": (0, -300),
+                "colors": [(230, 40, 30, 255), (255, 120, 40, 255), (90, 190, 60, 255),
+                           (255, 220, 80, 255)]},
+    "bedtime": {"capacity": 16384, "count": 1, "size": 4, "lifetime": (1.5, 3.0),
+                "speed": (10, 40), "angle": 90, "spread": 60, "gravity": (0, 10),
+                "colors": [(255, 250, 200, 255), (200, 220, 255, 255), (255, 230, 140, 220)]},
+}
+
+BEDTIME_STARS = 3000  # Scattered over the screen when going to bed
+
+
+class ParticleEmitter:
+    """
+    The particles of one kind of effect, ``settings`` being its entry in
+    EFFECTS: a ring of ``capacity`` particles in a struct array and a GL
+    buffer, drawn in one call.
+    """
+    def __init__(self, ctx, settings, rng):
+        self.ctx = ctx
+        self.settings = settings
+        self.rng = rng
+        self.capacity = settings["capacity"]
+        self.particles = np.zeros(self.capacity, dtype=PARTICLE)
+        self.particles["life"][:, 0] = -np.inf  # Never emitted, so never drawn
+        self.head = 0  # Where the next particle goes
+        # (time the last of it dies, where it starts, emitted before it) of each batch maybe alive
+        self.batches = deque()
+        self.emitted = 0
+        self.writes = 0  # How many times the buffer was written to
+
+        self.buffer = ctx.buffer(data=self.particles.tobytes())
+        self.geometry = ctx.geometry([
+            BufferDescription(self.buffer, "2f 2f 2f 4f1",
+                              ["in_origin", "in_velocity", "in_life", "in_color"],
+                              normalized=["in_color"]),
+        ], mode=ctx.POINTS)
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self.program["gravity"] = settings["gravity"]
+        self.program["size"] = settings["size"]
+
+    def emit(self, xs, ys, time):
+        """ Emit one particle from each of the origins ``xs``, ``ys`` (arrays) at ``time``. """
+        self.add(self.make(xs, ys), time)
+
+    def make(self, xs, ys):
+        """
+        A batch of particles from the origins ``xs``, ``ys``, with random
+        velocities, lifetimes and colours, to add() now or later.
+        """
+        count = min(len(xs), self.capacity)  # A batch bigger than the ring only keeps its last particles
+        settings = self.settings
+        rng = self.rng
+        batch = np.empty(count, dtype=PARTICLE)
+        batch["origin"][:, 0] = xs[len(xs) - count:]
+        batch["origin"][:, 1] = ys[len(ys) - count:]
+        angles = np.radians(settings["angle"] + (rng.random(count) - 0.5) * settings["spread"])
+        speeds = rng.uniform(*settings["speed"], count)
+        batch["velocity"][:, 0] = np.cos(angles) * speeds
+        batch["velocity"][:, 1] = np.sin(angles) * speeds
+        batch["life"][:, 1] = rng.uniform(*settings["lifetime"], count)
+        colors = np.array(settings["colors"], dtype=np.uint8)
+        batch["color"] = colors[rng.integers(len(colors), size=count)]
+        return batch
+
+    def add(self, batch, time):
+        """ Emit a batch from make() at ``time``, in one buffer write (two if it wraps around the ring). """
+        count = len(batch)
+        if not count:
+            return
+        batch["life"][:, 0] = time
+        self.batches.append((time + self.settings["lifetime"][1], self.head, self.emitted))
+
+        # Into the ring from the head, wrapping around to the start
+        first = min(count, self.capacity - self.head)
+        self._write(self.head, batch[:first])
+        if first < count:
+            self._write(0, batch[first:])
+        self.head = (self.head + count) % self.capacity
+        self.emitted += count
+
+    def _write(self, start, batch):
+        # As bytes: NumPy copies struct arrays field by field, ten times slower
+        self.particles[start:start + len(batch)].view(np.uint8)[:] = batch.view(np.uint8)
+        self.buffer.write(batch.tobytes(), offset=start * PARTICLE.itemsize)
+        self.writes += 1
+
+    def alive(self, time):
+        """ How many particles are alive at ``time``. Counted on the CPU, so only for stats. """
+        life = self.particles["life"]
+        age = time - life[:, 0]
+        return int(np.count_nonzero((age >= 0) & (age < life[:, 1])))
+
+    def draw(self, time):
+        """
+        Draw the particles alive at ``time``: those from the oldest batch
+        still alive up to the head of the ring, in two calls if that part
+        of the ring wraps around its end.
+        """
+        batches = self.batches
+        while batches and batches[0][0] <= time:
+            batches.popleft()
+        if not batches:
+            return
+        self.ctx.enable(self.ctx.PROGRAM_POINT_SIZE)
+        self.program["time"] = time
+        _, first, emitted_before = batches[0]
+        if self.emitted - emitted_before >= self.capacity:
+            first = self.head  # The live part is the whole ring
+        if first < self.head:
+            self.geometry.render(self.program, first=first, vertices=self.head - first)
+        else:
+            self.geometry.render(self.program, first=first, vertices=self.capacity - first)
+            if self.head:
+                self.geometry.render(self.program, first=0, vertices=self.head)
+
+
+class ParticleSystem:
+    """
+    One ParticleEmitter per kind of effect in ``effects``, sharing a clock
+    that the game moves on with advance(). ``seed`` seeds their randomness.
+    """
+    def __init__(self, ctx, effects=EFFECTS, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.emitters = {name: ParticleEmitter(ctx, settings, self.rng) for name, settings in effects.items()}
+        self.time = 0.0
+        self._scatters = {}  # (effect, count) -> batch over a 1 x 1 square
+
+    def advance(self, seconds):
+        self.time += seconds
+
+    def burst(self, effect, xs, ys):
+        """ Set off ``effect`` at each of the points ``xs``, ``ys``: its ``count`` particles from each. """
+        emitter = self.emitters[effect]
+        count = emitter.settings["count"]
+        emitter.emit(np.repeat(np.asarray(xs, dtype=np.float32), count),
+                     np.repeat(np.asarray(ys, dtype=np.float32), count), self.time)
+
+    def scatter(self, effect, left, bottom, width, height, count, variant=0):
+        """
+        ``count`` particles of ``effect`` from points all over a rectangle.
+        The particles are made once, over a 1 x 1 square, and stretched
+        over the rectangle each time, so a scatter costs a few array
+        operations and a buffer write however many particles it has.
+        Each ``variant`` (the day, for bedtime) shifts the points around
+        the square by a different amount, so that scatters don't all look
+        the same.
+        """
+        emitter = self.emitters[effect]
+        template = self._scatters.get((effect, count))
+        if template is None:
+            template = self._scatters[effect, count] = emitter.make(self.rng.random(count, dtype=np.float32),
+                                                                    self.rng.random(count, dtype=np.float32))
+        batch = template.view(np.uint8).copy().view(PARTICLE)
+        # A column at a time: NumPy is slow at broadcasting over rows of two.
+        # The shifts are spread evenly over the square (the R2 sequence), and
+        # wrap around its edges
+        origin = batch["origin"]
+        for column, shift, size, start in ((origin[:, 0], 0.7548777, width, left),
+                                           (origin[:, 1], 0.5698403, height, bottom)):
+            column += variant * shift % 1.0
+            column %= 1.0
+            column *= size
+            column += start
+        emitter.add(batch, self.time)
+
+    def draw(self, ahead=0.0):
+        """ Draw every effect, one call each, as it is ``ahead`` seconds after the clock. """
+        for emitter in self.emitters.values():
+            emitter.draw(self.time + ahead)
+
+    def stats(self):
+        return {name: {"alive": emitter.alive(self.time), "emitted": emitter.emitted, "writes": emitter.writes}
+                for name, emitter in self.emitters.items()}
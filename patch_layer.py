@@ -0,0 +1,133 @@
+"""
+The dirt patches of a room, or of a chunk of one, drawn in one instanced call.
+
+Every patch is the same textured quad, so instead of a sprite each there
+is one buffer with the patch positions and one with their tints. The
+tints come from the soil moisture under the patches: a layer's worth is
+computed with NumPy and written to the GPU in a single buffer write,
+however many patches there are. The shader program and the quad are made
+once, in a PatchRenderer, and shared by every layer.
+"""
+import numpy as np
+from arcade.gl import BufferDescription
+
+VERTEX_SHADER = """
+#version 330
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+uniform vec2 patch_size;
+in vec2 in_vert;
+in vec2 in_uv;
+in vec2 in_position;
+in vec4 in_color;
+out vec2 uv;
+out vec4 color;
+
+void main() {
+    vec2 position = in_position + in_vert * patch_size;
+    gl_Position = proj.matrix * vec4(position, 0.0, 1.0);
+    uv = in_uv;
+    color = in_color;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D patch_texture;
+in vec2 uv;
+in vec4 color;
+out vec4 fragColor;
+
+void main() {
+    fragColor = texture(patch_texture, uv) * color;
+}
+"""
+
+# Corners of a patch around its centre, in patch sizes, with their texture coordinates
+QUAD = np.array([
+    -0.5, -0.5, 0.0, 0.0,
+    0.5, -0.5, 1.0, 0.0,
+    -0.5, 0.5, 0.0, 1.0,
+    0.5, 0.5, 1.0, 1.0,
+], dtype=np.float32)
+
+DRY_COLOR = (255, 255, 255)
+WET_COLOR = (139, 69, 19)
+
+# Tint for each of 256 moisture levels, from dry to soaked
+TINT_LEVELS = 256
+TINTS = np.empty((TINT_LEVELS, 4), dtype=np.uint8)
+TINTS[:, :3] = np.linspace(DRY_COLOR, WET_COLOR, TINT_LEVELS)
+TINTS[:, 3] = 255
+
+
+def moisture_colors(moisture, out=None):
+    """
+    RGBA tints (an (n, 4) uint8 array) for patches with the given
+    moisture: dry is untinted, soaked is brown. Looked up from TINTS, so
+    a million patches take a few milliseconds.
+    """
+    levels = np.clip(moisture * (TINT_LEVELS - 1), 0, TINT_LEVELS - 1).astype(np.uint8)
+    return np.take(TINTS, levels, axis=0, out=out)
+
+
+class PatchRenderer:
+    """
+    What every PatchLayer is drawn with: ``texture``, the GL texture of a
+    patch, at ``size`` (width, height) on screen, and the shader program
+    and quad for it.
+    """
+    def __init__(self, ctx, texture, size):
+        self.ctx = ctx
+        self.texture = texture
+        self.size = size
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self.program["patch_size"] = size
+        self.quad = ctx.buffer(data=QUAD.tobytes())
+        self.layers = 0  # How many layers were made
+
+    def layer(self, xs, ys):
+        """ A new PatchLayer of patches at ``xs``, ``ys``. """
+        self.layers += 1
+        return PatchLayer(self, xs, ys)
+
+
+class PatchLayer:
+    """
+    Some patches of a room, at pixel positions ``xs``, ``ys`` in the room,
+    drawn by ``renderer`` (a PatchRenderer) with arcade's projection like
+    sprites. Its GL buffers are freed with the layer.
+    """
+    def __init__(self, renderer, xs, ys):
+        self.renderer = renderer
+        self.count = len(xs)
+        self.colors = np.empty((self.count, 4), dtype=np.uint8)
+        self.updates = 0  # How many times the tints were written
+        if not self.count:
+            return  # Nothing to draw, and GL buffers cannot be empty
+
+        ctx = renderer.ctx
+        positions = np.column_stack([xs, ys]).astype(np.float32)
+        self.position_buffer = ctx.buffer(data=positions.tobytes())
+        self.color_buffer = ctx.buffer(reserve=self.colors.nbytes)
+        self.geometry = ctx.geometry([
+            BufferDescription(renderer.quad, "2f 2f", ["in_vert", "in_uv"]),
+            BufferDescription(self.position_buffer, "2f", ["in_position"], instanced=True),
+            BufferDescription(self.color_buffer, "4f1", ["in_color"], normalized=["in_color"],
+                              instanced=True),
+        ], mode=ctx.TRIANGLE_STRIP)
+
+    def update_colors(self, moisture):
+        """ Tint every patch by the moisture under it, in one write to the GPU. """
+        if not self.count:
+            return
+        moisture_colors(moisture, out=self.colors)
+        self.color_buffer.write(self.colors)
+        self.updates += 1
+
+    def draw(self):
+        if not self.count:
+            return
+        self.renderer.texture.use(0)
+        self.geometry.render(self.renderer.program, instances=self.count)
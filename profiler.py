@@ -0,0 +1,168 @@
+"""
+Frame-phase profiler.
+
+Each frame, the time spent in every named phase (movement, input handling,
+each draw layer, ...) is added up and stored in a ring buffer holding the
+last ``capacity`` frames, so p50/p99 times can be shown while playing and
+the recent frames written out for a closer look:
+
+    with profiler.phase("hud"):
+        hud.draw()
+    ...
+    profiler.end_frame()
+
+Recordings export to CSV, JSON, or the Chrome trace event format, which
+chrome://tracing and https://ui.perfetto.dev open.
+
+Nothing here imports arcade.
+"""
+import csv
+import json
+import time
+
+import numpy as np
+
+DEFAULT_CAPACITY = 600  # Ten seconds at 60 fps
+
+
+class _PhaseTimer:
+    """ Context manager adding the time spent inside it to one phase of the current frame. """
+    __slots__ = ("profiler", "column", "start")
+
+    def __init__(self, profiler, column):
+        self.profiler = profiler
+        self.column = column
+        self.start = 0
+
+    def __enter__(self):
+        self.start = self.profiler.clock()
+
+    def __exit__(self, *exc_info):
+        profiler = self.profiler
+        row = profiler.row
+        if not profiler.phase_start[row, self.column]:
+            profiler.phase_start[row, self.column] = self.start
+        profiler.phase_time[row, self.column] += profiler.clock() - self.start
+
+
+class FrameProfiler:
+    """
+    Per-phase frame timings for the last ``capacity`` frames. Times are
+    kept in nanoseconds and reported in milliseconds.
+    """
+    def __init__(self, phases, capacity=DEFAULT_CAPACITY, clock=time.perf_counter_ns):
+        self.phases = list(phases)
+        self.capacity = capacity
+        self.clock = clock
+
+        # One row per frame, one column per phase, plus the row of the frame
+        # still being recorded
+        rows = capacity + 1
+        self.frame_start = np.zeros(rows, dtype=np.int64)
+        self.frame_time = np.zeros(rows, dtype=np.int64)
+        self.phase_start = np.zeros((rows, len(self.phases)), dtype=np.int64)  # First entered
+        self.phase_time = np.zeros((rows, len(self.phases)), dtype=np.int64)  # Total inside
+
+        self.frames = 0  # Frames recorded since the start, including those overwritten
+        self.row = 0  # Row of the frame being recorded
+        self._last_frame_end = None
+        self._timers = {name: _PhaseTimer(self, column) for column, name in enumerate(self.phases)}
+
+    def phase(self, name):
+        """ ``with profiler.phase(name):`` times the block as part of the current frame. """
+        return self._timers[name]
+
+    def end_frame(self):
+        """
+        Close the current frame; it lasted from the end of the previous one
+        until now. Nothing is kept for the very first call, which has no
+        previous frame to measure from.
+        """
+        now = self.clock()
+        if self._last_frame_end is not None:
+            self.frame_start[self.row] = self._last_frame_end
+            self.frame_time[self.row] = now - self._last_frame_end
+            self.frames += 1
+            self.row = self.frames % len(self.frame_time)
+        self._last_frame_end = now
+        self.phase_start[self.row] = 0
+        self.phase_time[self.row] = 0
+
+    def reset(self):
+        self.frames = 0
+        self.row = 0
+        self._last_frame_end = None
+        self.phase_start[:] = 0
+        self.phase_time[:] = 0
+
+    def recent_rows(self):
+        """ Rows of the recorded frames still in the buffer, oldest first. """
+        count = min(self.frames, self.capacity)
+        return np.arange(self.frames - count, self.frames) % len(self.frame_time)
+
+    def percentiles(self, phase=None, q=(50, 99)):
+        """ Percentiles in ms of the frame time, or of one phase's time. None if nothing is recorded. """
+        rows = self.recent_rows()
+        if not len(rows):
+            return None
+        if phase is None:
+            times = self.frame_time[rows]
+        else:
+            times = self.phase_time[rows, self.phases.index(phase)]
+        return tuple(float(value) for value in np.percentile(times, q) / 1e6)
+
+    def summary(self):
+        """ p50/p99 in ms of the frame time and every phase. """
+        summary = {}
+        for name in [None] + self.phases:
+            percentiles = self.percentiles(name)
+            if percentiles is not None:
+                summary[name or "frame"] = {"p50": percentiles[0], "p99": percentiles[1]}
+        return summary
+
+    def to_csv(self, path):
+        """ One row per frame: frame time and the time of each phase, in ms. """
+        rows = self.recent_rows()
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame", "frame_ms"] + [f"{name}_ms" for name in self.phases])
+            first = self.frames - len(rows)
+            for number, row in enumerate(rows, first):
+                writer.writerow([number, self.frame_time[row] / 1e6]
+                                + (self.phase_time[row] / 1e6).tolist())
+
+    def to_json(self, path):
+        """ The summary plus every frame's phase times, in ms. """
+        rows = self.recent_rows()
+        data = {
+            "phases": self.phases,
+            "summary": self.summary(),
+            "frames": [
+                {"frame_ms": self.frame_time[row] / 1e6,
+                 "phases_ms": dict(zip(self.phases, (self.phase_time[row] / 1e6).tolist()))}
+                for row in rows
+            ],
+        }
+        with open(path, "w") as file:
+            json.dump(data, file, indent=1)
+
+    def to_chrome_trace(self, path):
+        """
+        A Chrome trace event file: each frame is a span with its phases as
+        spans inside it, starting when the phase was first entered.
+        """
+        rows = self.recent_rows()
+        events = []
+        if len(rows):
+            origin = self.frame_start[rows[0]]
+            for number, row in enumerate(rows, self.frames - len(rows)):
+                events.append({"name": f"frame {number}", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (self.frame_start[row] - origin) / 1e3,
+                               "dur": self.frame_time[row] / 1e3})
+                for column, name in enumerate(self.phases):
+                    if self.phase_start[row, column]:
+                        events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                                       "ts": (self.phase_start[row, column] - origin) / 1e3,
+                                       "dur": self.phase_time[row, column] / 1e3})
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
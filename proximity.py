@@ -0,0 +1,61 @@
+"""
+Keeping track of what is within reach of the player.
+
+A Proximity is told where the player is after every step. It looks up the
+crops, dirt patches and beds around them in the room's SpatialGrids and
+says what came into reach and what went out of it since the last step, as
+("crop", id), ("patch", index) and ("bed", bed) pairs. It only looks again
+when the player moved, changed rooms or the room changed (its
+``version``), and then only at the few tiles within reach, so a step costs
+as much as what is near the player, however much is in the room.
+
+Nothing here imports arcade.
+"""
+
+# Which SpatialGrid of a RoomState each kind of thing is kept in
+GRIDS = {"crop": "crop_grid", "patch": "patch_grid", "bed": "bed_grid"}
+
+
+class Proximity:
+    """
+    What is within ``reach`` of one player: ``reach`` maps "crop", "patch"
+    and "bed" to how close, in pixels, the player has to be. ``nearby``
+    holds the (kind, item) pairs in reach, nearest first.
+    """
+    def __init__(self, reach):
+        self.reach = reach
+        self.nearby = {}  # (kind, item) -> squared distance, nearest first
+        self._looked = None  # (room index, room version, x, y) of the last look
+
+    def update(self, room_index, room, x, y):
+        """
+        Look again at what is within reach of (x, y) in ``room``, if
+        anything changed since the last look. Returns the (kind, item)
+        pairs that came into reach and those that went out of it.
+        """
+        looked = (room_index, room.version, x, y)
+        if looked == self._looked:
+            return [], []
+        same_room = self._looked is not None and self._looked[0] == room_index
+        self._looked = looked
+
+        found = []
+        for kind, radius in self.reach.items():
+            for distance_squared, item in getattr(room, GRIDS[kind]).near(x, y, radius):
+                found.append((distance_squared, (kind, item)))
+        found.sort(key=lambda pair: pair[0])
+        nearby = {thing: distance_squared for distance_squared, thing in found}
+
+        previous = self.nearby if same_room else {}
+        entered = [thing for thing in nearby if thing not in previous]
+        left = [thing for thing in self.nearby if thing not in nearby or not same_room]
+        self.nearby = nearby
+        return entered, left
+
+    def discard(self, thing):
+        """ Forget a (kind, item) pair that is gone, e.g. a crop that was picked up. """
+        self.nearby.pop(thing, None)
+
+    def reset(self):
+        self.nearby = {}
+        self._looked = None
@@ -0,0 +1,76 @@
+"""
+Input recording and replay.
+
+The game applies key and mouse input at the start of a simulation tick, so
+a session is fully described by the farm's seed and which inputs arrived
+on which tick. A Recording holds exactly that, plus the farm's fingerprint
+at the end, so a replay can check it ended up in the same state, and
+whether auto-pickup was on, as it changes what walking does.
+
+Nothing here imports arcade.
+"""
+import json
+
+RECORDING_VERSION = 1
+
+
+class Recording:
+    """ The seed of a session and its inputs as (tick, kind, args) in the order they were applied. """
+
+    def __init__(self, seed, inputs=None, ticks=0, fingerprint=None, auto_pickup=False):
+        self.seed = seed
+        self.inputs = inputs if inputs is not None else []
+        self.ticks = ticks  # Length of the session in ticks
+        self.fingerprint = fingerprint  # Farm.fingerprint() when the recording stopped
+        self.auto_pickup = auto_pickup
+
+    def record(self, tick, kind, args):
+        self.inputs.append((tick, kind, list(args)))
+
+    def finish(self, ticks, fingerprint):
+        self.ticks = ticks
+        self.fingerprint = fingerprint
+
+    def inputs_by_tick(self):
+        """ Tick -> [(kind, args)] in the order they were applied. """
+        by_tick = {}
+        for tick, kind, args in self.inputs:
+            by_tick.setdefault(tick, []).append((kind, args))
+        return by_tick
+
+    def save(self, path):
+        data = {
+            "version": RECORDING_VERSION,
+            "seed": self.seed,
+            "ticks": self.ticks,
+            "fingerprint": self.fingerprint,
+            "auto_pickup": self.auto_pickup,
+            "inputs": self.inputs,
+        }
+        with open(path, "w") as file:
+            json.dump(data, file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        if data.get("version") != RECORDING_VERSION:
+            raise ValueError(f"{path}: recording version {data.get('version')!r}, "
+                             f"expected {RECORDING_VERSION}")
+        inputs = [(tick, kind, args) for tick, kind, args in data["inputs"]]
+        return cls(data["seed"], inputs, data["ticks"], data["fingerprint"], data.get("auto_pickup", False))
+
+
+class Replayer:
+    """ Hands a recording's inputs back tick by tick. """
+
+    def __init__(self, recording):
+        self.recording = recording
+        self._inputs = recording.inputs_by_tick()
+
+    def inputs_for(self, tick):
+        return self._inputs.get(tick, ())
+
+    def done(self, tick):
+        """ Whether the session has been played up to where it was recorded. """
+        return tick >= self.recording.ticks
@@ -0,0 +1,232 @@
+"""
+Saved games.
+
+A save file is a short fixed header followed by zlib-compressed chunks:
+
+    b"MAYS"  format version (uint16)  chunk count (uint32)
+    then per chunk: its compressed length (uint32) and the bytes
+
+The first chunk is a JSON document with everything that is not a crop: the
+day, the inventory, the tool, the player, the farm's random states, and
+for each room visited its name, how many crop rows and patches it has, the
+last day it was simulated and whether it was resident. Then comes one
+chunk per room, holding how many crop rows, free ids, patches and tiles it
+has, then the raw bytes of every CropStore field (the used rows, dead ones
+included), the free crop ids, the planted and watered flags of the patches
+and the soil moisture of every tile, in that order: the chunk the World
+packs rooms into (see world.py). Keeping the dead rows and the free ids
+means a loaded farm hands out the same crop ids as the saved one would
+have, so it plays on exactly the same way.
+
+Walls, patches and beds come from the room files or the wild room
+generator, so they are not saved.
+
+Rooms that are packed are written as they are, without unpacking them.
+Loading puts every room back packed and only unpacks the ones that were
+resident: a handful of ``np.frombuffer`` calls, plus putting every crop back
+in its room's SpatialGrid, so linear in the number of crops.
+
+Nothing here imports arcade.
+"""
+import json
+import os
+import struct
+import time
+import zlib
+
+from farm import ROOM_FILES, Farm
+from game_log import perf_log
+from world import COMPRESSION_LEVEL, PackedRoom, RoomSnapshot
+
+MAGIC = b"MAYS"
+SAVE_VERSION = 3
+HEADER = struct.Struct("<4sHI")
+CHUNK_LENGTH = struct.Struct("<I")
+
+# What loading a save from another version of the game, or a damaged one, raises
+LOAD_ERRORS = (ValueError, KeyError, IndexError, struct.error, zlib.error)
+
+
+class Snapshot:
+    """
+    The whole farm at one moment. Taking it only copies arrays; compressing
+    and writing it (``chunks``, ``write``) can then happen on another thread
+    while the game carries on.
+
+    Resident rooms whose index is in ``skip`` are not copied: their chunk
+    from an earlier save of the same room version is passed to ``chunks``
+    instead. Packed rooms already are a chunk.
+    """
+    def __init__(self, farm, skip=()):
+        self.versions = []
+        self.rooms = []  # RoomSnapshot, PackedRoom, or None if skipped
+        rooms = []
+        for index, room in farm.rooms.entries():
+            self.versions.append(room.version)
+            if isinstance(room, PackedRoom):
+                self.rooms.append(room)
+                rooms.append({"name": room.name, "crops": room.size, "patches": room.patches,
+                              "day": room.day, "resident": False})
+            else:
+                self.rooms.append(None if index in skip else RoomSnapshot(room))
+                rooms.append({"name": room.name, "crops": room.crops.size,
+                              "patches": len(room.patches), "day": farm.current_day, "resident": True})
+        self.info = {
+            "seed": farm.seed,
+            "rng": farm.rng.getstate(),
+            "weather": farm.weather_rng.getstate(),
+            "day": farm.current_day,
+            "tool": farm.current_tool,
+            "saplings": farm.sapling_counter,
+            "tomatoes": farm.tomato_counter,
+            "room": farm.current_room,
+            "player": [farm.player.x, farm.player.y],
+            "rooms": rooms,
+        }
+
+    def chunks(self, previous=None):
+        """ The compressed chunks: the JSON info, then one per room, taken from ``previous`` if skipped. """
+        chunks = [zlib.compress(json.dumps(self.info).encode(), COMPRESSION_LEVEL)]
+        for index, room in enumerate(self.rooms):
+            if room is None:
+                chunks.append(previous[index])
+            elif isinstance(room, PackedRoom):
+                chunks.append(room.chunk)
+            else:
+                chunks.append(room.pack())
+        return chunks
+
+    def write(self, path, chunks=None):
+        """ Write the save to ``path``, through a temporary file so a crash never leaves half a save. """
+        chunks = chunks if chunks is not None else self.chunks()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, SAVE_VERSION, len(chunks)))
+            for chunk in chunks:
+                file.write(CHUNK_LENGTH.pack(len(chunk)))
+                file.write(chunk)
+        os.replace(temporary, path)
+        return chunks
+
+
+def save_farm(farm, path):
+    """ Save ``farm`` to ``path`` right away, on this thread. """
+    Snapshot(farm).write(path)
+
+
+def read_chunks(path):
+    """ The chunks of a save file, still compressed. """
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a Maysday save")
+    if version != SAVE_VERSION:
+        raise ValueError(f"{path}: save version {version}, expected {SAVE_VERSION}")
+    chunks = []
+    offset = HEADER.size
+    for _ in range(count):
+        (length,) = CHUNK_LENGTH.unpack_from(data, offset)
+        offset += CHUNK_LENGTH.size
+        chunks.append(data[offset:offset + length])
+        offset += length
+    return chunks
+
+
+def load_farm(path, events=True, room_files=ROOM_FILES):
+    """ A Farm in the state saved at ``path``. """
+    chunks = read_chunks(path)
+    info = json.loads(zlib.decompress(chunks[0]))
+    if len(chunks) != len(info["rooms"]) + 1:
+        raise ValueError(f"{path}: {len(chunks) - 1} room chunks for {len(info['rooms'])} rooms")
+
+    farm = Farm(seed=info["seed"], events=events, room_files=room_files)
+    for index, (saved, chunk) in enumerate(zip(info["rooms"], chunks[1:])):
+        packed = PackedRoom(saved["name"], saved["crops"], saved["patches"], saved["day"], 0, chunk)
+        if farm.rooms.put_packed(packed) != index:
+            raise ValueError(f"{path}: room {saved['name']!r} is not where the game expects it")
+
+    for rng, saved in ((farm.rng, info["rng"]), (farm.weather_rng, info["weather"])):
+        version, state, gauss = saved
+        rng.setstate((version, tuple(state), gauss))
+    farm.current_day = info["day"]
+    farm.current_tool = info["tool"]
+    farm.sapling_counter = info["saplings"]
+    farm.tomato_counter = info["tomatoes"]
+    farm.current_room = farm.rooms.current = info["room"]
+    farm.player.x, farm.player.y = info["player"]
+    # Unpack the rooms that were resident, so the farm carries on as it would have
+    for index, saved in enumerate(info["rooms"]):
+        if saved["resident"]:
+            farm.rooms[index]
+    farm.drain_events()
+    return farm
+
+
+def resume_farm(path, seed=None):
+    """
+    The farm saved at ``path``, or a new one from ``seed`` if there is no
+    save there or it can't be loaded, so the game starts either way.
+    """
+    if os.path.exists(path):
+        start = time.perf_counter()
+        try:
+            farm = load_farm(path)
+        except LOAD_ERRORS as error:
+            perf_log.warning("Could not load %s, starting a new farm: %s", path, error)
+        else:
+            perf_log.info("Loaded day %d from %s in %.0f ms", farm.current_day, path,
+                          (time.perf_counter() - start) * 1000)
+            return farm
+    return Farm(seed=seed)
+
+
+class Autosaver:
+    """
+    Saves the farm to ``path`` in the background. ``save`` takes a Snapshot
+    on the calling thread and hands it to ``executor`` (one worker, so saves
+    are written in order) to compress and write.
+
+    Rooms whose version has not changed since the last save keep the chunk
+    compressed for it, so a night that only touched one room only copies
+    and compresses that one.
+    """
+    def __init__(self, path, executor):
+        self.path = path
+        self.executor = executor
+        self.pending = None  # Future of the save being written, if any
+        self._chunks = {}  # Room index -> compressed chunk in the last save written
+        self._submitted = {}  # Room index -> version in the last save handed to the executor
+
+    def save(self, farm):
+        start = time.perf_counter()
+        unchanged = {index for index, room in farm.rooms.entries()
+                     if self._submitted.get(index) == room.version}
+        snapshot = Snapshot(farm, skip=unchanged)
+        self._submitted = dict(enumerate(snapshot.versions))
+        snapshot_ms = (time.perf_counter() - start) * 1000
+        self.pending = self.executor.submit(self._write, snapshot, snapshot_ms)
+        return self.pending
+
+    def _write(self, snapshot, snapshot_ms):
+        """ Compress and write a snapshot. Runs on the executor's thread. """
+        start = time.perf_counter()
+        try:
+            chunks = snapshot.write(self.path, snapshot.chunks(self._chunks))
+        except Exception:
+            self._submitted = {}  # Copy every room next time
+            perf_log.exception("Autosave to %s failed", self.path)
+            raise
+        self._chunks = dict(enumerate(chunks[1:]))
+        perf_log.info("Autosaved day %d to %s: %d bytes, snapshot %.2f ms, write %.0f ms",
+                      snapshot.info["day"], self.path, sum(map(len, chunks)), snapshot_ms,
+                      (time.perf_counter() - start) * 1000)
+
+    def wait(self):
+        """ Block until the last save is on disk. """
+        if self.pending is not None:
+            self.pending.result()
+            self.pending = None
@@ -0,0 +1,117 @@
+"""
+Soil moisture.
+
+Each room has a moisture value per tile, kept in a (height, width) float32
+array with row 0 at the bottom, like the room's OccupancyMap. Only tiles
+with soil (the dirt patches) hold water. Watering fills a tile up, and
+every day the soil loses some of its water to evaporation, spreads some
+to neighbouring soil tiles, and now and then gets rain.
+
+A day is a few whole-array operations whatever the size of the field, and
+``step`` takes fractions of a day too, to advance the soil every tick.
+Until something is watered every soil tile holds as much water as the
+others (rain falls on all of them alike), so nothing flows and a day is
+only the evaporation; and until it first rains or something is watered,
+a day does nothing at all.
+
+Nothing here imports arcade.
+"""
+import numpy as np
+
+SATURATED = 1.0  # Most water a tile holds; watering fills it up to this
+EVAPORATION = 0.3  # Share of its water a tile loses in a day
+DIFFUSION = 0.12  # Share of the difference to each soil neighbour that flows over in a day
+DRY = 0.2  # Crops on tiles drier than this do not grow
+
+# Most diffusion per step that keeps the stencil stable
+MAX_DIFFUSION_STEP = 0.2
+
+
+class SoilGrid:
+    """
+    Moisture of every tile of a room. ``soil`` says which tiles hold
+    water; the others stay at zero and nothing flows through them.
+
+    ``even`` is True while every soil tile holds the same amount of water,
+    and ``wet`` once any tile holds some.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.moisture = np.zeros((height, width), dtype=np.float32)
+        self.soil = np.zeros((height, width), dtype=bool)
+        self.even = True
+        self.wet = False
+        self._update_links()
+
+    def add_soil(self, columns, rows):
+        """ Turn the tiles at ``columns``, ``rows`` (arrays) into soil. """
+        self.soil[rows, columns] = True
+        self.even = self.even and not self.moisture.any()
+        self._update_links()
+
+    def restore(self, moisture):
+        """ Replace the moisture of every tile with a saved (height, width) array. """
+        self.moisture[:] = moisture
+        soil = self.moisture[self.soil]
+        self.even = not len(soil) or bool((soil == soil[0]).all())
+        self.wet = bool(self.moisture.any())
+
+    def _update_links(self):
+        # Weight of the link between each pair of neighbouring tiles: 1 if
+        # both are soil, else 0, so water only moves between soil tiles
+        self._vertical = (self.soil[1:, :] & self.soil[:-1, :]).astype(np.float32)
+        self._horizontal = (self.soil[:, 1:] & self.soil[:, :-1]).astype(np.float32)
+        self._flow = np.zeros_like(self.moisture)
+        self._difference_v = np.zeros_like(self._vertical)
+        self._difference_h = np.zeros_like(self._horizontal)
+
+    def water(self, columns, rows, amount=SATURATED):
+        """ Add ``amount`` of water to the soil tiles at ``columns``, ``rows``, up to saturation. """
+        moisture = self.moisture
+        moisture[rows, columns] = np.minimum(moisture[rows, columns] + amount, SATURATED)
+        self.even = False
+        self.wet = True
+
+    def rain(self, amount):
+        """ Add ``amount`` of water to every soil tile, up to saturation. """
+        np.add(self.moisture, amount, out=self.moisture, where=self.soil)
+        np.minimum(self.moisture, SATURATED, out=self.moisture)
+        self.wet = self.wet or amount > 0
+
+    def step(self, days=1.0):
+        """ Evaporate and spread water for ``days`` (which may be a fraction of a day). """
+        if days <= 0 or not self.wet:
+            return  # Dry soil stays dry
+        moisture = self.moisture
+        moisture *= (1 - EVAPORATION) ** days
+        if self.even:
+            return  # Nothing to flow anywhere
+
+        diffusion = DIFFUSION * days
+        steps = max(1, int(np.ceil(diffusion / MAX_DIFFUSION_STEP)))
+        rate = np.float32(diffusion / steps)
+        flow, vertical, horizontal = self._flow, self._difference_v, self._difference_h
+        for _ in range(steps):
+            # What flows from each tile to the one above it and to its right
+            np.subtract(moisture[:-1, :], moisture[1:, :], out=vertical)
+            vertical *= self._vertical
+            np.subtract(moisture[:, :-1], moisture[:, 1:], out=horizontal)
+            horizontal *= self._horizontal
+            flow.fill(0)
+            flow[1:, :] += vertical
+            flow[:-1, :] -= vertical
+            flow[:, 1:] += horizontal
+            flow[:, :-1] -= horizontal
+            flow *= rate
+            moisture += flow
+
+    def at(self, columns, rows):
+        """ Moisture of the tiles at ``columns``, ``rows``. """
+        return self.moisture[rows, columns]
+
+    @property
+    def nbytes(self):
+        return (self.moisture.nbytes + self.soil.nbytes + self._vertical.nbytes
+                + self._horizontal.nbytes + self._flow.nbytes + self._difference_v.nbytes
+                + self._difference_h.nbytes)
@@ -0,0 +1,65 @@
+"""
+Reusable sprites.
+
+A SpritePool owns one SpriteList and never takes sprites out of it:
+released sprites are hidden and handed out again by the next ``acquire``,
+so spawning, digging and planting don't create sprites, and the list's GPU
+buffers don't have to be rebuilt.
+"""
+import arcade
+
+
+class SpritePool:
+    """ Sprites made by ``factory``, handed out with acquire() and given back with release(). """
+
+    def __init__(self, factory, size=0):
+        self.factory = factory
+        self.sprite_list = arcade.SpriteList()
+        self._free = []
+
+        # For tuning the starting size
+        self.created = 0
+        self.reused = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+        for _ in range(size):
+            self._free.append(self._create())
+
+    def _create(self):
+        sprite = self.factory()
+        sprite.visible = False
+        self.sprite_list.append(sprite)
+        self.created += 1
+        return sprite
+
+    def acquire(self):
+        """ A hidden sprite to set up and show; a new one only if none is free. """
+        if self._free:
+            sprite = self._free.pop()
+            self.reused += 1
+        else:
+            sprite = self._create()
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return sprite
+
+    def release(self, sprite):
+        """ Hide ``sprite`` and keep it for the next acquire(). """
+        sprite.visible = False
+        self._free.append(sprite)
+        self.in_use -= 1
+
+    def __len__(self):
+        return len(self.sprite_list)
+
+    def stats(self):
+        """Counters for tuning: sprites in the pool, in use, free, created and reused."""
+        return {
+            "size": len(self.sprite_list),
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "free": len(self._free),
+            "created": self.created,
+            "reused": self.reused,
+        }
@@ -0,0 +1,110 @@
+"""
+Offscreen cache for the parts of a room that don't move.
+
+Rooms are drawn in chunks (see camera.py). The background, dirt patches,
+walls and bed of a chunk are drawn into a texture once, and every frame
+after that the chunk is a single textured quad until its layer is
+invalidated (a patch is watered or dries out) or handed to another chunk.
+Layers are kept in a StaticLayerPool and only held by the chunks on
+screen, so there are never more than a screenful of them.
+"""
+from arcade.gl import geometry
+
+VERTEX_SHADER = """
+#version 330
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+uniform vec4 rect;  // left, bottom, width, height in the room
+in vec2 in_vert;
+in vec2 in_uv;
+out vec2 uv;
+
+void main() {
+    gl_Position = proj.matrix * vec4(rect.xy + in_uv * rect.zw, 0.0, 1.0);
+    uv = in_uv;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D layer;
+in vec2 uv;
+out vec4 fragColor;
+
+void main() {
+    fragColor = texture(layer, uv);
+}
+"""
+
+
+class StaticLayer:
+    """
+    A texture holding everything in a ``size`` x ``size`` pixel square of
+    a room that rarely changes, ``resolution`` texels on a side.
+    """
+    def __init__(self, ctx, size, resolution, program):
+        self.ctx = ctx
+        self.size = size
+        self.texture = ctx.texture((resolution, resolution), components=4)
+        self.framebuffer = ctx.framebuffer(color_attachments=[self.texture])
+        self.program = program
+        self.quad = geometry.quad_2d_fs()
+        self.dirty = True
+        self.renders = 0  # How many times the layer had to be redrawn
+
+    def invalidate(self):
+        """ Redraw the layer before the next time it is shown. """
+        self.dirty = True
+
+    def draw(self, draw_contents, left, bottom):
+        """
+        Draw the cached layer over the square of the room whose bottom left
+        corner is (left, bottom), first calling ``draw_contents`` to redraw
+        it into the texture if it was invalidated.
+        """
+        ctx = self.ctx
+        if self.dirty:
+            projection = ctx.projection_2d
+            with self.framebuffer.activate():
+                self.framebuffer.clear()
+                ctx.projection_2d = (left, left + self.size, bottom, bottom + self.size)
+                draw_contents()
+            ctx.projection_2d = projection
+            self.dirty = False
+            self.renders += 1
+
+        # The layer is the bottom of the frame, so copy it straight over
+        # instead of blending it with the cleared screen
+        ctx.disable(ctx.BLEND)
+        self.program["rect"] = (left, bottom, self.size, self.size)
+        self.texture.use(0)
+        self.quad.render(self.program)
+        ctx.enable(ctx.BLEND)
+
+
+class StaticLayerPool:
+    """ StaticLayers of one size handed out with acquire() and given back with release(), like a SpritePool. """
+
+    def __init__(self, ctx, size, resolution):
+        self.ctx = ctx
+        self.size = size
+        self.resolution = resolution
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self._free = []
+        self.created = 0
+
+    def acquire(self):
+        """ A layer to draw a chunk into; it is redrawn before it is first shown. """
+        if self._free:
+            layer = self._free.pop()
+            layer.invalidate()
+            return layer
+        self.created += 1
+        return StaticLayer(self.ctx, self.size, self.resolution, self.program)
+
+    def release(self, layer):
+        self._free.append(layer)
+
+    def stats(self):
+        return {"created": self.created, "free": len(self._free)}
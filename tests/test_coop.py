@@ -0,0 +1,100 @@
+"""
+Joining a co-op server, and what it does with messages it should not trust.
+
+    python -m pytest tests
+"""
+import asyncio
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coop import CLICK, CLICK_BODY, LENGTH, TOOL, TOOL_BODY, CoopClient, CoopServer, frame
+from farm import START_POSITION, TOOLS
+
+
+async def wait_for(condition, server):
+    """ Tick ``server`` until ``condition()`` holds. """
+    for _ in range(100):
+        if condition():
+            return
+        server.tick()
+        await asyncio.sleep(0.01)
+    raise AssertionError("Timed out")
+
+
+def test_new_player_starts_in_first_room():
+    async def play():
+        server = CoopServer(seed=1)
+        port = await server.start(port=0)
+        first = CoopClient()
+        await first.connect(port=port)
+        await wait_for(lambda: len(server.players) == 1, server)
+
+        # Whoever acted last is somewhere else
+        server.farm.enter_room(server.farm.rooms.index_of("farm"))
+        second = CoopClient()
+        await second.connect(port=port)
+        await wait_for(lambda: len(server.players) == 2, server)
+        coop_player = server.players[second.player_id]
+        await first.close()
+        await second.close()
+        await server.close()
+        return coop_player
+
+    coop_player = asyncio.run(play())
+    assert coop_player.room == 0
+    assert (coop_player.player.x, coop_player.player.y) == START_POSITION
+
+
+def test_oversized_message_closes_connection():
+    async def play():
+        server = CoopServer(seed=1)
+        port = await server.start(port=0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await wait_for(lambda: len(server.players) == 1, server)
+        writer.write(LENGTH.pack(2 ** 31))
+        await wait_for(lambda: not server.players, server)
+        writer.close()
+        await server.close()
+
+    asyncio.run(play())
+
+
+@pytest.mark.parametrize("body", [
+    b"",
+    bytes([CLICK]),
+    CLICK_BODY.pack(CLICK, math.nan, 100),
+    CLICK_BODY.pack(CLICK, 100, math.inf),
+    CLICK_BODY.pack(CLICK, -math.inf, math.nan),
+    bytes([99, 1, 2]),
+], ids=["empty", "truncated", "nan", "inf", "inf and nan", "unknown type"])
+def test_bad_input_is_dropped(body):
+    async def play():
+        server = CoopServer(seed=1)
+        port = await server.start(port=0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await wait_for(lambda: len(server.players) == 1, server)
+        coop_player = next(iter(server.players.values()))
+        writer.write(frame(body) + frame(TOOL_BODY.pack(TOOL, TOOLS.index("shovel"))))
+        await wait_for(lambda: coop_player.tool == "shovel", server)
+        server.tick()
+        players = len(server.players)
+        writer.close()
+        await server.close()
+        return players
+
+    assert asyncio.run(play()) == 1
+
+
+def test_changes_leave_packed_rooms_packed():
+    server = CoopServer(seed=1)
+    rooms = server.farm.rooms
+    room_index = rooms.index_of("farm")
+    rooms.evict(room_index)
+    changes = server._changes([("soil", room_index, None), ("grow", room_index, [0])])
+    assert room_index not in changes
+    assert not rooms.is_loaded(room_index)
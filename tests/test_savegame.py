@@ -0,0 +1,48 @@
+"""
+Starting the game from a save that this version can't load.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from farm import Farm
+from savegame import HEADER, MAGIC, SAVE_VERSION, resume_farm, save_farm
+
+
+@pytest.fixture
+def saved(tmp_path):
+    """ The path of a save from a few days in. """
+    game = Farm(seed=3, events=False)
+    game.fast_forward(5)
+    path = str(tmp_path / "farm.sav")
+    save_farm(game, path)
+    return path
+
+
+def test_resume_saved_farm(saved):
+    game = resume_farm(saved, seed=7)
+    assert (game.seed, game.current_day) == (3, Farm(seed=3).current_day + 5)
+
+
+def test_old_version_starts_new_farm(saved):
+    with open(saved, "r+b") as file:
+        _, _, count = HEADER.unpack(file.read(HEADER.size))
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, SAVE_VERSION - 1, count))
+    game = resume_farm(saved, seed=7)
+    assert game.current_day == Farm(seed=7).current_day
+    assert game.seed == 7
+
+
+@pytest.mark.parametrize("keep", [2, HEADER.size + 10, -20])
+def test_damaged_save_starts_new_farm(saved, keep):
+    with open(saved, "rb") as file:
+        data = file.read()
+    with open(saved, "wb") as file:
+        file.write(data[:keep])
+    assert resume_farm(saved, seed=7).seed == 7
@@ -0,0 +1,108 @@
+"""
+A room packed away while its crops grow should end up as it would have
+had it stayed resident.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import farm
+import world
+from crops import CROP_KINDS, STATE_NAMES
+
+
+@pytest.fixture
+def bean(monkeypatch):
+    """
+    A crop kind with several stages of different lengths, so a room away
+    for a few nights has to catch up on more than one of them. Only there
+    for the one test: the kinds and state names are put back afterwards.
+    """
+    monkeypatch.setattr(CROP_KINDS, "_kinds", dict(CROP_KINDS._kinds))
+    for table in ("stage_states", "stage_nights", "stage_counts"):  # add() replaces these
+        monkeypatch.setattr(CROP_KINDS, table, getattr(CROP_KINDS, table))
+    state_names = list(STATE_NAMES)
+    CROP_KINDS.add("bean", [("watered", 1), ("sprouted", 1), ("flowering", 2)])
+    yield "bean"
+    STATE_NAMES[:] = state_names
+
+
+def play(kind, away, nights, pack):
+    """
+    Plant and water every patch on the farm, leave for ``away`` nights
+    (packing the farm room if ``pack``), then come back and sleep for
+    ``nights`` more. Returns the farm room.
+    """
+    game = farm.Farm(seed=5, events=False)
+    room_index = game.rooms.index_of("farm")
+    room = game.rooms[room_index]
+    game.sapling_counter = len(room.patches)
+    for patch in range(len(room.patches)):
+        game.plant(room_index, patch, kind)
+    game.water(room_index, room.crops.ids())
+
+    game.enter_room(game.rooms.index_of("maze"))
+    if pack:
+        game.rooms.evict(room_index)
+    game.fast_forward(away)
+    game.enter_room(room_index)
+    assert game.rooms.is_loaded(room_index)
+    game.fast_forward(nights)
+    return game.rooms[room_index]
+
+
+@pytest.mark.parametrize("kind", ["tomato", "bean"])
+@pytest.mark.parametrize("away", [1, 2, 3, 6])
+def test_packed_room_grows_like_resident_room(monkeypatch, bean, kind, away):
+    monkeypatch.setattr(farm, "RAIN_CHANCE", 0)  # Rain only falls on resident rooms
+    resident = play(kind, away, 3, pack=False)
+    packed = play(kind, away, 3, pack=True)
+
+    crops = resident.crops.ids()
+    assert np.array_equal(packed.crops.ids(), crops)
+    for field in ("state", "stage", "due_day"):
+        assert np.array_equal(getattr(packed.crops, field)[crops], getattr(resident.crops, field)[crops])
+    assert np.array_equal(packed.soil.moisture, resident.soil.moisture)
+    assert (resident.crops.state[crops] == farm.GROWN).all()
+
+
+def prefetched_wilds():
+    """ A farm whose player is on the farm room, with the wild room east of it built in the background. """
+    game = farm.Farm(seed=5, events=False)
+    game.enter_room(game.rooms.index_of("farm"))
+    game.rooms.prefetch("wild:1,0")
+    _, future = game.rooms._prefetched["wild:1,0"]
+    future.result()
+    return game
+
+
+def test_prefetch_dropped_when_player_goes_elsewhere():
+    game = prefetched_wilds()
+    game.enter_room(game.rooms.index_of("maze"))
+    assert game.rooms.stats()["prefetched"] == 0
+    assert game.rooms.prefetch_drops == 1
+
+
+def test_prefetch_used_when_player_goes_there():
+    game = prefetched_wilds()
+    game.enter_room(game.rooms.index_of("wild:1,0"))
+    assert game.rooms.prefetch_hits == 1
+    assert game.rooms.prefetch_drops == 0
+
+
+def test_built_prefetch_counts_against_budget():
+    game = prefetched_wilds()
+    resident = sum(world.room_memory(room) for _, room in game.rooms.loaded())
+    assert game.rooms.memory_bytes() > resident
+
+    # Going over the budget drops the prefetch before packing any room
+    game.rooms.memory_budget = resident
+    game.rooms.prefetch("wild:2,0")
+    assert "wild:1,0" not in game.rooms._prefetched
+    assert game.rooms.evictions == 0
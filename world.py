@@ -0,0 +1,332 @@
+"""
+Rooms loaded on demand.
+
+The World holds every room the farm has visited, by index. Only some of
+them are resident as RoomStates. The others are packed: their crops, patch
+flags and soil compressed into the same chunk a save file holds for a room,
+while their walls, patches and beds are built again from the room file or
+generator when the room is needed. Whenever the resident rooms take up
+more than the memory budget, the least recently used ones are packed.
+
+Rooms the player is walking towards can be prefetched: building them runs
+on a background thread, and only putting their crops back happens on the
+main thread when they are entered. Prefetched rooms count towards the
+memory budget once built, and are the first to go over it; those asked for
+from a room nobody is in any more are dropped. Compressing packed rooms
+also happens in the background.
+
+Nothing here imports arcade.
+"""
+import struct
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from crops import CropStore
+
+DEFAULT_MEMORY_BUDGET = 32 * 1024 * 1024
+COMPRESSION_LEVEL = 6
+
+# Rough sizes, in bytes, of what a room holds besides its numpy arrays
+GRID_ENTRY_BYTES = 150  # A crop's (x, y, id) tuple in the room's SpatialGrid
+OBJECT_BYTES = 200  # A patch or a bed, with its grid entry
+ROOM_BYTES = 4096  # The RoomState itself, its grids and dicts
+
+
+# How many crop rows, free ids, patches and soil tiles a room chunk holds
+CHUNK_COUNTS = struct.Struct("<4I")
+
+
+class RoomSnapshot:
+    """ Copies of one room's crops, patch flags and soil, to be packed later, on any thread. """
+    __slots__ = ("columns", "free", "patch_planted", "patch_watered", "moisture")
+
+    def __init__(self, room):
+        self.columns, self.free = room.crops.columns()
+        self.patch_planted = room.patch_planted.copy()
+        self.patch_watered = room.patch_watered.copy()
+        self.moisture = room.soil.moisture.copy()
+
+    def pack(self):
+        """
+        The compressed chunk: the counts, every CropStore field (the used
+        rows), the free crop ids, the patches' planted and watered flags,
+        then the moisture of every tile.
+        """
+        counts = CHUNK_COUNTS.pack(len(self.columns["alive"]), len(self.free),
+                                   len(self.patch_planted), self.moisture.size)
+        parts = [counts] + [self.columns[name].tobytes() for name in CropStore.FIELDS]
+        parts += [self.free.tobytes(), self.patch_planted.tobytes(), self.patch_watered.tobytes(),
+                  self.moisture.tobytes()]
+        return zlib.compress(b"".join(parts), COMPRESSION_LEVEL)
+
+
+def unpack_columns(chunk):
+    """ Read a packed room chunk back: (columns, free ids, patch_planted, patch_watered, moisture). """
+    data = zlib.decompress(chunk)
+    size, free_count, patches, tiles = CHUNK_COUNTS.unpack_from(data)
+    offset = CHUNK_COUNTS.size
+
+    def take(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array
+
+    columns = {name: take(dtype, size) for name, dtype in CropStore.FIELDS.items()}
+    free = take(np.int32, free_count)
+    planted = take(np.bool_, patches)
+    watered = take(np.bool_, patches)
+    moisture = take(np.float32, tiles)
+    return columns, free, planted, watered, moisture
+
+
+class PackedRoom:
+    """
+    A room that is not resident: its name, the day it was packed, its
+    version, and its crops as a packed chunk. ``chunk`` may still be a
+    Future while it is being compressed.
+    """
+    __slots__ = ("name", "size", "patches", "day", "version", "_chunk")
+
+    def __init__(self, name, size, patches, day, version, chunk):
+        self.name = name
+        self.size = size  # CropStore rows
+        self.patches = patches
+        self.day = day
+        self.version = version
+        self._chunk = chunk
+
+    @property
+    def chunk(self):
+        if isinstance(self._chunk, Future):
+            self._chunk = self._chunk.result()
+        return self._chunk
+
+    def unpack(self):
+        return unpack_columns(self.chunk)
+
+    def restore(self, room):
+        """ Put the crops, patch flags and soil back into ``room``, a RoomState just built from its file. """
+        if self.name != room.name or self.patches != len(room.patches):
+            raise ValueError(f"Packed room {self.name!r} does not match room {room.name!r}")
+        columns, free, planted, watered, moisture = self.unpack()
+        room.patch_planted[:] = planted
+        room.patch_watered[:] = watered
+        room.soil.restore(moisture.reshape(room.soil.moisture.shape))
+        room.restore_crops(columns, free)
+        room.version = self.version
+
+
+def room_memory(room):
+    """ Roughly how many bytes a resident RoomState takes up. """
+    crops = room.crops
+    arrays = sum(getattr(crops, name).nbytes for name in crops.FIELDS)
+    objects = len(room.patches) + len(room.beds)
+    return (ROOM_BYTES + arrays + len(crops) * GRID_ENTRY_BYTES + objects * OBJECT_BYTES
+            + len(room.walls.cells) + room.free_cells.nbytes + room.soil.nbytes)
+
+
+class World:
+    """
+    Every room visited so far, by index, resident or packed.
+
+    ``loader(name)`` builds a new RoomState for a room; it is also called
+    on the background thread, so it must not touch the game state.
+    ``on_load(index, room, packed)`` is called on the main thread when a
+    room becomes resident, with the PackedRoom it came from, or None the
+    first time. ``on_evict(index)`` is called when a room is packed.
+    ``today()`` gives the day to stamp packed rooms with.
+
+    The room the player is in, the rooms in ``pinned`` (e.g. those other
+    players are in) and rooms added with ``reloadable=False`` (nothing to
+    build them again from) are never packed. Prefetches made from other
+    rooms are dropped whenever ``current`` changes.
+    """
+    def __init__(self, loader, today, on_load=None, on_evict=None,
+                 memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.loader = loader
+        self.today = today
+        self.on_load = on_load
+        self.on_evict = on_evict
+        self.memory_budget = memory_budget
+        self._current = None  # Index of the room the player is in
+        self.pinned = set()  # Indices of other rooms to keep resident
+
+        self.names = []  # Index -> room name
+        self._index = {}  # Room name -> index
+        self._resident = OrderedDict()  # Index -> RoomState, least recently used first
+        self._loaded = None  # loaded(), until a room comes or goes
+        self._packed = {}  # Index -> PackedRoom
+        self._unpackable = set()
+        self._prefetched = {}  # Room name -> (index of the room it was asked for from, Future of a new RoomState)
+        self._executor = None
+
+        self.loads = 0  # Rooms made resident, new or unpacked
+        self.evictions = 0
+        self.prefetch_hits = 0
+        self.prefetch_drops = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor
+
+    @property
+    def current(self):
+        return self._current
+
+    @current.setter
+    def current(self, index):
+        if index != self._current:
+            self._current = index
+            self._drop_prefetches()
+
+    def index_of(self, name):
+        """ The index of the room called ``name``, making one up if it has not been visited. """
+        index = self._index.get(name)
+        if index is None:
+            index = self._index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def add(self, room, reloadable=True):
+        """ Add a room that was built elsewhere as a new, resident room and return its index. """
+        index = self.index_of(room.name)
+        if not reloadable:
+            self._unpackable.add(index)
+        self._install(index, room, None)
+        return index
+
+    def __getitem__(self, index):
+        room = self._resident.get(index)
+        if room is None:
+            return self._load(index)
+        self._resident.move_to_end(index)
+        return room
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_loaded(self, index):
+        """ The room if it is resident, else None. Does not count as a use. """
+        return self._resident.get(index)
+
+    def is_loaded(self, index):
+        return index in self._resident
+
+    def loaded(self):
+        """ (index, room) of the resident rooms, in index order. Don't change the list. """
+        if self._loaded is None:
+            self._loaded = sorted(self._resident.items(), key=lambda item: item[0])
+        return self._loaded
+
+    def entries(self):
+        """ (index, RoomState or PackedRoom) for every room, in index order. """
+        for index in range(len(self.names)):
+            yield index, self._resident.get(index) or self._packed[index]
+
+    def prefetch(self, name):
+        """ Start building the room called ``name`` in the background, if it is not resident. """
+        if name in self._prefetched:
+            return
+        index = self._index.get(name)
+        if index is not None and index in self._resident:
+            return
+        self._prefetched[name] = (self._current, self.executor.submit(self.loader, name))
+        self._evict_over_budget(keep=None)  # For the prefetches built since the last check
+
+    def _drop_prefetches(self):
+        """
+        Forget the prefetches asked for from rooms that neither the player
+        nor anybody pinned is in any more, except the one for the current
+        room, cancelling those that have not started.
+        """
+        rooms = self.pinned | {self._current}
+        for name, (origin, future) in list(self._prefetched.items()):
+            if origin not in rooms and self._index.get(name) != self._current:
+                self._forget_prefetch(name)
+
+    def _forget_prefetch(self, name):
+        _, future = self._prefetched.pop(name)
+        future.cancel()
+        self.prefetch_drops += 1
+
+    def _prefetched_rooms(self):
+        """ (name, RoomState) of the prefetches that are built. """
+        for name, (_, future) in self._prefetched.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                yield name, future.result()
+
+    def put_packed(self, packed):
+        """ Replace a room with a packed one, e.g. from a save file, and return its index. """
+        index = self.index_of(packed.name)
+        self._resident.pop(index, None)
+        self._loaded = None
+        self._packed[index] = packed
+        return index
+
+    def _load(self, index):
+        name = self.names[index]
+        _, future = self._prefetched.pop(name, (None, None))
+        if future is not None:
+            self.prefetch_hits += 1
+            room = future.result()
+        else:
+            room = self.loader(name)
+        packed = self._packed.pop(index, None)
+        if packed is not None:
+            packed.restore(room)
+        self._install(index, room, packed)
+        return room
+
+    def _install(self, index, room, packed):
+        self._resident[index] = room
+        self._loaded = None
+        self.loads += 1
+        if self.on_load:
+            self.on_load(index, room, packed)
+        self._evict_over_budget(keep=index)
+
+    def evict(self, index):
+        """ Pack a resident room: its crops are copied now and compressed in the background. """
+        room = self._resident.pop(index)
+        self._loaded = None
+        snapshot = RoomSnapshot(room)
+        self._packed[index] = PackedRoom(room.name, room.crops.size, len(room.patches), self.today(),
+                                         room.version, self.executor.submit(snapshot.pack))
+        self.evictions += 1
+        if self.on_evict:
+            self.on_evict(index)
+
+    def _evict_over_budget(self, keep):
+        sizes = {index: room_memory(room) for index, room in self._resident.items()}
+        prefetched = [(name, room_memory(room)) for name, room in self._prefetched_rooms()]
+        total = sum(sizes.values()) + sum(size for _, size in prefetched)
+        # Prefetched rooms go first: they can just be built again
+        for name, size in prefetched:
+            if total <= self.memory_budget:
+                break
+            total -= size
+            self._forget_prefetch(name)
+        for index in list(self._resident):
+            if total <= self.memory_budget:
+                break
+            if index in (keep, self.current) or index in self._unpackable or index in self.pinned:
+                continue
+            total -= sizes[index]
+            self.evict(index)
+
+    def memory_bytes(self):
+        """ Roughly how much the resident rooms and the built prefetches take up. """
+        rooms = list(self._resident.values()) + [room for _, room in self._prefetched_rooms()]
+        return sum(room_memory(room) for room in rooms)
+
+    def stats(self):
+        return {"rooms": len(self.names), "resident": len(self._resident), "packed": len(self._packed),
+                "memory_bytes": self.memory_bytes(), "loads": self.loads, "evictions": self.evictions,
+                "prefetched": len(self._prefetched), "prefetch_hits": self.prefetch_hits,
+                "prefetch_drops": self.prefetch_drops}